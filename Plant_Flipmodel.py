@@ -11,6 +11,9 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 
+from plantflip_kernel import PLANTFLIP, distance_payable_frame, graph_inputs, pchar_grid_frame
+from scenario_cache import cached_call, get_cache
+
 # -----------------------
 # Page config
 # -----------------------
@@ -125,58 +128,30 @@ Chipper_m3_h = float(DEFAULTS["Chipper_m3_h"])
 Handling_tph = float(DEFAULTS["Handling_tph"])
 C_tkm_truck_mach = float(DEFAULTS["C_tkm_truck_mach"])
 
+# Inputs that define a scenario (sidebar values + fixed constants) -> cache key
+SCENARIO_INPUTS = (
+    "P_char", "P_el", "P_heat", "MC_asrec", "MarginTarget", "Qin_DM_h", "Y_char", "E_elec", "E_heat",
+    "Hop_year", "n_ops", "w_hour", "OM_hour", "P_buy", "E_buy", "Backhaul", "Tractor_speed",
+    "Truck_speed", "PayloadTruck", "BulkDensity", "chip_box_m3", "IncludeLabor", "IncludeChipOp",
+    "IncludeLoader", "IncludeDriver", "AddLaborToTruckTkm", "Wage_eur_h", "Tractor_eur_h",
+    "PTOChipper_eur_h", "Body_Tractor_eur_t", "SemiTrailer_eur_t", "Bucket_eur_t", "FrontLoader_eur_h",
+    "Chipper_m3_h", "Handling_tph", "C_tkm_truck_mach", "WageBase", "OncostFrac",
+)
+
+KPIS = (
+    "P_chip_payable_DM", "P_chip_payable_asrec", "BE_radius_tractor", "BE_radius_truck", "PayableBudget_yr",
+    "CharOutput_yr", "Qin_asrec_yr", "C_chip_eurt", "C_handle_eurt", "C_tkm_tractor", "C_tkm_truck",
+)
+
 # -----------------------
 # Helper: recompute from parameters
 # -----------------------
 def compute_payable_and_costs():
-    # revenues & non-feedstock costs
-    Qchar_h = Y_char * Qin_DM_h
-    Rchar = P_char * Qchar_h
-    Rel   = P_el * E_elec
-    Rheat = P_heat * E_heat
-    Rev   = Rchar + Rel + Rheat
-
-    Clab = n_ops * w_hour
-    Com  = OM_hour
-    Cbuy = P_buy * E_buy
-
-    # payable €/t DM at plant gate
-    P_chip_payable_DM = (Rev - (Clab + Com + Cbuy) - MarginTarget) / max(1e-9, Qin_DM_h)
-    P_chip_payable_asrec = P_chip_payable_DM * (1 - MC_asrec)
-
-    # chipping & handling
-    C_chip_eurt_mach = (Tractor_eur_h + PTOChipper_eur_h) / max(1e-9, Chipper_m3_h * BulkDensity)
-    C_hand_eurt_mach = Bucket_eur_t + FrontLoader_eur_h / max(1e-9, Handling_tph)
-    Labor_chip_hpt   = 1.0 / max(1e-9, Chipper_m3_h * BulkDensity)
-    Labor_hand_hpt   = 1.0 / max(1e-9, Handling_tph)
-
-    C_chip_eurt = C_chip_eurt_mach + (Wage_eur_h * Labor_chip_hpt if (IncludeLabor and IncludeChipOp) else 0.0)
-    C_handle_eurt = C_hand_eurt_mach + (Wage_eur_h * Labor_hand_hpt if (IncludeLabor and IncludeLoader) else 0.0)
-
-    # t-km costs
-    PayloadTractor = chip_box_m3 * BulkDensity
-    C_tkm_tractor = (Tractor_eur_h / max(1e-9, Tractor_speed * PayloadTractor)) \
-                    + ((Wage_eur_h if (IncludeLabor and IncludeDriver) else 0.0) / max(1e-9, Tractor_speed * PayloadTractor))
-    C_tkm_truck = C_tkm_truck_mach + ((Wage_eur_h if (IncludeLabor and IncludeDriver and AddLaborToTruckTkm) else 0.0) / max(1e-9, Truck_speed * PayloadTruck))
-
-    # BE radius by mode (km one-way)
-    BE_trac = max(0.0, (P_chip_payable_DM - (C_chip_eurt + C_handle_eurt + Body_Tractor_eur_t)) / max(1e-9, Backhaul * C_tkm_tractor))
-    BE_truck = max(0.0, (P_chip_payable_DM - (C_chip_eurt + C_handle_eurt + SemiTrailer_eur_t)) / max(1e-9, Backhaul * C_tkm_truck))
-
-    kpis = dict(
-        P_chip_payable_DM=P_chip_payable_DM,
-        P_chip_payable_asrec=P_chip_payable_asrec,
-        BE_radius_tractor=BE_trac,
-        BE_radius_truck=BE_truck,
-        PayableBudget_yr=P_chip_payable_DM * Qin_DM_h * Hop_year,
-        CharOutput_yr=Y_char * Qin_DM_h * Hop_year,
-        Qin_asrec_yr=Qin_DM_h * Hop_year / max(1e-9, (1 - MC_asrec)),
-        C_chip_eurt=C_chip_eurt,
-        C_handle_eurt=C_handle_eurt,
-        C_tkm_tractor=C_tkm_tractor,
-        C_tkm_truck=C_tkm_truck
-    )
-    return kpis
+    # formulas live in plantflip_kernel.PLANTFLIP; the session keeps the last scenario
+    # and recomputes only the quantities downstream of inputs that changed this rerun
+    s = st.session_state.setdefault("plantflip_graph", PLANTFLIP.session())
+    s.set(graph_inputs(globals(), SCENARIO_INPUTS))
+    return s.values(KPIS)
 
 kpis = compute_payable_and_costs()
 
@@ -189,7 +164,7 @@ colA, colB = st.columns([2,1])
 with colB:
     st.markdown("**Options**")
     max_km = st.number_input("Max distance (km)", min_value=10, max_value=300, value=200, step=10)
-    km_step = st.number_input("Step (km)", min_value=1, max_value=50, value=1, step=1)
+    km_step = st.number_input("Step (km)", min_value=0.01, max_value=50.0, value=1.0, step=0.5)
     show_dm = st.checkbox("Show payable €/t DM", value=False)
     show_asrec = st.checkbox("Show payable €/t as-received", value=True)
     show_modes = st.multiselect("Show modes", ["tractor","truck"], default=["tractor","truck"], key="modes_distance")
@@ -205,29 +180,15 @@ else:
 
 if not use_csv_distance:
     # Recompute grid using current parameters
-    kms = np.arange(0, max_km+km_step, km_step, dtype=float)
-    rows = []
     # delivered cost per t (as-received) = (machine+labor chipping+handling) * (1-MC) + Backhaul*C_tkm*km*(1-MC)
-    for mode in ["tractor","truck"]:
-        C_surcharge = Body_Tractor_eur_t if mode=="tractor" else SemiTrailer_eur_t
-        C_tkm_mode = kpis["C_tkm_tractor"] if mode=="tractor" else kpis["C_tkm_truck"]
-        for d in kms:
-            cost_asrec = ((kpis["C_chip_eurt"] + kpis["C_handle_eurt"] + C_surcharge) * (1 - MC_asrec)) \
-                         + (Backhaul * C_tkm_mode * d * (1 - MC_asrec))
-            rows.append({
-                "km": d,
-                "mode": mode,
-                "cost_asrec_eurpt": cost_asrec,
-                "payable_asrec_eurpt": kpis["P_chip_payable_asrec"]
-            })
-    df_dist = pd.DataFrame(rows)
-    # BE per mode: closest to payable line
-    df_dist["is_be"] = 0
-    for mode in df_dist["mode"].unique():
-        sub = df_dist[df_dist["mode"]==mode].copy()
-        sub["diff"] = (sub["cost_asrec_eurpt"] - sub["payable_asrec_eurpt"]).abs()
-        be_km = float(sub.loc[sub["diff"].idxmin(), "km"])
-        df_dist.loc[(df_dist["mode"]==mode) & (df_dist["km"]==be_km), "is_be"] = 1
+    # BE point = exact crossing with the payable line (closed form, independent of km_step)
+    kms = np.arange(0, max_km + km_step / 2, km_step, dtype=float)
+    C_fixed = {
+        "tractor": kpis["C_chip_eurt"] + kpis["C_handle_eurt"] + Body_Tractor_eur_t,
+        "truck":   kpis["C_chip_eurt"] + kpis["C_handle_eurt"] + SemiTrailer_eur_t,
+    }
+    C_tkm = {"tractor": kpis["C_tkm_tractor"], "truck": kpis["C_tkm_truck"]}
+    df_dist = cached_call(distance_payable_frame, kms, kpis["P_chip_payable_asrec"], C_fixed, C_tkm, Backhaul, MC_asrec)
 
 with colA:
     # Payable line(s)
@@ -312,45 +273,11 @@ else:
     use_csv_pchar = False
 
 if not use_csv_pchar:
-    # recompute grid centered at current P_char
+    # grid centered at current P_char, evaluated in one vectorized graph call; cached under
+    # the kernel's name, so every session and the other plant-first apps share it
     idxs = np.arange(points) - (points//2)
-    Pchar_grid = P_char + idxs * dP
-
-    C_surch_trac = Body_Tractor_eur_t
-    C_surch_truck = SemiTrailer_eur_t
-    rows = []
-    for Pc in Pchar_grid:
-        # revenues (hourly)
-        R_el_h = P_el * E_elec
-        R_ht_h = P_heat * E_heat
-        Rev_h  = Pc * (Y_char * Qin_DM_h) + R_el_h + R_ht_h
-        # payable €/t DM
-        pay_DM = (Rev_h - (n_ops*w_hour + OM_hour + P_buy*E_buy) - MarginTarget) / max(1e-9, Qin_DM_h)
-        pay_asrec = pay_DM * (1 - MC_asrec)
-        # t-km
-        PayloadTractor = chip_box_m3 * BulkDensity
-        C_tkm_tractor = (Tractor_eur_h / max(1e-9, Tractor_speed * PayloadTractor)) \
-                        + ((Wage_eur_h if (IncludeLabor and IncludeDriver) else 0.0) / max(1e-9, Tractor_speed * PayloadTractor))
-        C_tkm_truck = C_tkm_truck_mach + ((Wage_eur_h if (IncludeLabor and IncludeDriver and AddLaborToTruckTkm) else 0.0) / max(1e-9, Truck_speed * PayloadTruck))
-        # chipping+handling €/t DM
-        C_chip_eurt_mach = (Tractor_eur_h + PTOChipper_eur_h) / max(1e-9, Chipper_m3_h * BulkDensity)
-        C_hand_eurt_mach = Bucket_eur_t + FrontLoader_eur_h / max(1e-9, Handling_tph)
-        Labor_chip_hpt   = 1.0 / max(1e-9, Chipper_m3_h * BulkDensity)
-        Labor_hand_hpt   = 1.0 / max(1e-9, Handling_tph)
-        C_chip_eurt = C_chip_eurt_mach + (Wage_eur_h * Labor_chip_hpt if (IncludeLabor and IncludeChipOp) else 0.0)
-        C_handle_eurt = C_hand_eurt_mach + (Wage_eur_h * Labor_hand_hpt if (IncludeLabor and IncludeLoader) else 0.0)
-
-        BE_trac = max(0.0, (pay_DM - (C_chip_eurt + C_handle_eurt + C_surch_trac)) / max(1e-9, Backhaul*C_tkm_tractor))
-        BE_truck = max(0.0, (pay_DM - (C_chip_eurt + C_handle_eurt + C_surch_truck)) / max(1e-9, Backhaul*C_tkm_truck))
-
-        rows.append({
-            "Pchar_eurpt": Pc,
-            "Pchip_pay_DM_eurptDM": pay_DM,
-            "Pchip_pay_asrec_eurpt": pay_asrec,
-            "BE_radius_tractor_km": BE_trac,
-            "BE_radius_truck_km": BE_truck
-        })
-    df_pchar = pd.DataFrame(rows)
+    df_pchar = cached_call(pchar_grid_frame, graph_inputs(globals(), SCENARIO_INPUTS), P_char + idxs * dP,
+                           with_carbon=False)
 
 with col1:
     # Upper chart: payable vs biochar price (DM + as-received)
@@ -418,3 +345,9 @@ kpi_cols = st.columns(3)
 kpi_cols[0].metric("BE radius tractor (km)", f"{kpis['BE_radius_tractor']:.1f}")
 kpi_cols[1].metric("BE radius truck (km)", f"{kpis['BE_radius_truck']:.1f}")
 kpi_cols[2].metric("As-received intake needed (t/yr)", f"{kpis['Qin_asrec_yr']:.0f}")
+
+# Shared scenario cache (all sessions of this process; distance / P_char grids also with the other
+# apps via .scenario_cache/ when SCENARIO_CACHE_DISK_MB is set)
+_cs = get_cache().stats()
+st.sidebar.caption(f"Scenario cache: {_cs['hits']} hits / {_cs['misses']} misses · "
+                   f"{_cs['entries']} grids, {_cs['bytes'] / 2**20:.1f} MB")
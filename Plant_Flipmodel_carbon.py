@@ -13,6 +13,10 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 
+from monte_carlo import UNCERTAIN, band_frame, delivered_cost_probe, scaled_to, simulate, summary_frame
+from plantflip_kernel import MODES, PLANTFLIP, be_distance, distance_payable_frame, graph_inputs, pchar_grid_frame
+from scenario_cache import Params, cached_call, get_cache
+
 
 # ------------------------------------------------
 # Page config
@@ -172,6 +176,13 @@ IncludeCarbonInPayable = st.sidebar.checkbox(
     "Add carbon value on top of payable chip price", value=True
 )
 
+# Monte Carlo bands (monte_carlo.py): default distributions re-centered on the inputs above
+st.sidebar.header("Uncertainty (Monte Carlo)")
+show_bands = st.sidebar.checkbox("Show P10/P50/P90 bands", value=False)
+mc_n = st.sidebar.select_slider("Samples", options=[10_000, 50_000, 200_000, 1_000_000], value=50_000)
+mc_seed = int(st.sidebar.number_input("Seed", min_value=0, value=0, step=1))
+st.sidebar.caption("Uncertain: " + ", ".join(UNCERTAIN))
+
 # Fixed machine costs
 Tractor_eur_h = float(DEFAULTS["Tractor_eur_h"])
 PTOChipper_eur_h = float(DEFAULTS["PTOChipper_eur_h"])
@@ -187,99 +198,42 @@ WageBase = float(DEFAULTS["WageBase_eur_h"])
 OncostFrac = float(DEFAULTS["OncostFrac"])
 Wage_eur_h = WageBase * (1 + OncostFrac)
 
+# Inputs that define a scenario (sidebar values + fixed constants) -> cache key
+SCENARIO_INPUTS = (
+    "P_char", "P_el", "P_heat", "MC_asrec", "MarginTarget", "Qin_DM_h", "Y_char", "E_elec", "E_heat",
+    "Hop_year", "n_ops", "w_hour", "OM_hour", "P_buy", "E_buy", "Backhaul", "Tractor_speed",
+    "Truck_speed", "PayloadTruck", "BulkDensity", "chip_box_m3", "IncludeLabor", "IncludeChipOp",
+    "IncludeLoader", "IncludeDriver", "AddLaborToTruckTkm", "Wage_eur_h", "Tractor_eur_h",
+    "PTOChipper_eur_h", "Body_Tractor_eur_t", "SemiTrailer_eur_t", "Bucket_eur_t", "FrontLoader_eur_h",
+    "Chipper_m3_h", "Handling_tph", "C_tkm_truck_mach", "WageBase", "OncostFrac",
+    "P_CO2", "CO2eq_per_tchar", "IncludeCarbonInPayable",
+)
+
+# App KPI name -> PLANTFLIP graph quantity
+KPIS = dict(
+    P_chip_DM="P_chip_payable_DM", P_chip_asrec="P_chip_payable_asrec", C_chip="C_chip_eurt",
+    C_hand="C_handle_eurt", C_tkm_tractor="C_tkm_tractor", C_tkm_truck="C_tkm_truck",
+    BE_trac="BE_radius_tractor", BE_truck="BE_radius_truck", PayableBudget_yr="PayableBudget_yr",
+    CharOutput_yr="CharOutput_yr", Qin_asrec_yr="Qin_asrec_yr", CO2_balance_yr="CO2_balance_yr",
+    CO2_rev_yr="CO2_rev_yr", CarbonPremium_DM="CarbonPremium_DM", CarbonPremium_asrec="CarbonPremium_asrec",
+    P_chip_DM_withC="P_chip_payable_DM_withC", P_chip_asrec_withC="P_chip_payable_asrec_withC",
+)
+
 # ------------------------------------------------
 # Core economics (same logic as GAMS)
 # ------------------------------------------------
 def compute_kpis():
-    # Hourly outputs and revenues
-    Qchar_h = Y_char * Qin_DM_h
-    Rchar = P_char * Qchar_h
-    Rel = P_el * E_elec
-    Rheat = P_heat * E_heat
-    Rev = Rchar + Rel + Rheat
-
-    # Hourly non-feedstock costs
-    Clab = n_ops * w_hour
-    Com = OM_hour
-    Cbuy = P_buy * E_buy
-
-    # Max payable chip price at plant gate (€/t dry matter)
-    P_chip_DM = (Rev - (Clab + Com + Cbuy) - MarginTarget) / max(1e-9, Qin_DM_h)
-    P_chip_asrec = P_chip_DM * (1 - MC_asrec)
-
-    # Chipping & handling €/t (dry matter)
-    C_chip_mach = (Tractor_eur_h + PTOChipper_eur_h) / max(1e-9, Chipper_m3_h * BulkDensity)
-    C_hand_mach = Bucket_eur_t + FrontLoader_eur_h / max(1e-9, Handling_tph)
-    Labor_chip_hpt = 1.0 / max(1e-9, Chipper_m3_h * BulkDensity)
-    Labor_hand_hpt = 1.0 / max(1e-9, Handling_tph)
-
-    C_chip = C_chip_mach + (Wage_eur_h * Labor_chip_hpt if (IncludeLabor and IncludeChipOp) else 0.0)
-    C_hand = C_hand_mach + (Wage_eur_h * Labor_hand_hpt if (IncludeLabor and IncludeLoader) else 0.0)
-
-    # Transport €/t·km
-    PayloadTractor = chip_box_m3 * BulkDensity
-    C_tkm_tractor = (
-        Tractor_eur_h / max(1e-9, Tractor_speed * PayloadTractor)
-        + (Wage_eur_h if (IncludeLabor and IncludeDriver) else 0.0)
-        / max(1e-9, Tractor_speed * PayloadTractor)
-    )
-    C_tkm_truck = (
-        C_tkm_truck_mach
-        + (Wage_eur_h if (IncludeLabor and IncludeDriver and AddLaborToTruckTkm) else 0.0)
-        / max(1e-9, Truck_speed * PayloadTruck)
-    )
-
-    # Break-even radius (km one-way) without carbon
-    BE_trac = max(
-        0.0,
-        (P_chip_DM - (C_chip + C_hand + Body_Tractor_eur_t))
-        / max(1e-9, Backhaul * C_tkm_tractor),
-    )
-    BE_truck = max(
-        0.0,
-        (P_chip_DM - (C_chip + C_hand + SemiTrailer_eur_t))
-        / max(1e-9, Backhaul * C_tkm_truck),
-    )
-
-    # Annual KPIs
-    PayableBudget_yr = P_chip_DM * Qin_DM_h * Hop_year
-    CharOutput_yr = Y_char * Qin_DM_h * Hop_year
-    Qin_asrec_yr = Qin_DM_h * Hop_year / max(1e-9, (1 - MC_asrec))
-
-    # Carbon extension
-    CO2_balance_yr = CharOutput_yr * CO2eq_per_tchar
-    CO2_rev_yr = CO2_balance_yr * P_CO2
-    CarbonPremium_DM = Y_char * CO2eq_per_tchar * P_CO2
-    CarbonPremium_asrec = CarbonPremium_DM * (1 - MC_asrec)
+    # formulas live in plantflip_kernel.PLANTFLIP; the session keeps the last scenario
+    # and recomputes only the quantities downstream of inputs that changed this rerun
+    s = st.session_state.setdefault("plantflip_graph", PLANTFLIP.session())
+    s.set(graph_inputs(globals(), SCENARIO_INPUTS))
+    k = {app: s[node] for app, node in KPIS.items()}
 
-    if IncludeCarbonInPayable:
-        P_chip_DM_withC = P_chip_DM + CarbonPremium_DM
-        P_chip_asrec_withC = P_chip_DM_withC * (1 - MC_asrec)
-    else:
-        P_chip_DM_withC = P_chip_DM
-        P_chip_asrec_withC = P_chip_asrec
-
-    k = dict(
-        P_chip_DM=P_chip_DM,
-        P_chip_asrec=P_chip_asrec,
-        C_chip=C_chip,
-        C_hand=C_hand,
-        C_tkm_tractor=C_tkm_tractor,
-        C_tkm_truck=C_tkm_truck,
-        BE_trac=BE_trac,
-        BE_truck=BE_truck,
-        PayableBudget_yr=PayableBudget_yr,
-        CharOutput_yr=CharOutput_yr,
-        Qin_asrec_yr=Qin_asrec_yr,
-        # carbon stuff
-        CO2_balance_yr=CO2_balance_yr,
-        CO2_rev_yr=CO2_rev_yr,
-        CarbonPremium_DM=CarbonPremium_DM,
-        CarbonPremium_asrec=CarbonPremium_asrec,
-        P_chip_DM_withC=P_chip_DM_withC,
-        P_chip_asrec_withC=P_chip_asrec_withC,
-    )
-    return k
+    # carbon premium enters the payable only when toggled on
+    if not IncludeCarbonInPayable:
+        k["P_chip_DM_withC"] = k["P_chip_DM"]
+        k["P_chip_asrec_withC"] = k["P_chip_asrec"]
+    return {name: float(v) for name, v in k.items()}
 
 
 kpis = compute_kpis()
@@ -307,8 +261,8 @@ with tab1:
     with colB:
         max_km = st.number_input("Maximum distance shown (km)", min_value=10, max_value=300,
                                  value=200, step=10)
-        km_step = st.number_input("Step size (km)", min_value=1, max_value=50,
-                                  value=1, step=1)
+        km_step = st.number_input("Step size (km)", min_value=0.01, max_value=50.0,
+                                  value=1.0, step=0.5)
         modes = st.multiselect("Transport modes", ["tractor", "truck"],
                                default=["tractor", "truck"])
 
@@ -316,48 +270,58 @@ with tab1:
             "Show payable price including carbon value", value=True
         )
 
-    # Build distance grid
-    kms = np.arange(0, max_km + km_step, km_step, dtype=float)
-    rows = []
-    for mode in ["tractor", "truck"]:
-        if mode == "tractor":
-            C_surcharge = Body_Tractor_eur_t
-            C_tkm_mode = kpis["C_tkm_tractor"]
-        else:
-            C_surcharge = SemiTrailer_eur_t
-            C_tkm_mode = kpis["C_tkm_truck"]
-
-        for d in kms:
-            # delivered cost per t of chips at plant gate (as-received)
-            cost_asrec = (
-                (kpis["C_chip"] + kpis["C_hand"] + C_surcharge) * (1 - MC_asrec)
-                + Backhaul * C_tkm_mode * d * (1 - MC_asrec)
-            )
-            rows.append(
-                dict(
-                    distance_km=d,
-                    mode=mode,
-                    delivered_cost_chips_eurpt=cost_asrec,
-                )
-            )
-
-    df_dist = pd.DataFrame(rows)
+    # Build distance grid (vectorized) with exact BE crossings per mode
+    kms = np.arange(0, max_km + km_step / 2, km_step, dtype=float)
+    C_fixed = {
+        "tractor": kpis["C_chip"] + kpis["C_hand"] + Body_Tractor_eur_t,
+        "truck": kpis["C_chip"] + kpis["C_hand"] + SemiTrailer_eur_t,
+    }
+    C_tkm = {"tractor": kpis["C_tkm_tractor"], "truck": kpis["C_tkm_truck"]}
+
+    df_dist = cached_call(
+        distance_payable_frame, kms, kpis["P_chip_asrec"], C_fixed, C_tkm, Backhaul, MC_asrec
+    ).rename(columns={
+        "km": "distance_km",
+        "cost_asrec_eurpt": "delivered_cost_chips_eurpt",
+        "payable_asrec_eurpt": "payable_asrec",
+    })
+    df_dist["payable_line"] = "Base payable"
     df_modes = df_dist[df_dist["mode"].isin(modes)]
 
-    # Find approximate BE points (where delivered cost ≈ payable)
-    df_modes["payable_asrec_base"] = kpis["P_chip_asrec"]
-    df_modes["gap_base"] = (df_modes["delivered_cost_chips_eurpt"]
-                            - df_modes["payable_asrec_base"]).abs()
-
-    be_rows = []
-    for mode in modes:
-        sub = df_modes[df_modes["mode"] == mode]
-        if sub.empty:
-            continue
-        idx = sub["gap_base"].idxmin()
-        be_rows.append(sub.loc[idx])
-
-    df_be = pd.DataFrame(be_rows) if be_rows else pd.DataFrame(columns=df_modes.columns)
+    # BE points (closed form): base payable, plus the carbon payable line if shown
+    df_be = df_modes[df_modes["is_be"] == 1]
+    if show_carbon_line:
+        be_rows = []
+        for mode in modes:
+            d_be = float(be_distance(kpis["P_chip_asrec_withC"], C_fixed[mode], C_tkm[mode],
+                                     Backhaul, 1 - MC_asrec))
+            if 0.0 <= d_be <= max_km:
+                be_rows.append(dict(
+                    distance_km=d_be,
+                    mode=mode,
+                    delivered_cost_chips_eurpt=kpis["P_chip_asrec_withC"],
+                    payable_asrec=kpis["P_chip_asrec_withC"],
+                    payable_line="Payable with carbon",
+                ))
+        if be_rows:
+            df_be = pd.concat([df_be, pd.DataFrame(be_rows)], ignore_index=True)
+
+    # Monte Carlo bands: delivered cost per mode on a coarse km grid, payable as a flat band
+    def mc_distance_bands():
+        kms_mc = np.linspace(0.0, float(max_km), 41)
+        base = graph_inputs(globals(), SCENARIO_INPUTS)
+        res = simulate(mc_n, scaled_to(base), base=base, probe=delivered_cost_probe(kms_mc), seed=mc_seed,
+                       outputs=("P_chip_payable_asrec", "P_chip_payable_asrec_withC"))
+        cost = pd.concat([band_frame(res["sketches"][f"cost_asrec_{m}"], kms_mc, "distance_km").assign(mode=m)
+                          for m in MODES], ignore_index=True)
+        return cost, summary_frame(res["sketches"]).set_index("kpi")
+
+    if show_bands:
+        df_cost_band, mc_pay = get_cache().get_or_compute(
+            "Plant_Flipmodel_carbon.mc_distance",
+            (Params.from_namespace(globals(), SCENARIO_INPUTS), mc_n, mc_seed, max_km), mc_distance_bands
+        )
+        df_cost_band = df_cost_band[df_cost_band["mode"].isin(modes)]
 
     with colA:
         # Payable lines
@@ -392,6 +356,19 @@ with tab1:
                 )
             )
 
+        if show_bands:
+            pay_keys = ["P_chip_payable_asrec"]
+            if show_carbon_line and IncludeCarbonInPayable:
+                pay_keys.append("P_chip_payable_asrec_withC")
+            pay_band = pd.DataFrame([
+                dict(distance_km=x, line_type=k, P10=mc_pay.loc[k, "P10"], P90=mc_pay.loc[k, "P90"])
+                for k in pay_keys for x in (df_dist["distance_km"].min(), df_dist["distance_km"].max())
+            ])
+            lines.insert(0, alt.Chart(pay_band).mark_area(opacity=0.15, color="gray").encode(
+                x="distance_km:Q", y="P10:Q", y2="P90:Q", detail="line_type:N",
+                tooltip=["line_type", "P10", "P90"],
+            ))
+
         payable_chart = alt.layer(*lines).properties(height=220)
 
         # Delivered cost curves
@@ -419,15 +396,24 @@ with tab1:
                     color=alt.Color("mode:N", legend=None),
                     tooltip=[
                         "mode",
+                        "payable_line",
                         "distance_km",
                         "delivered_cost_chips_eurpt",
-                        "payable_asrec_base",
                     ],
                 )
             )
         else:
             be_points = alt.Chart()
 
+        if show_bands and not df_cost_band.empty:
+            band_enc = dict(x="distance_km:Q", color=alt.Color("mode:N", legend=None))
+            cost_chart = (
+                alt.Chart(df_cost_band).mark_area(opacity=0.2).encode(
+                    y="P10:Q", y2="P90:Q", tooltip=["distance_km", "mode", "P10", "P50", "P90"], **band_enc)
+                + alt.Chart(df_cost_band).mark_line(strokeDash=[4, 2]).encode(y="P50:Q", **band_enc)
+                + cost_chart
+            )
+
         chart1 = alt.vconcat(payable_chart, cost_chart + be_points, spacing=10)
         st.altair_chart(chart1, use_container_width=True)
 
@@ -458,71 +444,31 @@ with tab2:
             "Include carbon value in payable price in this grid", value=False
         )
 
-    # Build price grid centered on current P_char
+    # Price grid centered on current P_char, evaluated in one vectorized graph call
+    # (cached under the kernel's name: shared with the other plant-first apps)
     idxs = np.arange(points) - (points // 2)
-    Pchar_grid = P_char + idxs * dP
-
-    rows = []
-    for Pc in Pchar_grid:
-        # Revenue at given biochar price (Pc)
-        Qchar_h = Y_char * Qin_DM_h
-        Rchar = Pc * Qchar_h
-        Rel = P_el * E_elec
-        Rheat = P_heat * E_heat
-        Rev = Rchar + Rel + Rheat
-
-        Clab = n_ops * w_hour
-        Com = OM_hour
-        Cbuy = P_buy * E_buy
-
-        pay_DM = (Rev - (Clab + Com + Cbuy) - MarginTarget) / max(1e-9, Qin_DM_h)
-        if add_carbon_in_grid and P_CO2 > 0.0:
-            pay_DM = pay_DM + (Y_char * CO2eq_per_tchar * P_CO2)
-        pay_asrec = pay_DM * (1 - MC_asrec)
-
-        # Transport coefficients (same for all Pc)
-        PayloadTractor = chip_box_m3 * BulkDensity
-        C_tkm_tractor = (
-            Tractor_eur_h / max(1e-9, Tractor_speed * PayloadTractor)
-            + (Wage_eur_h if (IncludeLabor and IncludeDriver) else 0.0)
-            / max(1e-9, Tractor_speed * PayloadTractor)
-        )
-        C_tkm_truck = (
-            C_tkm_truck_mach
-            + (Wage_eur_h if (IncludeLabor and IncludeDriver and AddLaborToTruckTkm) else 0.0)
-            / max(1e-9, Truck_speed * PayloadTruck)
+    df_pchar = cached_call(pchar_grid_frame, graph_inputs(globals(), SCENARIO_INPUTS), P_char + idxs * dP,
+                           with_carbon=bool(add_carbon_in_grid and P_CO2 > 0.0))
+    scen = Params.from_namespace(globals(), SCENARIO_INPUTS)
+
+    # Monte Carlo bands over the same P_char grid (P_char swept, other inputs sampled)
+    def mc_pchar_bands():
+        Pgrid = P_char + (np.arange(points) - (points // 2)) * dP
+        base = graph_inputs(globals(), SCENARIO_INPUTS)
+        sfx = "_withC" if add_carbon_in_grid and P_CO2 > 0.0 else ""
+        res = simulate(mc_n, scaled_to(base), base=base, grid=("P_char", Pgrid), seed=mc_seed,
+                       outputs=(f"P_chip_payable_DM{sfx}", *(f"BE_radius_{m}{sfx}" for m in MODES)))
+        pay = band_frame(res["sketches"][f"P_chip_payable_DM{sfx}"], Pgrid, "Pchar_eurpt")
+        radius = pd.concat([band_frame(res["sketches"][f"BE_radius_{m}{sfx}"], Pgrid, "Pchar_eurpt")
+                            .assign(mode=f"BE_radius_{m}_km") for m in MODES], ignore_index=True)
+        return pay, radius
+
+    if show_bands:
+        df_pay_band, df_radius_band = get_cache().get_or_compute(
+            "Plant_Flipmodel_carbon.mc_pchar",
+            (scen, mc_n, mc_seed, dP, points, add_carbon_in_grid), mc_pchar_bands
         )
 
-        C_chip_mach = (Tractor_eur_h + PTOChipper_eur_h) / max(1e-9, Chipper_m3_h * BulkDensity)
-        C_hand_mach = Bucket_eur_t + FrontLoader_eur_h / max(1e-9, Handling_tph)
-        Labor_chip_hpt = 1.0 / max(1e-9, Chipper_m3_h * BulkDensity)
-        Labor_hand_hpt = 1.0 / max(1e-9, Handling_tph)
-        C_chip = C_chip_mach + (Wage_eur_h * Labor_chip_hpt if (IncludeLabor and IncludeChipOp) else 0.0)
-        C_hand = C_hand_mach + (Wage_eur_h * Labor_hand_hpt if (IncludeLabor and IncludeLoader) else 0.0)
-
-        BE_trac = max(
-            0.0,
-            (pay_DM - (C_chip + C_hand + Body_Tractor_eur_t))
-            / max(1e-9, Backhaul * C_tkm_tractor),
-        )
-        BE_truck = max(
-            0.0,
-            (pay_DM - (C_chip + C_hand + SemiTrailer_eur_t))
-            / max(1e-9, Backhaul * C_tkm_truck),
-        )
-
-        rows.append(
-            dict(
-                Pchar_eurpt=Pc,
-                Pchip_pay_DM_eurptDM=pay_DM,
-                Pchip_pay_asrec_eurpt=pay_asrec,
-                BE_radius_tractor_km=BE_trac,
-                BE_radius_truck_km=BE_truck,
-            )
-        )
-
-    df_pchar = pd.DataFrame(rows)
-
     with col1:
         # Upper chart: payable chip price vs biochar price
         pay_lines = [
@@ -551,6 +497,11 @@ with tab2:
             )
         )
 
+        if show_bands:
+            pay_lines.insert(0, alt.Chart(df_pay_band).mark_area(opacity=0.2).encode(
+                x="Pchar_eurpt:Q", y="P10:Q", y2="P90:Q", tooltip=["Pchar_eurpt", "P10", "P50", "P90"],
+            ))
+
         top = alt.layer(*pay_lines).properties(height=230)
 
         # Lower chart: BE radius vs biochar price (long format)
@@ -577,6 +528,13 @@ with tab2:
             .properties(height=230)
         )
 
+        if show_bands:
+            band_df = df_radius_band[df_radius_band["mode"].isin(radius_df["mode"].unique())]
+            bottom = alt.Chart(band_df).mark_area(opacity=0.2).encode(
+                x="Pchar_eurpt:Q", y="P10:Q", y2="P90:Q", color=alt.Color("mode:N", legend=None),
+                tooltip=["Pchar_eurpt", "mode", "P10", "P50", "P90"],
+            ) + bottom
+
         chart2 = alt.vconcat(top, bottom, spacing=12)
         st.altair_chart(chart2, use_container_width=True)
 
@@ -857,3 +815,8 @@ kpi_cols2[0].metric("Annual chip requirement (t/year, as-received)",
 kpi_cols2[1].metric("Break-even radius tractor (km)", f"{kpis['BE_trac']:.1f}")
 kpi_cols2[2].metric("Break-even radius truck (km)", f"{kpis['BE_truck']:.1f}")
 
+# Shared scenario cache (all sessions of this process; distance / P_char grids also with the other
+# apps via .scenario_cache/ when SCENARIO_CACHE_DISK_MB is set)
+_cs = get_cache().stats()
+st.sidebar.caption(f"Scenario cache: {_cs['hits']} hits / {_cs['misses']} misses · "
+                   f"{_cs['entries']} grids, {_cs['bytes'] / 2**20:.1f} MB")
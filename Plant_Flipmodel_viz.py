@@ -11,6 +11,14 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 
+from plantflip_kernel import PLANTFLIP, distance_payable_frame, graph_inputs, pchar_grid_frame
+from contours import contour_frame
+from plantflip_heatmap import (
+    AXES as HEATMAP_AXES, DISTANCE_AXIS, breakeven_lines, heatmap_grid, heatmap_frame,
+)
+from scenario_cache import cached, cached_call, get_cache
+from sensitivity import SENSITIVITY_KPIS, tornado_frame
+
 try:
     import plotly.graph_objects as go  # for 3D surface (optional)
     PLOTLY_OK = True
@@ -125,181 +133,72 @@ FrontLoader_eur_h   = float(DEFAULTS["FrontLoader_eur_h"])
 Chipper_m3_h        = float(DEFAULTS["Chipper_m3_h"])
 Handling_tph        = float(DEFAULTS["Handling_tph"])
 C_tkm_truck_mach    = float(DEFAULTS["C_tkm_truck_mach"])
-Wage_eur_h          = float(DEFAULTS["WageBase_eur_h"]) * (1 + float(DEFAULTS["OncostFrac"]))
+WageBase            = float(DEFAULTS["WageBase_eur_h"])
+OncostFrac          = float(DEFAULTS["OncostFrac"])
+Wage_eur_h          = WageBase * (1 + OncostFrac)
+
+# Inputs that define a scenario (sidebar values + fixed constants), fed to the formula graph
+SCENARIO_INPUTS = (
+    "P_char", "P_el", "P_heat", "MC_asrec", "MarginTarget", "Qin_DM_h", "Y_char", "E_elec", "E_heat",
+    "Hop_year", "n_ops", "w_hour", "OM_hour", "P_buy", "E_buy", "Backhaul", "Tractor_speed",
+    "Truck_speed", "PayloadTruck", "BulkDensity", "chip_box_m3", "IncludeLabor", "IncludeChipOp",
+    "IncludeLoader", "IncludeDriver", "AddLaborToTruckTkm", "Tractor_eur_h", "PTOChipper_eur_h",
+    "Body_Tractor_eur_t", "SemiTrailer_eur_t", "Bucket_eur_t", "FrontLoader_eur_h", "Chipper_m3_h",
+    "Handling_tph", "C_tkm_truck_mach", "WageBase", "OncostFrac",
+)
+KPIS = (
+    "P_chip_payable_DM", "P_chip_payable_asrec", "C_chip_eurt", "C_handle_eurt", "C_tkm_tractor",
+    "C_tkm_truck", "BE_radius_tractor", "BE_radius_truck", "PayableBudget_yr", "CharOutput_yr", "Qin_asrec_yr",
+)
 
 # -----------------------
 # Core computations
 # -----------------------
 def compute_payable_and_costs():
-    # Hourly revenues
-    Qchar_h = Y_char * Qin_DM_h
-    Rchar   = P_char * Qchar_h
-    Rel     = P_el * E_elec
-    Rheat   = P_heat * E_heat
-    Rev     = Rchar + Rel + Rheat
-
-    # Hourly non-feedstock costs
-    Clab = n_ops * w_hour
-    Com  = OM_hour
-    Cbuy = P_buy * E_buy
-
-    # Payable (EUR/t DM) at plant gate
-    P_chip_payable_DM = (Rev - (Clab + Com + Cbuy) - MarginTarget) / max(1e-9, Qin_DM_h)
-    P_chip_payable_asrec = P_chip_payable_DM * (1 - MC_asrec)
-
-    # Chipping & handling (EUR/t DM)
-    C_chip_eurt_mach = (Tractor_eur_h + PTOChipper_eur_h) / max(1e-9, Chipper_m3_h * BulkDensity)
-    C_hand_eurt_mach = Bucket_eur_t + FrontLoader_eur_h / max(1e-9, Handling_tph)
-    Labor_chip_hpt   = 1.0 / max(1e-9, Chipper_m3_h * BulkDensity)
-    Labor_hand_hpt   = 1.0 / max(1e-9, Handling_tph)
-
-    C_chip_eurt   = C_chip_eurt_mach + (Wage_eur_h * Labor_chip_hpt if (IncludeLabor and IncludeChipOp) else 0.0)
-    C_handle_eurt = C_hand_eurt_mach + (Wage_eur_h * Labor_hand_hpt if (IncludeLabor and IncludeLoader) else 0.0)
-
-    # t-km costs
-    PayloadTractor = chip_box_m3 * BulkDensity
-    C_tkm_tractor = (Tractor_eur_h / max(1e-9, Tractor_speed * PayloadTractor)) \
-                  + ((Wage_eur_h if (IncludeLabor and IncludeDriver) else 0.0) / max(1e-9, Tractor_speed * PayloadTractor))
-    C_tkm_truck = C_tkm_truck_mach \
-                + ((Wage_eur_h if (IncludeLabor and IncludeDriver and AddLaborToTruckTkm) else 0.0) / max(1e-9, Truck_speed * PayloadTruck))
-
-    # BE radius (km, one-way)
-    BE_trac  = max(0.0, (P_chip_payable_DM - (C_chip_eurt + C_handle_eurt + Body_Tractor_eur_t)) / max(1e-9, Backhaul * C_tkm_tractor))
-    BE_truck = max(0.0, (P_chip_payable_DM - (C_chip_eurt + C_handle_eurt + SemiTrailer_eur_t)) / max(1e-9, Backhaul * C_tkm_truck))
-
-    return dict(
-        P_chip_payable_DM=P_chip_payable_DM,
-        P_chip_payable_asrec=P_chip_payable_asrec,
-        C_chip_eurt=C_chip_eurt,
-        C_handle_eurt=C_handle_eurt,
-        C_tkm_tractor=C_tkm_tractor,
-        C_tkm_truck=C_tkm_truck,
-        BE_radius_tractor=BE_trac,
-        BE_radius_truck=BE_truck,
-        PayableBudget_yr=P_chip_payable_DM * Qin_DM_h * Hop_year,
-        CharOutput_yr=Y_char * Qin_DM_h * Hop_year,
-        Qin_asrec_yr=Qin_DM_h * Hop_year / max(1e-9, (1 - MC_asrec))
-    )
+    # formulas live in plantflip_kernel.PLANTFLIP; the session keeps the last scenario
+    # and recomputes only the quantities downstream of inputs that changed this rerun
+    s = st.session_state.setdefault("plantflip_graph", PLANTFLIP.session())
+    s.set(graph_inputs(globals(), SCENARIO_INPUTS))
+    return s.values(KPIS)
 
 kpis = compute_payable_and_costs()
 
 # -----------------------
-# Cached helpers (grids)
+# Cached helpers (grids) — process-wide LRU (scenario_cache.py); the distance and P_char
+# grids are cached under the kernel's name, so the other apps share them
 # -----------------------
-@st.cache_data
 def make_distance_grid(max_km, km_step, MC_asrec, kpis, Backhaul,
                        Body_Tractor_eur_t, SemiTrailer_eur_t):
-    kms = np.arange(0, max_km + km_step, km_step, dtype=float)
-    rows = []
-    for mode in ["tractor", "truck"]:
-        C_surcharge  = Body_Tractor_eur_t if mode == "tractor" else SemiTrailer_eur_t
-        C_tkm_mode   = kpis["C_tkm_tractor"] if mode == "tractor" else kpis["C_tkm_truck"]
-        for d in kms:
-            cost_asrec = (kpis["C_chip_eurt"] + kpis["C_handle_eurt"] + C_surcharge) \
-             + (Backhaul * C_tkm_mode * d)
-            rows.append({
-                "km": d,
-                "mode": mode,
-                "cost_asrec_eurpt": cost_asrec,
-                "payable_asrec_eurpt": kpis["P_chip_payable_asrec"]
-            })
-    df = pd.DataFrame(rows)
-    df["is_be"] = 0
-    for mode in df["mode"].unique():
-        sub = df[df["mode"] == mode].copy()
-        sub["diff"] = (sub["cost_asrec_eurpt"] - sub["payable_asrec_eurpt"]).abs()
-        be_km = float(sub.loc[sub["diff"].idxmin(), "km"])
-        df.loc[(df["mode"] == mode) & (df["km"] == be_km), "is_be"] = 1
-    return df
-
-@st.cache_data
-def make_pchar_grid(P_char, dP, points, params, toggles):
-    # params: dict of constants and current values needed
-    # toggles: dict of boolean choices for labor, etc.
+    # as-received delivered cost (same basis as the payable line); BE = exact crossing
+    kms = np.arange(0, max_km + km_step / 2, km_step, dtype=float)
+    C_fixed = {
+        "tractor": kpis["C_chip_eurt"] + kpis["C_handle_eurt"] + Body_Tractor_eur_t,
+        "truck":   kpis["C_chip_eurt"] + kpis["C_handle_eurt"] + SemiTrailer_eur_t,
+    }
+    C_tkm = {"tractor": kpis["C_tkm_tractor"], "truck": kpis["C_tkm_truck"]}
+    return cached_call(distance_payable_frame, kms, kpis["P_chip_payable_asrec"], C_fixed, C_tkm, Backhaul, MC_asrec)
+
+def make_pchar_grid(P_char, dP, points, inputs):
+    # inputs: PLANTFLIP graph inputs of the current scenario; whole grid in one call
     idxs = np.arange(points) - (points // 2)
-    Pgrid = P_char + idxs * dP
-    rows = []
-    for Pc in Pgrid:
-        # Hourly revenues
-        R_el_h = params["P_el"] * params["E_elec"]
-        R_ht_h = params["P_heat"] * params["E_heat"]
-        Rev_h  = Pc * (params["Y_char"] * params["Qin_DM_h"]) + R_el_h + R_ht_h
-        # Payable €/t DM
-        pay_DM   = (Rev_h - (params["n_ops"]*params["w_hour"] + params["OM_hour"] + params["P_buy"]*params["E_buy"]) - params["MarginTarget"]) / max(1e-9, params["Qin_DM_h"])
-        pay_asrc = pay_DM * (1 - params["MC_asrec"])
-
-        # t-km costs
-        PayloadTractor = params["chip_box_m3"] * params["BulkDensity"]
-        C_tkm_tractor = (params["Tractor_eur_h"] / max(1e-9, params["Tractor_speed"] * PayloadTractor)) \
-                      + ((params["Wage_eur_h"] if (toggles["IncludeLabor"] and toggles["IncludeDriver"]) else 0.0) / max(1e-9, params["Tractor_speed"] * PayloadTractor))
-        C_tkm_truck = params["C_tkm_truck_mach"] \
-                    + ((params["Wage_eur_h"] if (toggles["IncludeLabor"] and toggles["IncludeDriver"] and toggles["AddLaborToTruckTkm"]) else 0.0) / max(1e-9, params["Truck_speed"] * params["PayloadTruck"]))
-
-        # Chipping + handling €/t DM
-        C_chip_eurt_mach = (params["Tractor_eur_h"] + params["PTOChipper_eur_h"]) / max(1e-9, params["Chipper_m3_h"] * params["BulkDensity"])
-        C_hand_eurt_mach = params["Bucket_eur_t"] + params["FrontLoader_eur_h"] / max(1e-9, params["Handling_tph"])
-        Labor_chip_hpt   = 1.0 / max(1e-9, params["Chipper_m3_h"] * params["BulkDensity"])
-        Labor_hand_hpt   = 1.0 / max(1e-9, params["Handling_tph"])
-
-        C_chip_eurt = C_chip_eurt_mach + (params["Wage_eur_h"] * Labor_chip_hpt if (toggles["IncludeLabor"] and toggles["IncludeChipOp"]) else 0.0)
-        C_handle_eurt = C_hand_eurt_mach + (params["Wage_eur_h"] * Labor_hand_hpt if (toggles["IncludeLabor"] and toggles["IncludeLoader"]) else 0.0)
-
-        BE_trac = max(0.0, (pay_DM - (C_chip_eurt + C_handle_eurt + params["Body_Tractor_eur_t"])) / max(1e-9, params["Backhaul"]*C_tkm_tractor))
-        BE_truck = max(0.0, (pay_DM - (C_chip_eurt + C_handle_eurt + params["SemiTrailer_eur_t"])) / max(1e-9, params["Backhaul"]*C_tkm_truck))
-
-        rows.append({
-            "Pchar_eurpt": Pc,
-            "Pchip_pay_DM_eurptDM": pay_DM,
-            "Pchip_pay_asrec_eurpt": pay_asrc,
-            "BE_radius_tractor_km": BE_trac,
-            "BE_radius_truck_km": BE_truck
-        })
-    return pd.DataFrame(rows)
-
-@st.cache_data
-def make_be_heatmap(P_char_center, dP, nP, MC_min, MC_max, nMC, base_params, toggles):
-    # grid over P_char and MC, compute BE radius for chosen mode
-    Ps  = np.linspace(P_char_center - (nP//2)*dP, P_char_center + (nP//2)*dP, nP)
-    MCs = np.linspace(MC_min, MC_max, nMC)
-    df_rows = []
-    for mc in MCs:
-        for Pc in Ps:
-            # hourly revenues
-            R_el_h = base_params["P_el"] * base_params["E_elec"]
-            R_ht_h = base_params["P_heat"] * base_params["E_heat"]
-            Rev_h  = Pc * (base_params["Y_char"] * base_params["Qin_DM_h"]) + R_el_h + R_ht_h
-            pay_DM = (Rev_h - (base_params["n_ops"]*base_params["w_hour"] + base_params["OM_hour"] + base_params["P_buy"]*base_params["E_buy"]) - base_params["MarginTarget"]) / max(1e-9, base_params["Qin_DM_h"])
-
-            # chipping + handling €/t DM
-            C_chip_eurt_mach = (base_params["Tractor_eur_h"] + base_params["PTOChipper_eur_h"]) / max(1e-9, base_params["Chipper_m3_h"] * base_params["BulkDensity"])
-            C_hand_eurt_mach = base_params["Bucket_eur_t"] + base_params["FrontLoader_eur_h"] / max(1e-9, base_params["Handling_tph"])
-            Labor_chip_hpt   = 1.0 / max(1e-9, base_params["Chipper_m3_h"] * base_params["BulkDensity"])
-            Labor_hand_hpt   = 1.0 / max(1e-9, base_params["Handling_tph"])
-
-            C_chip_eurt = C_chip_eurt_mach + (base_params["Wage_eur_h"] * Labor_chip_hpt if (toggles["IncludeLabor"] and toggles["IncludeChipOp"]) else 0.0)
-            C_handle_eurt = C_hand_eurt_mach + (base_params["Wage_eur_h"] * Labor_hand_hpt if (toggles["IncludeLabor"] and toggles["IncludeLoader"]) else 0.0)
-
-            # t-km for tractor & truck
-            PayloadTractor = base_params["chip_box_m3"] * base_params["BulkDensity"]
-            C_tkm_tractor = (base_params["Tractor_eur_h"] / max(1e-9, base_params["Tractor_speed"] * PayloadTractor)) \
-                          + ((base_params["Wage_eur_h"] if (toggles["IncludeLabor"] and toggles["IncludeDriver"]) else 0.0) / max(1e-9, base_params["Tractor_speed"] * PayloadTractor))
-            C_tkm_truck = base_params["C_tkm_truck_mach"] \
-                        + ((base_params["Wage_eur_h"] if (toggles["IncludeLabor"] and toggles["IncludeDriver"] and toggles["AddLaborToTruckTkm"]) else 0.0) / max(1e-9, base_params["Truck_speed"] * base_params["PayloadTruck"]))
-
-            BE_trac = max(0.0, (pay_DM - (C_chip_eurt + C_handle_eurt + base_params["Body_Tractor_eur_t"])) / max(1e-9, base_params["Backhaul"]*C_tkm_tractor))
-            BE_truck = max(0.0, (pay_DM - (C_chip_eurt + C_handle_eurt + base_params["SemiTrailer_eur_t"])) / max(1e-9, base_params["Backhaul"]*C_tkm_truck))
-
-            df_rows.append(dict(P_char=Pc, MC=mc, BE_trac=BE_trac, BE_truck=BE_truck))
-    return pd.DataFrame(df_rows)
+    return cached_call(pchar_grid_frame, inputs, P_char + idxs * dP, with_carbon=False)
+
+@cached("Plant_Flipmodel_viz.make_heatmap")
+def make_heatmap(base, x, x_values, y, y_values, metric, mode, distance_km, with_carbon):
+    # whole surface in one broadcast pass (see plantflip_heatmap.py)
+    Z = heatmap_grid(base, x, x_values, y, y_values, metric=metric, mode=mode,
+                     distance_km=distance_km, with_carbon=with_carbon)
+    return heatmap_frame(x, x_values, y, y_values, Z)
 
 # -----------------------
 # Tabs
 # -----------------------
-tab1, tab2, tab3, tab4 = st.tabs([
+tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "Distance View",
     "Price Sensitivity",
     "Heatmap & 3D Surface",
-    "Cost Breakdown"
+    "Cost Breakdown",
+    "Tornado"
 ])
 
 # -----------------------
@@ -311,7 +210,7 @@ with tab1:
     with colB:
         st.markdown("**Options**")
         max_km = st.number_input("Max distance (km)", min_value=10, max_value=300, value=200, step=10, key="maxkm")
-        km_step = st.number_input("Step (km)", min_value=1, max_value=50, value=1, step=1, key="kmstep")
+        km_step = st.number_input("Step (km)", min_value=0.01, max_value=50.0, value=1.0, step=0.5, key="kmstep")
         show_dm = st.checkbox("Show payable €/t DM", value=False, key="showdm")
         show_asrec = st.checkbox("Show payable €/t as-received", value=True, key="showasrec")
         show_modes_dist = st.multiselect("Show modes", ["tractor","truck"], default=["tractor","truck"], key="modes_distance_tab1")
@@ -416,26 +315,7 @@ with tab2:
         if not needed.issubset(df_pchar.columns):
             use_csv_pchar = False
     if not use_csv_pchar:
-        params = dict(
-            P_el=P_el, P_heat=P_heat, E_elec=E_elec, E_heat=E_heat,
-            Y_char=Y_char, Qin_DM_h=Qin_DM_h, n_ops=n_ops, w_hour=w_hour,
-            OM_hour=OM_hour, P_buy=P_buy, E_buy=E_buy, MarginTarget=MarginTarget,
-            MC_asrec=MC_asrec,
-            Tractor_eur_h=Tractor_eur_h, PTOChipper_eur_h=PTOChipper_eur_h,
-            Body_Tractor_eur_t=Body_Tractor_eur_t, SemiTrailer_eur_t=SemiTrailer_eur_t,
-            Bucket_eur_t=Bucket_eur_t, FrontLoader_eur_h=FrontLoader_eur_h,
-            Tractor_speed=Tractor_speed, Truck_speed=Truck_speed,
-            Chipper_m3_h=Chipper_m3_h, BulkDensity=BulkDensity,
-            Handling_tph=Handling_tph, PayloadTruck=PayloadTruck,
-            C_tkm_truck_mach=C_tkm_truck_mach, Backhaul=Backhaul,
-            Wage_eur_h=Wage_eur_h, chip_box_m3=chip_box_m3
-        )
-        toggles = dict(
-            IncludeLabor=IncludeLabor, IncludeChipOp=IncludeChipOp,
-            IncludeLoader=IncludeLoader, IncludeDriver=IncludeDriver,
-            AddLaborToTruckTkm=AddLaborToTruckTkm
-        )
-        df_pchar = make_pchar_grid(P_char, dP, points, params, toggles)
+        df_pchar = make_pchar_grid(P_char, dP, points, graph_inputs(globals(), SCENARIO_INPUTS))
 
     with col1:
         # Payable lines (DM and as-received)
@@ -492,6 +372,14 @@ with tab3:
     st.subheader("3) Sensitivity Heatmap ")
 
     colh1, colh2 = st.columns([2,1], gap="large")
+    axis_defaults = dict(
+        P_char=(P_char - 250.0, P_char + 250.0),
+        MC_asrec=(0.15, 0.45),
+        P_CO2=(0.0, 200.0),
+        Qin_DM_h=(0.5 * Qin_DM_h, 1.5 * Qin_DM_h),
+        distance_km=(0.0, 200.0),
+    )
+    axis_names = list(HEATMAP_AXES)
     with colh2:
         metric_choice = st.selectbox(
             "Heatmap metric",
@@ -499,132 +387,116 @@ with tab3:
             index=0,
             help="Gap = payable_as-received − delivered_cost-as-received at the chosen distance."
         )
-        dP_hm  = st.number_input("ΔP_char grid step (€/t)", min_value=5, max_value=200, value=50, step=5, key="hm_dP")
-        nP_hm  = st.slider("Points across P_char", min_value=5, max_value=31, value=11, step=2, key="hm_nP")
-
-        MC_min = st.slider("MC min", 0.0, 0.6, 0.15, 0.01, key="hm_mcmin")
-        MC_max = st.slider("MC max", 0.0, 0.6, 0.45, 0.01, key="hm_mcmax")
-        nMC    = st.slider("MC points", min_value=5, max_value=31, value=11, step=2, key="hm_nmc")
+        x_axis = st.selectbox("X axis", axis_names, index=0, format_func=HEATMAP_AXES.get, key="hm_x")
+        x_lo, x_hi = axis_defaults[x_axis]
+        x_min = st.number_input("X min", value=float(x_lo), key=f"hm_xmin_{x_axis}")
+        x_max = st.number_input("X max", value=float(x_hi), key=f"hm_xmax_{x_axis}")
+        nX    = st.slider("X points", min_value=5, max_value=201, value=11, step=2, key="hm_nx")
+
+        y_axis = st.selectbox("Y axis", axis_names, index=1, format_func=HEATMAP_AXES.get, key="hm_y")
+        y_lo, y_hi = axis_defaults[y_axis]
+        y_min = st.number_input("Y min", value=float(y_lo), key=f"hm_ymin_{y_axis}")
+        y_max = st.number_input("Y max", value=float(y_hi), key=f"hm_ymax_{y_axis}")
+        nY    = st.slider("Y points", min_value=5, max_value=201, value=11, step=2, key="hm_ny")
 
         mode_for_map = st.selectbox("Mode for transport", ["tractor","truck"], index=1, key="hm_mode")
+        carbon_hm = st.checkbox("Include carbon premium in payable", value=False, key="hm_carbon",
+                                help="Needed for the carbon price axis to have an effect.")
 
         dist_sel_hm  = st.number_input(
             "Distance for gap (km one-way)",
             min_value=0.0, value=float(max(10.0, kpis["BE_radius_truck"])), step=5.0, key="hm_dist",
-            help="Only used when metric = Cost gap. Try BE radius ±20–50 km to see contrast."
+            help="Only used when metric = Cost gap and distance is not an axis. Try BE radius ±20–50 km to see contrast."
         )
 
-    # Base params & toggles
+    # Base params in kernel names (plantflip_kernel.DEFAULTS)
     base = dict(
-        P_el=P_el, P_heat=P_heat, E_elec=E_elec, E_heat=E_heat,
+        P_char=P_char, P_el=P_el, P_heat=P_heat, E_elec_kW=E_elec, E_heat_kW=E_heat,
         Y_char=Y_char, Qin_DM_h=Qin_DM_h, n_ops=n_ops, w_hour=w_hour,
-        OM_hour=OM_hour, P_buy=P_buy, E_buy=E_buy, MarginTarget=MarginTarget,
+        OM_hour=OM_hour, P_buy=P_buy, E_buy_kWh=E_buy, MarginTarget=MarginTarget,
+        MC_asrec=MC_asrec,
         Tractor_eur_h=Tractor_eur_h, PTOChipper_eur_h=PTOChipper_eur_h,
         Body_Tractor_eur_t=Body_Tractor_eur_t, SemiTrailer_eur_t=SemiTrailer_eur_t,
         Bucket_eur_t=Bucket_eur_t, FrontLoader_eur_h=FrontLoader_eur_h,
-        Tractor_speed=Tractor_speed, Truck_speed=Truck_speed,
-        Chipper_m3_h=Chipper_m3_h, BulkDensity=BulkDensity,
-        Handling_tph=Handling_tph, PayloadTruck=PayloadTruck,
-        C_tkm_truck_mach=C_tkm_truck_mach, Backhaul=Backhaul,
-        Wage_eur_h=Wage_eur_h, chip_box_m3=chip_box_m3
+        Tractor_speed_kmh=Tractor_speed, Truck_speed_kmh=Truck_speed,
+        Chipper_m3_h=Chipper_m3_h, BulkDensity_t_m3=BulkDensity,
+        Handling_tph=Handling_tph, PayloadTruck_t=PayloadTruck,
+        C_tkm_truck_mach=C_tkm_truck_mach, Backhaul=Backhaul, chip_box_m3=chip_box_m3,
+        WageBase_eur_h=float(DEFAULTS["WageBase_eur_h"]), OncostFrac=float(DEFAULTS["OncostFrac"]),
+        IncludeLabor=float(IncludeLabor), IncludeChipOp=float(IncludeChipOp),
+        IncludeLoader=float(IncludeLoader), IncludeDriver=float(IncludeDriver),
+        AddLaborToTruckTkm=float(AddLaborToTruckTkm),
     )
-    tog = dict(
-        IncludeLabor=IncludeLabor, IncludeChipOp=IncludeChipOp,
-        IncludeLoader=IncludeLoader, IncludeDriver=IncludeDriver,
-        AddLaborToTruckTkm=AddLaborToTruckTkm
-    )
-
-    # Grid
-    Ps  = np.linspace(P_char - (nP_hm//2)*dP_hm, P_char + (nP_hm//2)*dP_hm, nP_hm)
-    MCs = np.linspace(MC_min, MC_max, nMC)
-
-    def delivered_gap_or_be(Pc, mc):
-        # payable
-        R_el_h = base["P_el"] * base["E_elec"]
-        R_ht_h = base["P_heat"] * base["E_heat"]
-        Rev_h  = Pc * (base["Y_char"] * base["Qin_DM_h"]) + R_el_h + R_ht_h
-        pay_DM = (Rev_h - (base["n_ops"]*base["w_hour"] + base["OM_hour"] + base["P_buy"]*base["E_buy"]) - base["MarginTarget"]) / max(1e-9, base["Qin_DM_h"])
-        pay_asrc = pay_DM * (1 - mc)
-
-        # chip/handle (€/t DM → as-rec)
-        C_chip_mach = (base["Tractor_eur_h"] + base["PTOChipper_eur_h"]) / max(1e-9, base["Chipper_m3_h"] * base["BulkDensity"])
-        C_hand_mach = base["Bucket_eur_t"] + base["FrontLoader_eur_h"] / max(1e-9, base["Handling_tph"])
-        L_chip = 1.0 / max(1e-9, base["Chipper_m3_h"] * base["BulkDensity"])
-        L_hand = 1.0 / max(1e-9, base["Handling_tph"])
-        C_chip_DM = C_chip_mach + (base["Wage_eur_h"] * L_chip if (tog["IncludeLabor"] and tog["IncludeChipOp"]) else 0.0)
-        C_hand_DM = C_hand_mach + (base["Wage_eur_h"] * L_hand if (tog["IncludeLabor"] and tog["IncludeLoader"]) else 0.0)
-
-        surcharge = base["Body_Tractor_eur_t"] if mode_for_map=="tractor" else base["SemiTrailer_eur_t"]
-        C0_DM = C_chip_DM + C_hand_DM + surcharge
-        C0_asrc = C0_DM * (1 - mc)
-
-        # transport €/t as-rec at chosen dist
-        payload_trac  = base["chip_box_m3"] * base["BulkDensity"]
-        C_tkm_trac  = (base["Tractor_eur_h"] / max(1e-9, base["Tractor_speed"] * payload_trac)) \
-                    + ((base["Wage_eur_h"] if (tog["IncludeLabor"] and tog["IncludeDriver"]) else 0.0) / max(1e-9, base["Tractor_speed"] * payload_trac))
-        C_tkm_truck = base["C_tkm_truck_mach"] \
-                    + ((base["Wage_eur_h"] if (tog["IncludeLabor"] and tog["IncludeDriver"] and tog["AddLaborToTruckTkm"]) else 0.0) / max(1e-9, base["Truck_speed"] * base["PayloadTruck"]))
-        C_tkm_mode  = C_tkm_trac if mode_for_map=="tractor" else C_tkm_truck
-
-        if metric_choice.startswith("Cost gap"):
-            C_trans_asrc = base["Backhaul"] * C_tkm_mode * dist_sel_hm * (1 - mc)
-            gap = pay_asrc - (C0_asrc + C_trans_asrc)
-            return gap
-        else:
-            denom = max(1e-9, base["Backhaul"] * C_tkm_mode)
-            be_km = max(0.0, (pay_DM - C0_DM) / denom)   # DM basis
-            return be_km
 
-    rows = []
-    for mc in MCs:
-        for Pc in Ps:
-            rows.append({"P_char": np.round(Pc, 3), "MC": np.round(mc, 3), "value": delivered_gap_or_be(Pc, mc)})
-
-    df_map = pd.DataFrame(rows)
-
-    # Treat axes as discrete grid cells so Altair doesn't aggregate
-    df_map["P_char_lab"] = df_map["P_char"].astype(str)
-    df_map["MC_lab"]     = df_map["MC"].map(lambda x: f"{x:.2f}")
-
-    with colh1:
-        if metric_choice.startswith("Cost gap"):
-            title = f"Cost gap (€/t as-received) at {dist_sel_hm:.0f} km — {mode_for_map}"
-            # Center color at 0 to highlight affordable vs unaffordable
-            vmax = float(np.nanmax(np.abs(df_map["value"]))) or 1.0
-            c_scale = alt.Scale(scheme="redblue", domain=[-vmax, 0, vmax])
-            legend_title = "Gap (€/t)"
-            note = "Positive = affordable; Zero = break-even; Negative = unaffordable."
-        else:
-            title = f"Break-even radius (km, DM basis) — {mode_for_map}"
-            c_scale = alt.Scale(scheme="blues")
-            legend_title = "BE radius (km)"
-            note = "BE radius here is independent of MC with this model."
-
-        hm = (
-            alt.Chart(df_map)
-            .mark_rect()
-            .encode(
-                x=alt.X("P_char_lab:O", title="Biochar price (€/t)"),
-                y=alt.Y("MC_lab:O", title="Moisture content (fraction)"),
-                color=alt.Color("value:Q", title=legend_title, scale=c_scale),
-                tooltip=[
-                    alt.Tooltip("P_char:Q", title="P_char (€/t)"),
-                    alt.Tooltip("MC:Q", title="MC"),
-                    alt.Tooltip("value:Q", title=legend_title)
-                ],
+    if x_axis == y_axis:
+        with colh1:
+            st.warning("Pick two different axes for the heatmap.")
+    else:
+        Xs = np.linspace(x_min, x_max, nX)
+        Ys = np.linspace(y_min, y_max, nY)
+        metric_key = "gap" if metric_choice.startswith("Cost gap") else "be"
+        df_map = make_heatmap(base, x_axis, Xs, y_axis, Ys, metric_key, mode_for_map,
+                              dist_sel_hm, carbon_hm)
+
+        # Grid cells as quantitative rects (x0..x1, y0..y1) so the BE line can share the axes
+        dx = (Xs[-1] - Xs[0]) / (nX - 1) or 1.0
+        dy = (Ys[-1] - Ys[0]) / (nY - 1) or 1.0
+        df_map["x0"], df_map["x1"] = df_map[x_axis] - dx / 2, df_map[x_axis] + dx / 2
+        df_map["y0"], df_map["y1"] = df_map[y_axis] - dy / 2, df_map[y_axis] + dy / 2
+
+        # Break-even isoline extracted server-side (polyline vertices, not the grid)
+        Z_map = df_map["value"].to_numpy().reshape(nY, nX)
+        df_be = contour_frame(breakeven_lines(x_axis, Xs, y_axis, Ys, Z_map, metric_key, dist_sel_hm),
+                              x_axis, y_axis)
+
+        with colh1:
+            if metric_key == "gap":
+                at = "" if DISTANCE_AXIS in (x_axis, y_axis) else f" at {dist_sel_hm:.0f} km"
+                title = f"Cost gap (€/t as-received){at} — {mode_for_map}"
+                # Center color at 0 to highlight affordable vs unaffordable
+                vmax = float(np.nanmax(np.abs(df_map["value"]))) or 1.0
+                c_scale = alt.Scale(scheme="redblue", domain=[-vmax, 0, vmax])
+                legend_title = "Gap (€/t)"
+                note = "Positive = affordable; Zero = break-even; Negative = unaffordable."
+            else:
+                title = f"Break-even radius (km, DM basis) — {mode_for_map}"
+                c_scale = alt.Scale(scheme="blues")
+                legend_title = "BE radius (km)"
+                note = ("BE radius here is independent of MC and distance with this model. "
+                        "Black line: BE radius = distance (break-even).")
+
+            hm = (
+                alt.Chart(df_map)
+                .mark_rect()
+                .encode(
+                    x=alt.X("x0:Q", title=HEATMAP_AXES[x_axis], scale=alt.Scale(zero=False, nice=False)),
+                    x2="x1:Q",
+                    y=alt.Y("y0:Q", title=HEATMAP_AXES[y_axis], scale=alt.Scale(zero=False, nice=False)),
+                    y2="y1:Q",
+                    color=alt.Color("value:Q", title=legend_title, scale=c_scale),
+                    tooltip=[
+                        alt.Tooltip(f"{x_axis}:Q", title=x_axis),
+                        alt.Tooltip(f"{y_axis}:Q", title=y_axis),
+                        alt.Tooltip("value:Q", title=legend_title)
+                    ],
+                )
             )
-            .properties(title=title, height=420)
-        )
-        st.altair_chart(hm, use_container_width=True)
-        st.caption(note)
+            be_line = (
+                alt.Chart(df_be)
+                .mark_line(color="black", strokeWidth=2)
+                .encode(x=f"{x_axis}:Q", y=f"{y_axis}:Q", detail="line:N", order="k:Q")
+            )
+            st.altair_chart(alt.layer(hm, be_line).properties(title=title, height=420),
+                            use_container_width=True)
+            st.caption(note)
 
-    st.download_button(
-        "Download heatmap grid CSV",
-        data=df_map[["P_char","MC","value"]].to_csv(index=False),
-        file_name=("gap_heatmap_grid.csv" if metric_choice.startswith("Cost gap") else "be_radius_heatmap_grid.csv"),
-        mime="text/csv",
-        key="dl_heatmap_fixed2"
-    )
+        st.download_button(
+            "Download heatmap grid CSV",
+            data=df_map[[x_axis, y_axis, "value"]].to_csv(index=False),
+            file_name=("gap_heatmap_grid.csv" if metric_key == "gap" else "be_radius_heatmap_grid.csv"),
+            mime="text/csv",
+            key="dl_heatmap_fixed2"
+        )
 
 # -----------------------
 # TAB 4: Cost Breakdown (stacked bars at selected distance)
@@ -673,6 +545,37 @@ with tab4:
     totals = df_cb.groupby("mode", as_index=False)["value"].sum()
     st.dataframe(totals.rename(columns={"value":"Total delivered cost (€/t as-rec)"}))
 
+# -----------------------
+# TAB 5: Tornado (exact derivatives, all inputs in one pass -> sensitivity.py)
+# -----------------------
+with tab5:
+    st.subheader("5) Tornado: which inputs move the KPI most")
+    colt1, colt2 = st.columns([2,1], gap="large")
+    with colt2:
+        tor_kpi = st.selectbox("KPI", SENSITIVITY_KPIS, index=SENSITIVITY_KPIS.index("BE_radius_truck"), key="tor_kpi")
+        tor_swing = st.slider("Input swing (± %)", 1, 50, 10, key="tor_swing") / 100.0
+        tor_top = st.slider("Inputs shown", 5, 30, 12, key="tor_top")
+
+    df_tor = tornado_frame(tor_kpi, graph_inputs(globals(), SCENARIO_INPUTS), swing=tor_swing, top=tor_top)
+    base_val = df_tor.attrs["value"]
+
+    with colt1:
+        bars = (
+            alt.Chart(df_tor)
+            .mark_bar()
+            .encode(
+                y=alt.Y("input:N", sort=list(df_tor["input"]), title=None),
+                x=alt.X("low:Q", title=f"{tor_kpi} at input ×(1 ± {tor_swing:.0%}) (linearised)"),
+                x2="high:Q",
+                color=alt.condition("datum.elasticity > 0", alt.value("#2a9d8f"), alt.value("#e76f51")),
+                tooltip=["input", "base", "gradient", "elasticity", "low", "high"]
+            )
+        )
+        rule = alt.Chart(pd.DataFrame({"x": [base_val]})).mark_rule(strokeDash=[4,4]).encode(x="x:Q")
+        st.altair_chart((bars + rule).properties(height=28 * len(df_tor) + 40), use_container_width=True)
+    st.caption("Green: KPI rises with the input; red: falls. Elasticity = % change of the KPI per % change of the input.")
+    st.dataframe(df_tor.round(4), use_container_width=True)
+
 # -----------------------
 # KPIs footer
 # -----------------------
@@ -685,3 +588,9 @@ k4, k5, k6 = st.columns(3)
 k4.metric("BE radius tractor (km)", f"{kpis['BE_radius_tractor']:.1f}")
 k5.metric("BE radius truck (km)", f"{kpis['BE_radius_truck']:.1f}")
 k6.metric("As-received intake needed (t/yr)", f"{kpis['Qin_asrec_yr']:.0f}")
+
+# Shared scenario cache (all sessions of this process; distance / P_char grids also with the other
+# apps via .scenario_cache/ when SCENARIO_CACHE_DISK_MB is set)
+_cs = get_cache().stats()
+st.sidebar.caption(f"Scenario cache: {_cs['hits']} hits / {_cs['misses']} misses · "
+                   f"{_cs['entries']} grids, {_cs['bytes'] / 2**20:.1f} MB")
@@ -1,25 +1,35 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from contours import breakeven, polyline_xy
+from grid_surface import GridSurface
+
 st.set_page_config(page_title="Biochar Profit (from GAMS CSVs)", layout="wide")
 st.title("Biochar Profitability — GAMS Results Visualization")
 
-# Load CSVs (adjust paths if your CSVs are elsewhere)
-surf = pd.read_csv("profit_surface.csv").dropna()
+@st.cache_resource
+def load_surface(path, mtime):
+    """Grid-indexed surface, built once per file version (reruns only index into it)."""
+    return GridSurface.load(path)
+
+# Load surface: compact grid from profit_surface.py if present, else the GAMS CSV
+surf_path = "profit_surface.npz" if os.path.exists("profit_surface.npz") else "profit_surface.csv"
+surf = load_surface(surf_path, os.path.getmtime(surf_path))
 curve_d = pd.read_csv("curve_distance.csv")
 curve_p = pd.read_csv("curve_price.csv")
 
 # Ensure numeric types
-surf = surf.astype({"price_eur_per_t": float, "dist_km": float, "profit_eur": float})
 curve_d = curve_d.astype({"dist_km": float, "profit_eur": float})
 curve_p = curve_p.astype({"price_eur_per_t": float, "profit_eur": float})
 
 with st.sidebar:
     st.header("Filter range")
-    price_min, price_max = float(surf["price_eur_per_t"].min()), float(surf["price_eur_per_t"].max())
-    dist_min,  dist_max  = float(surf["dist_km"].min()),          float(surf["dist_km"].max())
+    price_min, price_max = surf.x.lo, surf.x.hi
+    dist_min,  dist_max  = surf.y.lo, surf.y.hi
 
     price_range = st.slider("Price range (€/t)", price_min, price_max, (price_min, price_max), step=25.0)
     dist_range  = st.slider("Distance range (km)", dist_min, dist_max, (dist_min, dist_max), step=10.0)
@@ -29,47 +39,45 @@ with st.sidebar:
     dist_slice  = st.slider("Slice distance for Profit vs Price (km)",
                             int(dist_min), int(dist_max), int((dist_min+dist_max)//2), step=10)
 
-# Filter for heatmap
-surf_f = surf[
-    surf["price_eur_per_t"].between(*price_range) &
-    surf["dist_km"].between(*dist_range)
-]
+# Filter for heatmap (index ranges on the grid, no table scan)
+surf_f = surf.window(price_range, dist_range)
 
 tab1, tab2, tab3 = st.tabs(["Surface (Price × Distance)", "Profit vs Distance", "Profit vs Price"])
 
 with tab1:
     st.subheader("Profit Surface (from GAMS)")
-    fig = px.density_heatmap(
-        surf_f, x="price_eur_per_t", y="dist_km", z="profit_eur",
-        histfunc="avg", color_continuous_scale="RdYlGn",
-        labels={"price_eur_per_t":"Biochar Price (€/t)","dist_km":"Distance (km)","profit_eur":"Profit (€)"}
-    )
-    # Break-even contour
-    fig.add_trace(go.Contour(
-        x=surf_f["price_eur_per_t"], y=surf_f["dist_km"], z=surf_f["profit_eur"],
-        contours=dict(start=0, end=0, size=1, coloring="lines"),
-        showscale=False, line=dict(color="black", width=2), name="Break-even"
-    ))
-    st.plotly_chart(fig, use_container_width=True)
+    if surf_f is None:
+        st.warning("No grid points in the selected range.")
+    else:
+        fig = px.imshow(
+            surf_f.z.T, x=surf_f.x.values, y=surf_f.y.values, origin="lower", aspect="auto",
+            color_continuous_scale="RdYlGn",
+            labels={"x":"Biochar Price (€/t)","y":"Distance (km)","color":"Profit (€)"}
+        )
+        # Break-even line, extracted here (a few vertices instead of the whole grid)
+        be_x, be_y = polyline_xy(breakeven(surf_f))
+        fig.add_trace(go.Scatter(
+            x=be_x, y=be_y, mode="lines",
+            line=dict(color="black", width=2), name="Break-even", showlegend=False
+        ))
+        st.plotly_chart(fig, use_container_width=True)
 
 with tab2:
     st.subheader(f"Profit vs Distance (price = {price_slice} €/t)")
-    df = surf[surf["price_eur_per_t"] == price_slice].sort_values("dist_km")
-    if df.empty:  # fall back to nearest values if exact not present
-        df = surf.iloc[(surf["price_eur_per_t"]-price_slice).abs().argsort()].head(2)
-        df = df.sort_values("dist_km")
-    fig2 = px.line(df, x="dist_km", y="profit_eur", markers=True,
-                   labels={"dist_km":"Distance (km)","profit_eur":"Profit (€)"})
+    s_dist = surf.slice_x(price_slice)  # grid row, or interpolated between grid prices
+    if surf.x.index(price_slice) < 0:
+        st.caption("Price between grid values: linear interpolation.")
+    fig2 = px.line(x=s_dist.index, y=s_dist.values, markers=True,
+                   labels={"x":"Distance (km)","y":"Profit (€)"})
     st.plotly_chart(fig2, use_container_width=True)
 
 with tab3:
     st.subheader(f"Profit vs Price (distance = {dist_slice} km)")
-    df2 = surf[surf["dist_km"] == dist_slice].sort_values("price_eur_per_t")
-    if df2.empty:
-        df2 = surf.iloc[(surf["dist_km"]-dist_slice).abs().argsort()].head(2)
-        df2 = df2.sort_values("price_eur_per_t")
-    fig3 = px.line(df2, x="price_eur_per_t", y="profit_eur", markers=True,
-                   labels={"price_eur_per_t":"Price (€/t)","profit_eur":"Profit (€)"})
+    s_price = surf.slice_y(dist_slice)
+    if surf.y.index(dist_slice) < 0:
+        st.caption("Distance between grid values: linear interpolation.")
+    fig3 = px.line(x=s_price.index, y=s_price.values, markers=True,
+                   labels={"x":"Price (€/t)","y":"Profit (€)"})
     st.plotly_chart(fig3, use_container_width=True)
 
 st.caption("Built from GAMS CSVs. The black contour is the break-even line (profit = 0 €).")
@@ -5,11 +5,16 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
+from contours import breakeven, polyline_xy
+from grid_surface import GridSurface
+from run_catalog import output_path
+
 st.set_page_config(page_title="Biochar Profit (from GAMS CSVs)", layout="wide")
 st.title("💰 Biochar Profitability — GAMS CSV Visualization")
 
 # ---------- Load CSVs ----------
 def load_csv(name, required_cols):
+    name = output_path(name)   # $PYROCOST_RUN selects a catalogued run; default: repo-root file
     if not os.path.exists(name):
         st.error(f"Missing file: {name}")
         st.stop()
@@ -20,35 +25,40 @@ def load_csv(name, required_cols):
         st.stop()
     return df
 
-surf = load_csv("profit_surface.csv", ["price_eur_per_t", "dist_km", "profit_eur"])
-curve_d = load_csv("curve_distance.csv", ["dist_km", "profit_eur"])
-curve_p = load_csv("curve_price.csv", ["price_eur_per_t", "profit_eur"])
+@st.cache_resource
+def surface_grid(name, mtime):
+    """Long profit_surface.csv pivoted once per file version; reruns only index into it."""
+    return GridSurface.load(name)
 
-# ensure numeric types
-for col in ["price_eur_per_t", "dist_km", "profit_eur"]:
-    surf[col] = pd.to_numeric(surf[col], errors="coerce")
-surf = surf.dropna()
+def load_surface(name):
+    name = output_path(name)
+    if not os.path.exists(name):
+        st.error(f"Missing file: {name}")
+        st.stop()
+    try:
+        return surface_grid(str(name), os.path.getmtime(name))
+    except KeyError as e:
+        st.error(f"{name} is missing columns: {e}")
+        st.stop()
 
-# Build a pivot matrix for the heatmap / slices
-pivot_full = (
-    surf.pivot(index="dist_km", columns="price_eur_per_t", values="profit_eur")
-        .sort_index(axis=0)
-        .sort_index(axis=1)
-)
+surf = load_surface("profit_surface.csv")
+curve_d = load_csv("curve_distance.csv", ["dist_km", "profit_eur"])
+curve_p = load_csv("curve_price.csv", ["price_eur_per_t", "profit_eur"])
 
 # Discrete grids (exact values available in the CSV)
-price_vals = list(pivot_full.columns.astype(float))
-dist_vals  = list(pivot_full.index.astype(float))
+price_vals = list(surf.x.values)
+dist_vals  = list(surf.y.values)
 
-# derive steps (fallback to 1 if single value)
-def step(values):
-    if len(values) < 2:
+# grid steps (regular axes detected once by GridSurface; else smallest spacing)
+def step(axis):
+    if len(axis) < 2:
         return 1
-    diffs = sorted(set(round(values[i+1]-values[i], 10) for i in range(len(values)-1)))
-    return int(diffs[0]) if diffs[0].is_integer() else float(diffs[0])
+    d = axis.step if axis.regular else float(min(b - a for a, b in zip(axis.values, axis.values[1:])))
+    d = round(d, 10)
+    return int(d) if float(d).is_integer() else d
 
-price_step = step(price_vals)
-dist_step  = step(dist_vals)
+price_step = step(surf.x)
+dist_step  = step(surf.y)
 
 # ---------- Sidebar controls ----------
 st.sidebar.header("Controls")
@@ -83,12 +93,9 @@ dist_slice = st.sidebar.select_slider(
     value=dist_vals[len(dist_vals)//2]
 )
 
-# ---------- Filtered pivot for heatmap ----------
-# Keep only rows/cols inside selected ranges
-pivot_hm = pivot_full.loc[
-    [d for d in dist_vals if dist_range[0] <= d <= dist_range[1]],
-    [p for p in price_vals if price_range[0] <= p <= price_range[1]],
-]
+# ---------- Filtered grid for heatmap ----------
+# Keep only rows/cols inside selected ranges (index arithmetic, no scan)
+surf_hm = surf.window(price_range, dist_range)
 
 tab1, tab2, tab3 = st.tabs(
     ["Surface (Price × Distance)", "Profit vs Distance", "Profit vs Price"]
@@ -97,27 +104,27 @@ tab1, tab2, tab3 = st.tabs(
 # ---------- 1) Heatmap with break-even contour ----------
 with tab1:
     st.subheader("Profit Surface (from GAMS CSVs)")
-    if pivot_hm.empty:
+    if surf_hm is None:
         st.warning("No cells in the selected range.")
     else:
         fig = px.imshow(
-            pivot_hm.values,
-            x=pivot_hm.columns,
-            y=pivot_hm.index,
+            surf_hm.z.T,
+            x=surf_hm.x.values,
+            y=surf_hm.y.values,
             origin="lower",
             aspect="auto",
             color_continuous_scale="RdYlGn",
             labels=dict(x="Biochar Price (€/t)", y="Distance (km)", color="Profit (€)")
         )
-        # Break-even contour (profit = 0 €) using only CSV data
-        fig.add_trace(go.Contour(
-            x=pivot_hm.columns,
-            y=pivot_hm.index,
-            z=pivot_hm.values,
-            contours=dict(start=0, end=0, size=1, coloring="lines"),
-            showscale=False,
+        # Break-even line (profit = 0 €) from the CSV grid, marching squares server-side
+        be_x, be_y = polyline_xy(breakeven(surf_hm))
+        fig.add_trace(go.Scatter(
+            x=be_x,
+            y=be_y,
+            mode="lines",
             line=dict(color="black", width=3),
-            name="Break-even (Profit = 0 €)"
+            name="Break-even (Profit = 0 €)",
+            showlegend=False
         ))
         fig.update_layout(margin=dict(l=10, r=10, t=30, b=10))
         st.plotly_chart(fig, use_container_width=True)
@@ -125,11 +132,10 @@ with tab1:
 # ---------- 2) Profit vs Distance (at selected price) ----------
 with tab2:
     st.subheader(f"Profit vs Distance (Price = €{price_slice:.0f}/t)")
-    if price_slice not in pivot_full.columns:
+    if surf.x.index(price_slice) < 0:
         st.warning("Selected price not in CSV grid.")
     else:
-        s_dist = pivot_full.loc[:, price_slice]  # column (index → distance)
-        s_dist = s_dist.sort_index()
+        s_dist = surf.slice_x(price_slice)  # grid row (index → distance)
         fig2 = px.line(
             x=s_dist.index, y=s_dist.values, markers=True,
             labels={"x":"Distance (km)", "y":"Profit (€)"}
@@ -139,11 +145,10 @@ with tab2:
 # ---------- 3) Profit vs Price (at selected distance) ----------
 with tab3:
     st.subheader(f"Profit vs Price (Distance = {dist_slice:.0f} km)")
-    if dist_slice not in pivot_full.index:
+    if surf.y.index(dist_slice) < 0:
         st.warning("Selected distance not in CSV grid.")
     else:
-        s_price = pivot_full.loc[dist_slice, :]  # row (index → price)
-        s_price = s_price.sort_index()
+        s_price = surf.slice_y(dist_slice)  # grid column (index → price)
         fig3 = px.line(
             x=s_price.index, y=s_price.values, markers=True,
             labels={"x":"Biochar Price (€/t)", "y":"Profit (€)"}
@@ -0,0 +1,115 @@
+# bench_gdx_dump.py
+# Benchmark: streaming gdx_dump_parser vs the old read-everything regex parser
+# - Writes a synthetic UC_lane-style dump (i,j,m lanes) with N records
+# - Times a plain chunked read of the file (disk / decode baseline), the legacy
+#   parser (whole file -> str, finditer -> tuples -> DataFrame) and the new parser
+# - Optional --memory: peak Python allocations per parser via tracemalloc (slower)
+#
+#   python bench_gdx_dump.py --rows 10000000
+#   python bench_gdx_dump.py --file UC_lane.csv
+
+import argparse
+import re
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gdx_dump_parser import CHUNK_CHARS, parse_gdx_dump
+
+def legacy_parse_gdx_dump(path, names_3=("i","j","m"), name_value="value"):
+    """The previous implementation, kept here as the benchmark reference."""
+    text = Path(path).read_text(encoding="utf-8", errors="ignore")
+    pat3 = re.compile(r"'([^']+)'\.'([^']+)'\.'([^']+)'\s+([-+0-9Ee\.]+)")
+    rows3 = [m.groups() for m in pat3.finditer(text)]
+    if rows3:
+        out = pd.DataFrame(rows3, columns=[*names_3, name_value])
+        out[name_value] = pd.to_numeric(out[name_value], errors="coerce")
+        return out.dropna(subset=[name_value])
+    pat2 = re.compile(r"'([^']+)'\.'([^']+)'\s+([-+0-9Ee\.]+)")
+    rows2 = [m.groups() for m in pat2.finditer(text)]
+    if rows2:
+        out = pd.DataFrame(rows2, columns=[names_3[1], names_3[2], name_value])
+        out[name_value] = pd.to_numeric(out[name_value], errors="coerce")
+        return out.dropna(subset=[name_value])
+    raise ValueError(f"No parseable rows found in {path}. Check the file content.")
+
+def write_synthetic_dump(path, rows, n_plants=200, seed=0):
+    """UC_lane-style dump: farms × plants × {tractor, truck}, written in blocks."""
+    rng = np.random.default_rng(seed)
+    modes = np.array(["tractor", "truck"])
+    per_farm = n_plants * len(modes)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("Parameter UC_lane(*,*,*) '€/t unit cost per lane i->j,m' /\n")
+        block = 500_000
+        for a in range(0, rows, block):
+            k = np.arange(a, min(rows, a + block))
+            i = k // per_farm + 1
+            j = (k % per_farm) // len(modes) + 1
+            m = modes[k % len(modes)]
+            v = rng.uniform(5, 80, len(k))
+            lines = [f"'i{a_}'.'j{b_}'.'{c_}' {d_!r}, \n" for a_, b_, c_, d_ in zip(i, j, m, v.tolist())]
+            if k[-1] == rows - 1:
+                lines[-1] = lines[-1].replace(", \n", " /;\n")
+            fh.writelines(lines)
+
+def raw_read(path):
+    n = 0
+    with open(path, encoding="utf-8", errors="ignore") as fh:
+        while True:
+            s = fh.read(CHUNK_CHARS)
+            if not s:
+                return n
+            n += s.count("\n")
+
+def timed(fn, path, memory):
+    if memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(path)
+    dt = time.perf_counter() - t0
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return out, dt, peak
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=2_000_000, help="records in the synthetic dump")
+    ap.add_argument("--file", help="benchmark an existing dump instead of a synthetic one")
+    ap.add_argument("--memory", action="store_true", help="report peak allocations (tracemalloc)")
+    ap.add_argument("--skip-legacy", action="store_true", help="only time the streaming parser")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.file) if args.file else Path(tmp) / "UC_lane_bench.csv"
+        if not args.file:
+            t0 = time.perf_counter()
+            write_synthetic_dump(path, args.rows)
+            print(f"wrote {args.rows:,} records in {time.perf_counter() - t0:.1f}s")
+        mb = path.stat().st_size / 2**20
+
+        runs = [("raw chunked read", raw_read), ("streaming parser", parse_gdx_dump)]
+        if not args.skip_legacy:
+            runs.append(("legacy parser", legacy_parse_gdx_dump))
+        results = {}
+        for label, fn in runs:
+            out, dt, peak = timed(fn, path, args.memory)
+            results[label] = out
+            mem = f"  peak {peak:8.1f} MB" if peak is not None else ""
+            print(f"{label:18s} {dt:7.2f}s  {mb / dt:7.1f} MB/s{mem}")
+
+        new = results["streaming parser"]
+        if "legacy parser" in results:
+            old = results["legacy parser"].reset_index(drop=True)
+            same = (len(old) == len(new)
+                    and all((old[c].astype(str).values == new[c].astype(str).values).all() for c in old.columns[:-1])
+                    and np.allclose(old.iloc[:, -1].to_numpy(), new.iloc[:, -1].to_numpy(), equal_nan=True))
+            print(f"identical output: {same}  ({len(new):,} rows)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# breakeven_inverse.py
+# Batch inverse of the plant-first model: the input value at which a margin or gap hits zero
+# - breakeven(unknown, target, params): for arrays of scenarios (dict of arrays or a
+#   DataFrame, e.g. thousands of supplier contracts) returns the biochar price, chip
+#   price, moisture content, CO2 price, distance, ... where the target equals `value`
+# - Targets (PLANTFLIP graph quantities, see plantflip_kernel):
+#     margin         plant gross margin GM_h (€/h) buying chips at P_chip_DM_deliv;
+#                    value defaults to MarginTarget (Plant1.gms Pchar_BE / Pchip_BE)
+#     gap            payable - delivered cost at distance_km for `mode` (€/t DM)
+#     payable_asrec  payable price per t as-received (value = contract price)
+#     any other PLANTFLIP node name (value required)
+# - Closed forms for the pairs that are linear in the unknown (P_char, P_chip_DM_deliv,
+#   P_CO2, distance_km, MC_asrec); otherwise safeguarded Newton inside a bracket, with
+#   exact derivatives from sensitivity.py dual numbers and bisection fallback.
+#   Both paths share the bracket: no root inside it (no sign change / closed-form root
+#   outside, e.g. MC_asrec < 0) -> NaN
+#
+#   breakeven("P_char", "margin", P_chip_DM_deliv=25)                   # 524.08 (GAMS)
+#   breakeven("distance_km", "gap", mode="truck")                        # BE radius, NaN if < 0
+#   breakeven("Truck_speed_kmh", "gap", distance_km=[60, 80, 100])       # Newton
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from plantflip_kernel import EPS, MODES, PLANTFLIP
+from sensitivity import gradients
+
+TARGETS = ("margin", "gap", "payable_asrec")
+
+# physical brackets per unknown (else default/1000 .. default*1000): Newton searches inside,
+# closed-form roots outside become NaN
+BRACKETS = dict(
+    P_char=(-1e4, 1e5), P_chip_DM_deliv=(-1e4, 1e5), P_CO2=(-1e4, 1e5), MC_asrec=(0.0, 0.99),
+    distance_km=(0.0, 1e5), Backhaul=(1.0, 2.0),
+)
+
+def _node(target, mode, with_carbon):
+    sfx = "_withC" if with_carbon else ""
+    if target == "margin":
+        return f"GM_h{sfx}"
+    if target == "gap":
+        return f"gap_{mode}{sfx}"
+    if target == "payable_asrec":
+        return f"P_chip_payable_asrec{sfx}"
+    if target in PLANTFLIP.formulas:
+        return target
+    raise KeyError(f"unknown target {target!r} (one of {TARGETS} or a PLANTFLIP quantity)")
+
+# -----------------------
+# Closed forms: (target, unknown) -> f(q, value, with_carbon); q = evaluated graph nodes/inputs
+# -----------------------
+def _premium_h(q, with_carbon):
+    return q["CarbonPremium_DM"] * q["Qin_DM_h"] if with_carbon else 0.0
+
+def _margin_P_char(q, v, wc):
+    # Plant1.gms: Pchar_BE = (Cfs + Clab + Com + Cbuy - (Rel + Rheat)) / (Y_char * Qin_DM_h)
+    need = q["Cost_h"] + q["Qin_DM_h"] * q["P_chip_DM_deliv"] + v - _premium_h(q, wc)
+    return (need - q["P_el"] * q["E_elec_kW"] - q["P_heat"] * q["E_heat_kW"]) / np.maximum(EPS, q["Y_char"] * q["Qin_DM_h"])
+
+def _margin_P_chip(q, v, wc):
+    # Plant1.gms: Pchip_BE = (Rchar + Rel + Rheat - (Clab + Com + Cbuy)) / Qin_DM_h
+    return (q["Rev_h"] - q["Cost_h"] - v + _premium_h(q, wc)) / np.maximum(EPS, q["Qin_DM_h"])
+
+def _margin_P_CO2(q, v, wc):
+    gm = q["Rev_h"] - q["Cost_h"] - q["Qin_DM_h"] * q["P_chip_DM_deliv"]
+    return (v - gm) / np.maximum(EPS, q["Y_char"] * q["CO2eq_per_tchar"] * q["Qin_DM_h"])
+
+def _delivered(q, mode, v):
+    return q[f"C_fixed_{mode}"] + q["Backhaul"] * q[f"C_tkm_{mode}"] * q["distance_km"] + v
+
+def _gap_distance(mode):
+    def solve(q, v, wc):
+        payable = q["P_chip_payable_DM_withC" if wc else "P_chip_payable_DM"]
+        return (payable - v - q[f"C_fixed_{mode}"]) / np.maximum(EPS, q["Backhaul"] * q[f"C_tkm_{mode}"])
+    return solve
+
+def _gap_P_char(mode):
+    def solve(q, v, wc):
+        # payable_DM needed -> hourly revenue needed -> biochar price
+        pay = _delivered(q, mode, v) - (q["CarbonPremium_DM"] if wc else 0.0)
+        rev = pay * q["Qin_DM_h"] + q["Cost_h"] + q["MarginTarget"]
+        return (rev - q["P_el"] * q["E_elec_kW"] - q["P_heat"] * q["E_heat_kW"]) / np.maximum(EPS, q["Y_char"] * q["Qin_DM_h"])
+    return solve
+
+def _gap_P_CO2(mode):
+    def solve(q, v, wc):
+        return (_delivered(q, mode, v) - q["P_chip_payable_DM"]) / np.maximum(EPS, q["Y_char"] * q["CO2eq_per_tchar"])
+    return solve
+
+def _payable_MC(q, v, wc):
+    return 1 - v / q["P_chip_payable_DM_withC" if wc else "P_chip_payable_DM"]
+
+def _payable_P_char(q, v, wc):
+    pay = v / np.maximum(EPS, 1 - q["MC_asrec"]) - (q["CarbonPremium_DM"] if wc else 0.0)
+    rev = pay * q["Qin_DM_h"] + q["Cost_h"] + q["MarginTarget"]
+    return (rev - q["P_el"] * q["E_elec_kW"] - q["P_heat"] * q["E_heat_kW"]) / np.maximum(EPS, q["Y_char"] * q["Qin_DM_h"])
+
+CLOSED_FORMS = {
+    ("margin", "P_char"): _margin_P_char,
+    ("margin", "P_chip_DM_deliv"): _margin_P_chip,
+    ("payable_asrec", "MC_asrec"): _payable_MC,
+    ("payable_asrec", "P_char"): _payable_P_char,
+}
+for _m in MODES:
+    CLOSED_FORMS[("gap", "distance_km", _m)] = _gap_distance(_m)
+    CLOSED_FORMS[("gap", "P_char", _m)] = _gap_P_char(_m)
+
+# P_CO2 only moves the target when the carbon premium is part of it
+CLOSED_FORMS_WITHC = {("margin", "P_CO2"): _margin_P_CO2}
+for _m in MODES:
+    CLOSED_FORMS_WITHC[("gap", "P_CO2", _m)] = _gap_P_CO2(_m)
+del _m
+
+_CLOSED_NEEDS = (
+    "Rev_h", "Cost_h", "CarbonPremium_DM", "P_chip_payable_DM", "P_chip_payable_DM_withC",
+    "C_fixed_tractor", "C_fixed_truck", "C_tkm_tractor", "C_tkm_truck",
+)
+_CLOSED_EVAL = PLANTFLIP.evaluator(_CLOSED_NEEDS)
+
+def _closed_form(target, unknown, mode, with_carbon):
+    fn = CLOSED_FORMS.get((target, unknown)) or CLOSED_FORMS.get((target, unknown, mode))
+    if fn is None and with_carbon:
+        fn = CLOSED_FORMS_WITHC.get((target, unknown)) or CLOSED_FORMS_WITHC.get((target, unknown, mode))
+    return fn
+
+# -----------------------
+# Safeguarded Newton (vectorized over scenarios)
+# -----------------------
+def _residual(node, unknown, values, value):
+    def resid(x):
+        res = gradients(PLANTFLIP, [node], {**values, unknown: x}, wrt=[unknown])
+        return res["value"][node] - value, res["grad"][node][..., 0]
+    return resid
+
+def newton_bracketed(resid, lo, hi, x0=None, xtol=1e-10, ftol=1e-9, maxiter=60):
+    """
+    Roots of resid(x) -> (f, df/dx) inside [lo, hi], elementwise. Newton steps that leave
+    the current bracket (or have zero slope) become bisections. Returns (x, converged);
+    x is NaN where the bracket has no sign change.
+    """
+    lo, hi = np.array(lo, dtype=float), np.array(hi, dtype=float)
+    f_lo, _ = resid(lo)
+    f_hi, _ = resid(hi)
+    lo, hi, f_lo, f_hi = np.broadcast_arrays(lo, hi, f_lo, f_hi)
+    lo, hi, f_lo = lo.copy(), hi.copy(), f_lo.copy()
+    ok = np.sign(f_lo) * np.sign(f_hi) <= 0
+    x = np.where(ok, 0.5 * (lo + hi), np.nan) if x0 is None else np.clip(np.broadcast_to(x0, lo.shape), lo, hi)
+    done = ~ok | (f_lo == 0) | (f_hi == 0)
+    x = np.where(f_lo == 0, lo, np.where(f_hi == 0, hi, x))
+    for _ in range(maxiter):
+        if done.all():
+            break
+        f, g = resid(x)
+        f, g = np.broadcast_to(f, x.shape), np.broadcast_to(g, x.shape)
+        done |= np.abs(f) <= ftol * (1 + np.abs(x))
+        same = np.sign(f) == np.sign(f_lo)
+        lo = np.where(~done & same, x, lo)
+        f_lo = np.where(~done & same, f, f_lo)
+        hi = np.where(~done & ~same, x, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xn = x - f / g
+        inside = np.isfinite(xn) & (xn > np.minimum(lo, hi)) & (xn < np.maximum(lo, hi))
+        xn = np.where(inside, xn, 0.5 * (lo + hi))
+        done |= np.abs(hi - lo) <= xtol * (1 + np.abs(x))
+        x = np.where(done, x, xn)
+    converged = done & ok
+    return np.where(ok, x, np.nan), converged
+
+# -----------------------
+# Public API
+# -----------------------
+def _as_values(params, overrides):
+    if isinstance(params, pd.DataFrame):
+        values = {c: params[c].to_numpy(dtype=float) for c in params.columns if c in PLANTFLIP.defaults}
+    else:
+        values = {k: np.asarray(v, dtype=float) for k, v in (params or {}).items()}
+    values.update({k: np.asarray(v, dtype=float) for k, v in overrides.items()})
+    unknown = [k for k in values if k not in PLANTFLIP.defaults]
+    if unknown:
+        raise KeyError(f"unknown input(s) {sorted(unknown)}")
+    return values
+
+def breakeven(unknown, target="margin", params=None, value=None, mode="truck", with_carbon=False,
+              bracket=None, method="auto", **overrides):
+    """
+    Value of input `unknown` at which `target` equals `value`, for every scenario in
+    params/overrides (broadcast). value: scalar/array; margin defaults to MarginTarget,
+    other targets to 0. method: 'auto' (closed form if known, else Newton), 'newton'.
+    bracket: (lo, hi) of physical values (default BRACKETS); no root inside -> NaN.
+    """
+    if unknown not in PLANTFLIP.defaults:
+        raise KeyError(f"{unknown!r} is not a PLANTFLIP input")
+    values = _as_values(params, overrides)
+    node = _node(target, mode, with_carbon)
+    if value is None:
+        value = values.get("MarginTarget", PLANTFLIP.defaults["MarginTarget"]) if target == "margin" else 0.0
+    value = np.asarray(value, dtype=float)
+    if bracket is None:
+        d = float(PLANTFLIP.defaults[unknown] or 1.0)
+        bracket = BRACKETS.get(unknown, tuple(sorted((d / 1e3, d * 1e3))))
+    shape = np.broadcast_shapes(*(np.shape(v) for v in values.values()), np.shape(value))
+    lo = np.broadcast_to(np.asarray(bracket[0], dtype=float), shape)
+    hi = np.broadcast_to(np.asarray(bracket[1], dtype=float), shape)
+
+    closed = _closed_form(target, unknown, mode, with_carbon) if method == "auto" else None
+    if closed is not None:
+        q = {**PLANTFLIP.defaults, **values, **_CLOSED_EVAL(values)}
+        q = {k: np.asarray(v, dtype=float) for k, v in q.items()}
+        x = closed(q, value, with_carbon)
+        shape = np.broadcast_shapes(np.shape(x), shape)
+        x = np.broadcast_to(x, shape)
+        inside = (x >= np.minimum(lo, hi)) & (x <= np.maximum(lo, hi))
+        return np.where(inside, x, np.nan)
+
+    x0 = values.get(unknown)
+    x0 = np.clip(np.broadcast_to(x0, shape), np.minimum(lo, hi), np.maximum(lo, hi)) if x0 is not None else None
+    x, _ = newton_bracketed(_residual(node, unknown, values, value), lo, hi, x0)
+    return x
+
+def breakeven_frame(params=None, unknowns=("P_char", "P_chip_DM_deliv"), target="margin", mode="truck",
+                    with_carbon=False, value=None, **overrides):
+    """
+    Break-even table: one column '<unknown>_BE' per unknown next to the scenario inputs
+    (params as a DataFrame of contracts, or dict of arrays).
+    """
+    values = _as_values(params, overrides)
+    shape = np.broadcast_shapes(*(np.shape(v) for v in values.values())) if values else ()
+    out = pd.DataFrame(params).reset_index(drop=True) if isinstance(params, pd.DataFrame) else \
+        pd.DataFrame({k: np.broadcast_to(v, shape).reshape(-1) for k, v in values.items()}) if shape else \
+        pd.DataFrame([{k: float(v) for k, v in values.items()}])
+    for u in unknowns:
+        x = breakeven(u, target, values, value=value, mode=mode, with_carbon=with_carbon)
+        out[f"{u}_BE"] = np.broadcast_to(x, shape).reshape(-1) if shape else [float(x)]
+    return out
+
+# -----------------------
+# CLI
+# -----------------------
+def main():
+    ap = argparse.ArgumentParser(description="Break-even table for a CSV of scenarios/contracts")
+    ap.add_argument("csv", help="one row per scenario; columns named like PLANTFLIP inputs")
+    ap.add_argument("--unknown", nargs="+", default=["P_char", "P_chip_DM_deliv"])
+    ap.add_argument("--target", default="margin", help=f"{' | '.join(TARGETS)} | PLANTFLIP quantity")
+    ap.add_argument("--mode", default="truck", choices=MODES)
+    ap.add_argument("--with-carbon", action="store_true", help="carbon premium included in the target")
+    ap.add_argument("--value", type=float, help="target level (default: MarginTarget for margin, else 0)")
+    ap.add_argument("--out", help="output CSV (default: print)")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv)
+    extra = [c for c in df.columns if c not in PLANTFLIP.defaults]
+    inputs = df.drop(columns=extra)
+    out = breakeven_frame(inputs, args.unknown, args.target, args.mode, args.with_carbon, args.value)
+    out = pd.concat([df[extra].reset_index(drop=True), out], axis=1)
+    if args.out:
+        out.to_csv(args.out, index=False)
+        print(f"wrote {len(out):,} rows to {args.out}")
+    else:
+        print(out.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# contours.py
+# Server-side isolines (break-even lines) on grid surfaces
+# - marching_squares: level crossings on the cell edges of z[ix, iy] (linear interpolation
+#   along each edge, saddles resolved by the cell mean), stitched into polylines; cells
+#   with a NaN corner are skipped. Crossings are found in one vectorized pass, the
+#   stitching walks only the crossed edges, so the output is O(n) vertices for an n x n grid
+# - profit_zero_line: the GAMS_Graph_Pyrolysis2 profit is linear in price and distance,
+#   so profit = 0 is a straight line -> 2 vertices clipped to the grid rectangle
+# - breakeven: analytic line when the surface carries its model parameters (.npz from
+#   profit_surface.py), marching squares otherwise (GAMS CSVs, plant-first heatmaps)
+# - polyline_xy / contour_frame: payloads for Plotly (None-separated) and Altair (long)
+#
+#   surf = GridSurface.load("profit_surface.csv")
+#   lines = breakeven(surf)                       # [array([[price, dist], ...]), ...]
+#   xs, ys = polyline_xy(lines)                   # go.Scatter(x=xs, y=ys, mode="lines")
+
+import numpy as np
+import pandas as pd
+
+from profit_surface import DEFAULTS, biochar_profit
+
+# -----------------------
+# Marching squares
+# -----------------------
+def _edge_points(a, b, lo, hi, level):
+    """Crossing mask and position on edges a -> b (values) spanning lo -> hi (coordinates)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cross = (a >= level) != (b >= level)
+        cross &= ~(np.isnan(a) | np.isnan(b))
+        t = np.where(cross, (level - a) / np.where(cross, b - a, 1.0), 0.0)
+    return cross, lo + t * (hi - lo)
+
+def _stitch(pairs, n_edges):
+    """Join segments (edge id pairs) into chains of edge ids; closed loops repeat the first id."""
+    nbr = np.full((n_edges, 2), -1, dtype=np.int64)
+    for a, b in pairs:
+        nbr[a, int(nbr[a, 0] >= 0)] = b
+        nbr[b, int(nbr[b, 0] >= 0)] = a
+    used = set()
+    chains = []
+
+    def walk(start):
+        chain, prev, cur = [start], -1, start
+        used.add(start)
+        while True:
+            nxt = nbr[cur, 0] if nbr[cur, 0] != prev else nbr[cur, 1]
+            if nxt < 0:
+                return chain
+            if nxt in used:
+                if nxt == start:
+                    chain.append(start)
+                return chain
+            chain.append(int(nxt))
+            used.add(int(nxt))
+            prev, cur = cur, int(nxt)
+
+    ends = [e for e in np.unique(np.ravel(pairs)) if (nbr[e] >= 0).sum() == 1]
+    for e in ends:                      # open lines start at the grid border
+        if e not in used:
+            chains.append(walk(int(e)))
+    for e in np.unique(np.ravel(pairs)):   # what is left are closed loops
+        if e not in used:
+            chains.append(walk(int(e)))
+    return chains
+
+def marching_squares(x, y, z, level=0.0):
+    """
+    Isolines z = level of z[ix, iy] over axes x, y as a list of (k, 2) arrays of (x, y)
+    vertices, one per connected line (closed loops end on their first vertex).
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+    nx, ny = z.shape
+    if nx < 2 or ny < 2:
+        return []
+    # crossings on the horizontal edges (x_i -> x_i+1 at y_j) and vertical edges (y_j -> y_j+1 at x_i)
+    h_cross, h_x = _edge_points(z[:-1, :], z[1:, :], x[:-1, None], x[1:, None], level)
+    v_cross, v_y = _edge_points(z[:, :-1], z[:, 1:], y[None, :-1], y[None, 1:], level)
+    H = (nx - 1) * ny
+    h_id = np.arange(H).reshape(nx - 1, ny)
+    v_id = H + np.arange(nx * (ny - 1)).reshape(nx, ny - 1)
+
+    # per cell (i, j): bottom, right, top, left edges
+    edges = (h_id[:, :-1], v_id[1:, :], h_id[:, 1:], v_id[:-1, :])
+    crossed = (h_cross[:, :-1], v_cross[1:, :], h_cross[:, 1:], v_cross[:-1, :])
+    n_cross = sum(c.astype(np.int8) for c in crossed)
+
+    pairs = []
+    two = n_cross == 2
+    if two.any():
+        ids = np.stack([np.where(c, e, -1)[two] for c, e in zip(crossed, edges)], axis=1)
+        ids = np.sort(ids, axis=1)[:, 2:]          # the two crossed edges
+        pairs.append(ids)
+    four = n_cross == 4
+    if four.any():
+        # saddle: the cell mean decides whether the 00-11 diagonal is connected
+        z00, z10, z11, z01 = z[:-1, :-1][four], z[1:, :-1][four], z[1:, 1:][four], z[:-1, 1:][four]
+        joined = ((z00 + z10 + z11 + z01) / 4 >= level) == (z00 >= level)
+        b, r, t, l = (e[four] for e in edges)
+        pairs.append(np.concatenate([
+            np.stack([np.where(joined, b, l), np.where(joined, r, b)], axis=1),
+            np.stack([np.where(joined, t, r), np.where(joined, l, t)], axis=1),
+        ]))
+    if not pairs:
+        return []
+    pairs = np.concatenate(pairs)
+
+    px = np.concatenate([h_x.ravel(), np.broadcast_to(x[:, None], v_y.shape).ravel()])
+    py = np.concatenate([np.broadcast_to(y[None, :], h_x.shape).ravel(), v_y.ravel()])
+    return [np.column_stack([px[c], py[c]]) for c in _stitch(pairs, H + v_id.size)]
+
+def isolines(surf, levels):
+    """{level: polylines} for a GridSurface (x, y in the surface's axis units)."""
+    return {lv: marching_squares(surf.x.values, surf.y.values, surf.z, lv) for lv in np.atleast_1d(levels)}
+
+# -----------------------
+# Analytic zero line (linear profit model)
+# -----------------------
+def clip_line(a, b, c, x_range, y_range):
+    """Segment of a*x + b*y + c = 0 inside the rectangle as a (2, 2) array, None if it misses."""
+    (x0, x1), (y0, y1) = x_range, y_range
+    pts = []
+    if b != 0:
+        for xv in (x0, x1):
+            yv = -(a * xv + c) / b
+            if y0 - 1e-9 <= yv <= y1 + 1e-9:
+                pts.append((xv, min(max(yv, y0), y1)))
+    if a != 0:
+        for yv in (y0, y1):
+            xv = -(b * yv + c) / a
+            if x0 - 1e-9 <= xv <= x1 + 1e-9:
+                pts.append((min(max(xv, x0), x1), yv))
+    if not pts:
+        return None
+    pts = np.unique(np.round(pts, 12), axis=0)
+    if len(pts) == 1:
+        return np.vstack([pts, pts])
+    return pts[[0, -1]]              # sorted by x: the two ends (corner hits dedup'ed above)
+
+def profit_zero_line(params=None, price_range=None, dist_range=None, level=0.0, **overrides):
+    """Profit = level over price x distance (profit_surface model) as [ (2, 2) array ] or []."""
+    p = {**DEFAULTS, **(params or {}), **overrides}
+    base = biochar_profit(0.0, 0.0, p)   # profit = Q_char * P - c_tkm * Q_ship * d + base
+    seg = clip_line(p["Q_char"], -p["c_tkm"] * p["Q_ship"], base - level,
+                    price_range or (200.0, 800.0), dist_range or (0.0, 200.0))
+    return [] if seg is None else [seg]
+
+def breakeven(surf, level=0.0):
+    """Break-even polylines of a GridSurface: analytic if it carries profit_surface params."""
+    params = surf.meta.get("params")
+    if params:
+        return profit_zero_line(params, (surf.x.lo, surf.x.hi), (surf.y.lo, surf.y.hi), level)
+    return marching_squares(surf.x.values, surf.y.values, surf.z, level)
+
+# -----------------------
+# Payloads
+# -----------------------
+def polyline_xy(lines):
+    """x, y lists with None between lines (one Plotly scatter trace for all lines)."""
+    xs, ys = [], []
+    for ln in lines:
+        if xs:
+            xs.append(None)
+            ys.append(None)
+        xs.extend(ln[:, 0].tolist())
+        ys.extend(ln[:, 1].tolist())
+    return xs, ys
+
+def contour_frame(lines, x_name="x", y_name="y"):
+    """Long format (line, k, x, y) for Altair (detail=line, order=k) or CSV download."""
+    if not lines:
+        return pd.DataFrame({"line": [], "k": [], x_name: [], y_name: []})
+    return pd.DataFrame({
+        "line": np.repeat(np.arange(len(lines)), [len(ln) for ln in lines]),
+        "k": np.concatenate([np.arange(len(ln)) for ln in lines]),
+        x_name: np.concatenate([ln[:, 0] for ln in lines]),
+        y_name: np.concatenate([ln[:, 1] for ln in lines]),
+    })
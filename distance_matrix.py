@@ -0,0 +1,135 @@
+# distance_matrix.py
+# Farm -> plant distance table from coordinates (replaces hand-typed Table dist(i,j))
+# - Loads farm / plant points from CSV (id, lat, lon) or GeoJSON (Point features)
+# - Vectorized great-circle (haversine) distances, optional road circuity factor
+# - KD-tree on unit-sphere xyz: only plants within max_km of each farm are kept,
+#   returned as scipy.sparse CSR (I × J) for upstream_lanes / upstream_lp
+# - Writers: GAMS include (Set i, Set j, Parameter dist) and tidy CSV
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+MIN_KM = 1e-6      # farm located at the plant: keep the lane as a stored (non-zero) entry
+
+# -----------------------
+# Loading points
+# -----------------------
+def load_points(path, id_col="id", lat_col="lat", lon_col="lon"):
+    """
+    Points as a DataFrame with columns id, lat, lon (degrees).
+    CSV: columns id_col / lat_col / lon_col. GeoJSON: Point features, id from
+    properties[id_col] or the feature id (coordinates are lon, lat).
+    """
+    p = Path(path)
+    if p.suffix.lower() in (".geojson", ".json"):
+        feats = json.loads(p.read_text(encoding="utf-8"))["features"]
+        rows = []
+        for k, f in enumerate(feats):
+            geom = f.get("geometry") or {}
+            if geom.get("type") != "Point":
+                raise ValueError(f"{path}: feature {k} is not a Point")
+            lon, lat = geom["coordinates"][:2]
+            fid = (f.get("properties") or {}).get(id_col, f.get("id", k))
+            rows.append((str(fid), float(lat), float(lon)))
+        return pd.DataFrame(rows, columns=["id", "lat", "lon"])
+
+    df = pd.read_csv(p)
+    missing = [c for c in (id_col, lat_col, lon_col) if c not in df.columns]
+    if missing:
+        raise KeyError(f"{path}: missing column(s) {missing}")
+    return pd.DataFrame(dict(
+        id=df[id_col].astype(str).to_numpy(),
+        lat=df[lat_col].astype(float).to_numpy(),
+        lon=df[lon_col].astype(float).to_numpy(),
+    ))
+
+# -----------------------
+# Great-circle distances
+# -----------------------
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; inputs in degrees, NumPy broadcasting."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+def unit_xyz(lat, lon):
+    """Points on the unit sphere (n, 3); chord length there is monotone in great-circle distance."""
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def _km_to_chord(km):
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=float) / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+def distance_matrix(farms, plants, circuity=1.0):
+    """Dense I × J road-km estimate (circuity × great-circle). Fine up to ~10⁷ cells."""
+    return circuity * haversine_km(farms["lat"].to_numpy()[:, None], farms["lon"].to_numpy()[:, None],
+                                   plants["lat"].to_numpy()[None, :], plants["lon"].to_numpy()[None, :])
+
+def distances_within(farms, plants, max_km, circuity=1.0):
+    """
+    Sparse I × J CSR of road-km estimates, keeping only pairs with
+    circuity × great-circle <= max_km. max_km may be a scalar or one radius per farm
+    (e.g. the largest BE_radius a farm could reach).
+    """
+    fxyz = unit_xyz(farms["lat"], farms["lon"])
+    pxyz = unit_xyz(plants["lat"], plants["lon"])
+    I, J = len(fxyz), len(pxyz)
+    tree = cKDTree(pxyz)
+    chord = _km_to_chord(np.asarray(max_km, dtype=float) / circuity)
+
+    if chord.ndim == 0:
+        pairs = cKDTree(fxyz).sparse_distance_matrix(tree, float(chord), output_type="ndarray")
+        rows, cols = pairs["i"].astype(np.int64), pairs["j"].astype(np.int64)
+    else:
+        hits = tree.query_ball_point(fxyz, np.broadcast_to(chord, (I,)))
+        counts = np.fromiter((len(h) for h in hits), dtype=np.int64, count=I)
+        rows = np.repeat(np.arange(I), counts)
+        cols = np.fromiter((c for h in hits for c in h), dtype=np.int64, count=counts.sum())
+
+    km = circuity * haversine_km(farms["lat"].to_numpy()[rows], farms["lon"].to_numpy()[rows],
+                                 plants["lat"].to_numpy()[cols], plants["lon"].to_numpy()[cols])
+    return sp.csr_matrix((np.maximum(km, MIN_KM), (rows, cols)), shape=(I, J))
+
+def build_dist(farm_path, plant_path, max_km=None, circuity=1.0, **cols):
+    """Load both point files and return (dist, farm_ids, plant_ids); sparse when max_km is given."""
+    farms, plants = load_points(farm_path, **cols), load_points(plant_path, **cols)
+    if max_km is None:
+        D = distance_matrix(farms, plants, circuity)
+    else:
+        D = distances_within(farms, plants, max_km, circuity)
+    return D, farms["id"].tolist(), plants["id"].tolist()
+
+# -----------------------
+# Writers
+# -----------------------
+def _entries(D):
+    if sp.issparse(D):
+        coo = sp.coo_matrix(D)
+        return coo.row, coo.col, coo.data
+    D = np.asarray(D, dtype=float)
+    r, c = np.nonzero(np.isfinite(D))
+    return r, c, D[r, c]
+
+def write_gams_dist(path, D, farm_ids, plant_ids, name="dist", decimals=3):
+    """
+    GAMS include file with Set i, Set j and Parameter <name>(i,j) "km" in list form
+    (sparse-friendly, no column-width limits): $include it in place of Table dist.
+    """
+    r, c, v = _entries(D)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Set i \"farms\" /\n" + ",\n".join(f"  {s}" for s in farm_ids) + " /;\n")
+        f.write("Set j \"plants\" /\n" + ",\n".join(f"  {s}" for s in plant_ids) + " /;\n\n")
+        f.write(f"Parameter {name}(i,j) \"km\" /\n")
+        f.write(",\n".join(f"  {farm_ids[a]}.{plant_ids[b]} {x:.{decimals}f}" for a, b, x in zip(r, c, v)))
+        f.write(" /;\n")
+
+def dist_frame(D, farm_ids, plant_ids):
+    """Tidy i, j, km table (stored entries only for sparse input)."""
+    r, c, v = _entries(D)
+    return pd.DataFrame(dict(i=np.asarray(farm_ids)[r], j=np.asarray(plant_ids)[c], km=v))
@@ -0,0 +1,215 @@
+# formula_graph.py
+# Named-quantity dependency graph with incremental and vectorized evaluation
+# - Inputs (with defaults) and formulas are declared once; a formula's dependencies
+#   are the names of its arguments:
+#       g = FormulaGraph()
+#       g.input("Truck_speed_kmh", 70.0)
+#       @g.formula
+#       def C_tkm_truck(C_tkm_truck_mach, Truck_speed_kmh, ...): ...
+# - Session: holds one scenario; set() marks only the downstream nodes of the
+#   changed inputs dirty, get() recomputes just those (Truck_speed -> C_tkm_truck ->
+#   BE_radius_truck, nothing else)
+# - evaluator(): compiles the graph, restricted to the ancestors of the requested
+#   outputs, into one straight-line function over NumPy arrays (broadcasting), for
+#   batch runs, grids and Monte Carlo
+# - Formulas must be written with NumPy ops (np.maximum, not max) so the same
+#   code serves scalars and arrays
+
+import inspect
+from collections import deque
+
+import numpy as np
+
+class FormulaGraph:
+    """Inputs + formulas keyed by name, kept in topological order."""
+
+    def __init__(self, name="graph"):
+        self.name = name
+        self.defaults = {}           # input name -> default value
+        self.formulas = {}           # node name -> (fn, deps)
+        self.docs = {}
+        self._order = None
+        self._children = None
+
+    # ----- declaration -----
+    def input(self, name, default=None, doc=None):
+        if name in self.formulas:
+            raise ValueError(f"{name!r} is already a formula")
+        self.defaults[name] = default
+        if doc:
+            self.docs[name] = doc
+        self._order = self._children = None
+        return name
+
+    def inputs(self, defaults):
+        for k, v in defaults.items():
+            self.input(k, v)
+
+    def formula(self, fn=None, *, name=None, deps=None):
+        """Decorator: node named after the function, dependencies = its argument names."""
+        def register(f):
+            node = name or f.__name__
+            if node in self.defaults or node in self.formulas:
+                raise ValueError(f"{node!r} declared twice in {self.name}")
+            d = tuple(deps) if deps is not None else tuple(inspect.signature(f).parameters)
+            self.formulas[node] = (f, d)
+            if f.__doc__:
+                self.docs[node] = inspect.cleandoc(f.__doc__)
+            self._order = self._children = None
+            return f
+        return register(fn) if fn is not None else register
+
+    # ----- structure -----
+    @property
+    def names(self):
+        return list(self.defaults) + list(self.formulas)
+
+    @property
+    def order(self):
+        """Formula names in dependency order (Kahn); raises on cycles or unknown names."""
+        if self._order is None:
+            indeg, children = {}, {n: [] for n in self.names}
+            for node, (_, deps) in self.formulas.items():
+                missing = [d for d in deps if d not in children]
+                if missing:
+                    raise KeyError(f"{self.name}: {node} depends on undeclared {missing}")
+                indeg[node] = sum(d in self.formulas for d in deps)
+                for d in deps:
+                    children[d].append(node)
+            ready = deque(n for n in self.formulas if indeg[n] == 0)
+            order = []
+            while ready:
+                n = ready.popleft()
+                order.append(n)
+                for c in children[n]:
+                    indeg[c] -= 1
+                    if indeg[c] == 0:
+                        ready.append(c)
+            if len(order) != len(self.formulas):
+                raise ValueError(f"{self.name}: cycle among {sorted(set(self.formulas) - set(order))}")
+            self._order, self._children = order, children
+        return self._order
+
+    def children(self, name):
+        self.order
+        return self._children[name]
+
+    def ancestors(self, names):
+        """All nodes (inputs and formulas) the given names depend on, including themselves."""
+        seen, stack = set(), list(names)
+        while stack:
+            n = stack.pop()
+            if n in seen:
+                continue
+            if n not in self.defaults and n not in self.formulas:
+                raise KeyError(f"{self.name}: unknown quantity {n!r}")
+            seen.add(n)
+            if n in self.formulas:
+                stack.extend(self.formulas[n][1])
+        return seen
+
+    def descendants(self, names):
+        """Formulas downstream of the given names (not including the names themselves)."""
+        self.order
+        seen, stack = set(), [c for n in names for c in self._children[n]]
+        while stack:
+            n = stack.pop()
+            if n not in seen:
+                seen.add(n)
+                stack.extend(self._children[n])
+        return seen
+
+    def required_inputs(self, outputs):
+        return [n for n in self.defaults if n in self.ancestors(outputs)]
+
+    # ----- evaluation -----
+    def evaluator(self, outputs=None, broadcast=True):
+        """
+        Compile to f(values=None, **overrides) -> {output: array}. Only the ancestors of
+        `outputs` (default: every formula) are evaluated, once each, in dependency order.
+        Missing inputs take their defaults; unknown input names raise KeyError.
+        """
+        outputs = list(outputs) if outputs is not None else list(self.formulas)
+        need = self.ancestors(outputs)
+        steps = [(n, *self.formulas[n]) for n in self.order if n in need]
+        inputs = [n for n in self.defaults if n in need]
+        defaults = {n: self.defaults[n] for n in inputs}
+        known = set(self.defaults)
+
+        def evaluate(values=None, **overrides):
+            given = {**(values or {}), **overrides}
+            unknown = [k for k in given if k not in known]
+            if unknown:
+                raise KeyError(f"{self.name}: unknown input(s) {sorted(unknown)}")
+            env = {n: np.asarray(given[n] if n in given else defaults[n], dtype=float) for n in inputs}
+            for n, fn, deps in steps:
+                env[n] = fn(*[env[d] for d in deps])
+            out = {n: env[n] for n in outputs}
+            if broadcast:
+                shape = np.broadcast_shapes(*(np.shape(env[n]) for n in inputs)) if inputs else ()
+                out = {n: np.broadcast_to(v, shape) for n, v in out.items()}
+            return out
+
+        evaluate.outputs, evaluate.inputs, evaluate.steps = outputs, inputs, [s[0] for s in steps]
+        return evaluate
+
+    def session(self, values=None, **overrides):
+        return Session(self, values, **overrides)
+
+class Session:
+    """
+    One scenario with incremental recomputation.
+
+        s = PLANTFLIP.session(P_char=550)
+        s["BE_radius_truck"]
+        s.set(Truck_speed_kmh=60)      # dirties C_tkm_truck, BE_radius_truck(_withC) only
+        s["BE_radius_truck"]; s.last_recomputed
+    """
+    def __init__(self, graph, values=None, **overrides):
+        self.graph = graph
+        self._values = {n: np.asarray(v, dtype=float) for n, v in graph.defaults.items() if v is not None}
+        self._dirty = set(graph.formulas)
+        self.recompute_count = {n: 0 for n in graph.formulas}
+        self.last_recomputed = []
+        self.set(values, **overrides)
+
+    def set(self, values=None, **overrides):
+        """Change inputs; only formulas downstream of inputs whose value changed become dirty."""
+        changed = []
+        for k, v in {**(values or {}), **overrides}.items():
+            if k not in self.graph.defaults:
+                raise KeyError(f"{self.graph.name}: {k!r} is not an input")
+            v = np.asarray(v, dtype=float)
+            old = self._values.get(k)
+            if old is None or old.shape != v.shape or not np.array_equal(old, v, equal_nan=True):
+                self._values[k] = v
+                changed.append(k)
+        if changed:
+            self._dirty |= self.graph.descendants(changed)
+        self.last_recomputed = []
+        return changed
+
+    def get(self, name):
+        if name in self._dirty:
+            todo = self.graph.ancestors([name]) & self._dirty
+            for n in self.graph.order:
+                if n in todo:
+                    fn, deps = self.graph.formulas[n]
+                    self._values[n] = fn(*[self._values[d] for d in deps])
+                    self._dirty.discard(n)
+                    self.recompute_count[n] += 1
+                    self.last_recomputed.append(n)
+        return self._values[name]
+
+    __getitem__ = get
+
+    def values(self, names):
+        """Several quantities as a dict of Python floats (0-d) or arrays."""
+        return {n: _plain(self.get(n)) for n in names}
+
+    def inputs(self):
+        return {n: _plain(self._values[n]) for n in self.graph.defaults if n in self._values}
+
+def _plain(v):
+    v = np.asarray(v)
+    return float(v) if v.ndim == 0 else v
@@ -1,6 +1,245 @@
+# gdx_dump_parser.py
+# Streaming parser for gdxdump text output
+# - Reads the dump in fixed-size text chunks (bounded memory, no whole-file string)
+# - Symbol blocks are detected from their headers, e.g.
+#     Parameter UC_lane(*,*,*) '€/t unit cost per lane i->j,m' /
+#     'i1'.'j1'.'tractor' 21.8165581818182,
+#     ...
+#     'i3'.'j2'.'truck' 19.6242752380952 /;
+#   arity comes from the (*,*,*) domain list; any arity, several symbols per file
+# - Parameter records of a chunk go through pandas' C CSV reader (split on the
+#   quote character, categoricals built in C); a chunk that does not validate
+#   (odd labels, special values) falls back to one regex per symbol. Labels are
+#   coded into per-dimension tables, so index columns come back as categoricals
+# - Sets -> index columns (+ "text"), parameters / scalars -> "value",
+#   variables / equations -> index columns + "field" (L, M, LO, UP, SCALE) + "value"
+# - Special values: Eps -> 0.0, +Inf / -Inf, NA / UNDF -> NaN
+# - parse_gdx_dump keeps its old signature and string columns (i,j,m,value or j,m,value)
+
+import csv
+import io
 import re
+
+import numpy as np
 import pandas as pd
-from pathlib import Path
+
+CHUNK_CHARS = 1 << 23          # ~8 MB of text per read
+
+SPECIAL_VALUES = {"eps": 0.0, "+inf": np.inf, "inf": np.inf, "-inf": -np.inf, "na": np.nan, "undf": np.nan}
+SET_KINDS = ("set", "alias")
+VAR_KINDS = ("variable", "equation")
+
+_HEADER = re.compile(
+    r"^[ \t]*(Set|Parameter|Scalar|Variable|Equation|Alias)s?[ \t]+(\w+)(?:\(([^)\n]*)\))?"
+    r"[ \t]*(?:'[^'\n]*'|\"[^\"\n]*\"|[^/;\n]*?)[ \t]*(/|;|$)",
+    re.I | re.M,
+)
+_END = re.compile(r"/[ \t]*;[ \t]*$", re.M)
+_LABEL = r"'([^']*)'"
+
+def _record_regex(kind, dim):
+    """One compiled pattern per symbol: dim quoted labels joined by '.' plus value / text."""
+    keys = r"\.".join([_LABEL] * dim)
+    if kind in SET_KINDS:
+        return re.compile(r"(?<![\w'])" + keys + r"(?:[ \t]+(?:'([^']*)'|\"([^\"]*)\"|[Yy]))?")
+    if kind in VAR_KINDS:
+        return re.compile(r"(?<![\w'])" + keys + r"\.(\w+)[ \t]+([^\s,/]+)")
+    return re.compile(r"(?<![\w'])" + keys + r"[ \t]+([^\s,/]+)")
+
+def _to_float(tokens):
+    """Numeric tokens -> float array; gdxdump special values handled on the slow path only."""
+    try:
+        return np.array(tokens, dtype=float)
+    except ValueError:
+        out = np.empty(len(tokens))
+        for k, t in enumerate(tokens):
+            try:
+                out[k] = float(t)
+            except ValueError:
+                out[k] = SPECIAL_VALUES.get(str(t).strip().lower(), np.nan)
+        return out
+
+def _read_records(seg, dim):
+    """
+    Fast path for parameter records  'l1'.'l2'...'ln' value,  via the C CSV reader:
+    fields split on the quote, records on ',', the closing '/;' cut as a comment.
+    Returns ([Categorical per dim], values) or None when the chunk does not validate.
+    """
+    seg = seg.rstrip().rstrip(",")             # chunk cut after a record: no empty trailing record
+    names = list(range(2 * dim + 1))
+    try:
+        df = pd.read_csv(io.StringIO(seg), sep="'", quoting=csv.QUOTE_NONE, header=None, names=names,
+                         usecols=names[1::2] + [2 * dim], lineterminator=",", comment="/",
+                         dtype={k: "category" for k in names[1::2]}, na_filter=False, low_memory=False, engine="c")
+    except (ValueError, pd.errors.ParserError):
+        return None
+    # every record carries exactly 2*dim quotes; labels holding ',' or '/' break that
+    if len(df) == 0 or seg.count("'") != 2 * dim * len(df):
+        return None
+    labels = [df[k].array for k in names[1::2]]
+    if any((c == "").any() for c in labels):
+        return None
+    vals = df[2 * dim]
+    values = vals.to_numpy(dtype=float) if vals.dtype.kind in "fi" else _to_float(vals.tolist())
+    return labels, values
+
+class _SymbolBuilder:
+    """Accumulates one symbol's records as int32 label codes + values, chunk by chunk."""
+
+    def __init__(self, name, kind, domain):
+        self.name, self.kind, self.domain = name, kind, domain
+        self.dim = len(domain)
+        self.regex = _record_regex(kind, self.dim) if self.dim else None
+        self.labels = [dict() for _ in range(self.dim)]
+        self.codes = [[] for _ in range(self.dim)]
+        self.values, self.texts, self.fields = [], [], []
+        self.field_labels = {}
+
+    def _code(self, d, codes, uniq):
+        """Chunk-local codes -> codes in this symbol's label table for dimension d."""
+        table = self.labels[d]
+        glob = np.fromiter((table.setdefault(u, len(table)) for u in uniq), dtype=np.int32, count=len(uniq))
+        return glob[codes]
+
+    def feed(self, seg):
+        if self.dim == 0:
+            toks = seg.replace("/", " ").replace(";", " ").replace(",", " ").split()
+            if toks:
+                self.values.append(_to_float(toks[:1]))
+            return 0
+        if "'" not in seg:
+            return 0
+        if self.kind not in SET_KINDS + VAR_KINDS:
+            fast = _read_records(seg, self.dim)
+            if fast is not None:
+                labels, values = fast
+                for d, cat in enumerate(labels):
+                    self.codes[d].append(self._code(d, cat.codes, cat.categories))
+                self.values.append(values)
+                return len(values)
+        rows = self.regex.findall(seg)
+        if not rows:
+            return 0
+        cols = list(zip(*rows)) if isinstance(rows[0], tuple) else [rows]
+        for d in range(self.dim):
+            self.codes[d].append(self._code(d, *pd.factorize(np.asarray(cols[d], dtype=object))))
+        rest = cols[self.dim:]
+        if self.kind in SET_KINDS:
+            self.texts.append(np.where(np.asarray(rest[0], dtype=object) != "",
+                                       np.asarray(rest[0], dtype=object), np.asarray(rest[1], dtype=object)))
+        elif self.kind in VAR_KINDS:
+            codes, uniq = pd.factorize(np.asarray(rest[0], dtype=object))
+            glob = np.fromiter((self.field_labels.setdefault(u.upper(), len(self.field_labels)) for u in uniq),
+                               dtype=np.int32, count=len(uniq))
+            self.fields.append(glob[codes])
+            self.values.append(_to_float(rest[1]))
+        else:
+            self.values.append(_to_float(rest[0]))
+        return len(rows)
+
+    def column_names(self, defaults=None):
+        cols = []
+        for n, d in enumerate(self.domain):
+            if d == "*" and self.dim == 1 and self.kind in SET_KINDS:
+                d = self.name                    # one-dimensional set over *: column named after the set
+            base = defaults[n] if defaults else (f"dim{n + 1}" if d == "*" else d)
+            cols.append(base if base not in cols else f"{base}_{n + 1}")
+        return cols
+
+    def frame(self, columns=None):
+        """Tidy DataFrame: categorical index columns + value / text / field."""
+        out = {}
+        for d, col in enumerate(columns or self.column_names()):
+            codes = np.concatenate(self.codes[d]) if self.codes[d] else np.empty(0, dtype=np.int32)
+            out[col] = pd.Categorical.from_codes(codes, categories=list(self.labels[d]))
+        if self.kind in SET_KINDS:
+            texts = np.concatenate(self.texts) if self.texts else np.empty(0, dtype=object)
+            if (texts != "").any():
+                out["text"] = texts
+        elif self.kind in VAR_KINDS:
+            codes = np.concatenate(self.fields) if self.fields else np.empty(0, dtype=np.int32)
+            out["field"] = pd.Categorical.from_codes(codes, categories=list(self.field_labels))
+        if self.kind not in SET_KINDS:
+            out["value"] = np.concatenate(self.values) if self.values else np.empty(0)
+        return pd.DataFrame(out)
+
+# -----------------------
+# Streaming reader
+# -----------------------
+def _chunks(path, chunk_chars):
+    """Text chunks that always end on a line break (last one may not)."""
+    with open(path, encoding="utf-8", errors="ignore") as fh:
+        tail = ""
+        while True:
+            block = fh.read(chunk_chars)
+            if not block:
+                if tail:
+                    yield tail
+                return
+            block = tail + block
+            cut = block.rfind("\n") + 1
+            if cut == 0:
+                tail = block
+                continue
+            tail = block[cut:]
+            yield block[:cut]
+
+def _headerless_symbol(text):
+    """Bare record lines without a header (old-style dumps): arity from the first record."""
+    line = text.lstrip().split("\n", 1)[0]
+    m = re.match(r"((?:'[^']*'\.)*'[^']*')", line)
+    dim = m.group(1).count("'.'") + 1 if m else 0
+    return _SymbolBuilder("value", "parameter", ["*"] * dim) if dim else None
+
+def iter_symbols(path, symbols=None, chunk_chars=CHUNK_CHARS):
+    """
+    Stream a gdxdump file and yield one _SymbolBuilder per finished symbol block.
+    symbols: optional iterable of names to keep (case-insensitive); others are skipped
+    without coding their records.
+    """
+    keep = None if symbols is None else {s.lower() for s in symbols}
+    cur, skip, seen_any = None, False, False
+    for text in _chunks(path, chunk_chars):
+        pos, n = 0, len(text)
+        if not seen_any and text.strip():
+            seen_any = True
+            if text.lstrip().startswith("'"):
+                cur = _headerless_symbol(text)
+        while pos < n:
+            if cur is None and not skip:
+                m = _HEADER.search(text, pos)
+                if m is None:
+                    break
+                pos = m.end()
+                if m.group(4) != "/":          # declaration only (no data block on this line)
+                    continue
+                kind, name = m.group(1).lower(), m.group(2)
+                domain = [d.strip() for d in m.group(3).split(",")] if m.group(3) else []
+                if kind == "scalar":
+                    kind = "parameter"
+                if keep is not None and name.lower() not in keep:
+                    skip = True
+                else:
+                    cur = _SymbolBuilder(name, kind, domain)
+                continue
+            e = _END.search(text, pos)
+            stop = e.end() if e else n
+            if cur is not None:
+                cur.feed(text[pos:stop])
+            pos = stop
+            if e:
+                if cur is not None:
+                    yield cur
+                cur, skip = None, False
+    if cur is not None:                          # unterminated / headerless block
+        yield cur
+
+def read_gdx_dump(path, symbols=None, chunk_chars=CHUNK_CHARS):
+    """
+    All (or the requested) symbols of a gdxdump file as {name: DataFrame}, index columns
+    categorical and named after the domain (dimN for '*').
+    """
+    return {s.name: s.frame() for s in iter_symbols(path, symbols, chunk_chars)}
 
 def parse_gdx_dump(path, names_3=("i","j","m"), name_value="value"):
     """
@@ -9,24 +248,20 @@ def parse_gdx_dump(path, names_3=("i","j","m"), name_value="value"):
     and return a tidy DataFrame with cols i,j,m,value.
     Also works for 2-tuple dumps (e.g., 'j1'.'truck' 62.69)
     and returns cols j,m,value in that case.
+    First 3-dimensional symbol in the file wins, else the first 2-dimensional one;
+    other arities get dim1..dimN. Index columns are plain strings (old behaviour).
     """
-    p = Path(path)
-    text = p.read_text(encoding="utf-8", errors="ignore")
-
-    # Try 3-tuple first
-    pat3 = re.compile(r"'([^']+)'\.'([^']+)'\.'([^']+)'\s+([-+0-9Ee\.]+)")
-    rows3 = [m.groups() for m in pat3.finditer(text)]
-    if rows3:
-        out = pd.DataFrame(rows3, columns=[*names_3, name_value])
-        out[name_value] = pd.to_numeric(out[name_value], errors="coerce")
-        return out.dropna(subset=[name_value])
-
-    # Fallback: 2-tuple
-    pat2 = re.compile(r"'([^']+)'\.'([^']+)'\s+([-+0-9Ee\.]+)")
-    rows2 = [m.groups() for m in pat2.finditer(text)]
-    if rows2:
-        out = pd.DataFrame(rows2, columns=[names_3[1], names_3[2], name_value])
-        out[name_value] = pd.to_numeric(out[name_value], errors="coerce")
-        return out.dropna(subset=[name_value])
-
-    raise ValueError(f"No parseable rows found in {path}. Check the file content.")
\ No newline at end of file
+    found = {}
+    for s in iter_symbols(path):
+        if s.kind not in SET_KINDS and s.dim >= 1:
+            found.setdefault(s.dim, s)
+            if s.dim == 3:
+                break
+    if not found:
+        raise ValueError(f"No parseable rows found in {path}. Check the file content.")
+    s = found.get(3) or found.get(2) or next(iter(found.values()))
+    names = list(names_3) if s.dim == 3 else [names_3[1], names_3[2]] if s.dim == 2 else None
+    out = s.frame(s.column_names(names) if names else None).rename(columns={"value": name_value})
+    for c in out.columns[:s.dim]:
+        out[c] = out[c].astype(object)
+    return out.dropna(subset=[name_value]).reset_index(drop=True)
@@ -0,0 +1,314 @@
+# gdx_reader.py
+# Pure-Python reader for GAMS .gdx files (format version 7, uncompressed)
+# - No gdxdump subprocess and no GAMS API: header, symbol table, UEL table, set
+#   texts and domains are read from their section offsets; symbol data is only
+#   decoded for the symbols asked for (seek to the symbol's data position)
+# - Sets -> DataFrame of categorical index columns (+ "text" when set texts exist)
+# - Parameters -> categorical index columns + "value"
+# - Variables / equations -> index columns + level, marginal, lower, upper, scale
+# - Special values map to NaN (UNDF, NA), ±inf, and EPS -> 0.0 (or a custom value)
+# - Compressed GDX (written with GDXCOMPRESS=1) is not supported; re-export
+#   uncompressed or fall back to gdxdump + gdx_dump_parser
+
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SYMBOL_TYPES = {0: "set", 1: "parameter", 2: "variable", 3: "equation", 4: "alias"}
+VALUE_FIELDS = {0: ("value",), 1: ("value",), 2: ("level", "marginal", "lower", "upper", "scale"),
+                3: ("level", "marginal", "lower", "upper", "scale")}
+
+_MARK_BOI = 19510624
+_EOF_DATA = 255
+_VM_NORMAL = 10
+
+_I32 = struct.Struct("<i")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_U16 = struct.Struct("<H")
+
+class GdxFormatError(ValueError):
+    """File is not a GDX file this reader understands."""
+
+def _special_values(eps):
+    # vm_valund, vm_valna, vm_valpin, vm_valmin, vm_valeps, vm_zero, vm_one, vm_mone, vm_half, vm_two
+    return (np.nan, np.nan, np.inf, -np.inf, eps, 0.0, 1.0, -1.0, 0.5, 2.0)
+
+class _Cursor:
+    """Little-endian reader over an in-memory byte range."""
+    __slots__ = ("buf", "pos")
+
+    def __init__(self, buf, pos=0):
+        self.buf, self.pos = buf, pos
+
+    def byte(self):
+        b = self.buf[self.pos]
+        self.pos += 1
+        return b
+
+    def i32(self):
+        v = _I32.unpack_from(self.buf, self.pos)[0]
+        self.pos += 4
+        return v
+
+    def i64(self):
+        v = _I64.unpack_from(self.buf, self.pos)[0]
+        self.pos += 8
+        return v
+
+    def string(self):
+        n = self.byte()
+        s = bytes(self.buf[self.pos:self.pos + n]).decode("utf-8", errors="replace")
+        self.pos += n
+        return s
+
+    def expect(self, mark):
+        s = self.string()
+        if s != mark:
+            raise GdxFormatError(f"expected section marker {mark!r} at byte {self.pos}, found {s!r}")
+
+class GdxFile:
+    """
+    Lazy GDX reader.
+
+        with GdxFile("results.gdx") as g:
+            g.symbols                 # DataFrame: name, type, dim, records, text, domain
+            df = g.read("PROFITMAP")  # p, d (categorical), value
+    """
+    def __init__(self, path, eps=0.0):
+        self.path = Path(path)
+        self.eps = eps
+        self._fh = open(self.path, "rb")
+        self._read_header()
+        self._read_symbols()
+        self._read_uels()
+        self._read_set_texts()
+        self._read_domains()
+
+    # ----- context manager -----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._fh.close()
+
+    # ----- low level -----
+    def _section(self, pos, size=None):
+        self._fh.seek(pos)
+        return _Cursor(self._fh.read(-1 if size is None else size))
+
+    def _read_header(self):
+        c = self._section(0, 4096)
+        # stream header: sizes + byte-order probes (word 0x1234, int 0x12345678, double pi)
+        if c.byte() != 2 or _U16.unpack_from(c.buf, c.pos)[0] != 0x1234:
+            raise GdxFormatError(f"{self.path}: not a little-endian GDX stream")
+        c.pos += 2
+        c.byte(); c.i32()
+        c.byte(); c.pos += 8
+        if c.byte() != 123 or c.string() != "GAMSGDX":
+            raise GdxFormatError(f"{self.path}: missing GAMSGDX header")
+        self.version = c.i32()
+        compressed = c.i32()
+        if self.version != 7:
+            raise GdxFormatError(f"{self.path}: GDX version {self.version} not supported (need 7)")
+        if compressed:
+            raise GdxFormatError(f"{self.path}: compressed GDX not supported; write it uncompressed")
+        self.audit = c.string()
+        self.producer = c.string()
+        if c.i32() != _MARK_BOI:
+            raise GdxFormatError(f"{self.path}: bad section index marker")
+        (self._symb_pos, self._uel_pos, self._sett_pos,
+         self._acro_pos, _next_write, self._doms_pos) = (c.i64() for _ in range(6))
+
+    def _read_symbols(self):
+        c = self._section(self._symb_pos, self._uel_pos - self._symb_pos if self._uel_pos > self._symb_pos else None)
+        c.expect("_SYMB_")
+        rows = []
+        for _ in range(c.i32()):
+            name = c.string()
+            pos = c.i64()
+            dim = c.i32()
+            typ = c.byte()
+            user_info = c.i32()
+            records = c.i32()
+            c.i32()                              # error count
+            has_text = c.byte()
+            text = c.string()
+            c.byte()                             # compressed symbol flag
+            dom_syms = [c.i32() for _ in range(dim)] if c.byte() else None
+            for _ in range(c.i32()):             # comments
+                c.string()
+            rows.append(dict(name=name, type=SYMBOL_TYPES.get(typ, str(typ)), dim=dim, records=records,
+                             text=text, _pos=pos, _typ=typ, _has_text=bool(has_text),
+                             _user_info=user_info, _dom_syms=dom_syms))
+        self._symbols = rows
+        self._by_name = {r["name"].lower(): r for r in rows}
+
+    def _read_uels(self):
+        c = self._section(self._uel_pos)
+        c.expect("_UEL_")
+        self.uels = [c.string() for _ in range(c.i32())]
+
+    def _read_set_texts(self):
+        c = self._section(self._sett_pos)
+        c.expect("_SETT_")
+        self.set_texts = [c.string() for _ in range(c.i32())]
+
+    def _read_domains(self):
+        for s in self._symbols:
+            s["domain"] = ["*"] * s["dim"]
+        if self._doms_pos <= 0:
+            return
+        c = self._section(self._doms_pos)
+        c.expect("_DOMS_")
+        names = [c.string() for _ in range(c.i32())]
+        c.expect("_DOMS_")
+        while True:
+            nr = c.i32()
+            if nr <= 0:
+                break
+            s = self._symbols[nr - 1]
+            s["domain"] = [names[c.i32() - 1] for _ in range(s["dim"])]
+        for s in self._symbols:              # domain given as symbol numbers in the symbol table
+            if s["_dom_syms"] and all(d == "*" for d in s["domain"]):
+                s["domain"] = [self._symbols[k - 1]["name"] if k > 0 else "*" for k in s["_dom_syms"]]
+
+    # ----- public -----
+    @property
+    def symbols(self):
+        """Symbol list (name, type, dim, records, text, domain) without reading any data."""
+        return pd.DataFrame([{k: v for k, v in s.items() if not k.startswith("_")} for s in self._symbols],
+                            columns=["name", "type", "dim", "records", "text", "domain"])
+
+    def __contains__(self, name):
+        return name.lower() in self._by_name
+
+    def index_columns(self, name):
+        """Column names for the symbol's index positions (domain names, de-duplicated)."""
+        s = self._symbol(name)
+        cols = []
+        for n, d in enumerate(s["domain"]):
+            if d == "*" and s["dim"] == 1 and s["_typ"] in (0, 4):
+                d = s["name"]                   # one-dimensional set over *: column named after the set
+            base = f"dim{n + 1}" if d == "*" else d
+            cols.append(base if base not in cols else f"{base}_{n + 1}")
+        return cols
+
+    def _symbol(self, name):
+        try:
+            return self._by_name[name.lower()]
+        except KeyError:
+            raise KeyError(f"{name!r} not in {self.path.name}; symbols: {[s['name'] for s in self._symbols]}") \
+                from None
+
+    def read_arrays(self, name):
+        """
+        Raw decode of one symbol: (uel_index int32 array (records × dim), values float array
+        (records × fields)). UEL indices are 1-based into self.uels.
+        """
+        s = self._symbol(name)
+        if s["_typ"] == 4:                      # alias: data lives with the aliased set
+            return self.read_arrays(self._symbols[s["_user_info"] - 1]["name"])
+        dim = s["dim"]
+        nval = len(VALUE_FIELDS[s["_typ"]])
+        n = s["records"]
+        self._fh.seek(s["_pos"])
+        # bound the read: data ends before the next symbol's data or the symbol table
+        later = [t["_pos"] for t in self._symbols if t["_pos"] > s["_pos"]]
+        end = min(later) if later else self._symb_pos
+        c = _Cursor(self._fh.read(max(0, end - s["_pos"])))
+        c.expect("_DATA_")
+        if c.byte() != dim:
+            raise GdxFormatError(f"{name}: dimension mismatch in data section")
+        c.i32()
+        lo = [0] * dim
+        size = [4] * dim
+        for d in range(dim):
+            lo[d] = c.i32()
+            span = c.i32() - lo[d] + 1
+            size[d] = 1 if 0 < span <= 255 else 2 if 0 < span <= 65535 else 4
+
+        keys = np.empty((n, dim), dtype=np.int32)
+        vals = np.empty((n, nval), dtype=float)
+        special = _special_values(self.eps)
+        buf, pos = c.buf, c.pos
+        unpack_i32, unpack_u16, unpack_f64 = _I32.unpack_from, _U16.unpack_from, _F64.unpack_from
+        last = [0] * dim
+        r = 0
+        while True:
+            b = buf[pos]
+            pos += 1
+            if b > dim:
+                if b == _EOF_DATA:
+                    break
+                if dim:
+                    last[dim - 1] += b - dim
+            else:
+                for d in range(b - 1, dim):
+                    sz = size[d]
+                    if sz == 4:
+                        last[d] = unpack_i32(buf, pos)[0] + lo[d]
+                    elif sz == 1:
+                        last[d] = buf[pos] + lo[d]
+                    else:
+                        last[d] = unpack_u16(buf, pos)[0] + lo[d]
+                    pos += sz
+            if r == len(keys):                   # record count in the symbol table was short
+                keys = np.concatenate([keys, np.empty_like(keys[:max(1, r)])])
+                vals = np.concatenate([vals, np.empty_like(vals[:max(1, r)])])
+            keys[r] = last
+            for v in range(nval):
+                t = buf[pos]
+                pos += 1
+                if t == _VM_NORMAL:
+                    vals[r, v] = unpack_f64(buf, pos)[0]
+                    pos += 8
+                else:
+                    vals[r, v] = special[t]
+            r += 1
+        return keys[:r], vals[:r]
+
+    def read(self, name, columns=None):
+        """
+        One symbol as a tidy DataFrame with categorical index columns.
+        columns: optional names for the index columns (default: domain names / dimN).
+        """
+        s = self._symbol(name)
+        keys, vals = self.read_arrays(name)
+        cols = list(columns) if columns is not None else self.index_columns(name)
+        uels = np.asarray(self.uels, dtype=object)
+        out = {}
+        for d, col in enumerate(cols):
+            codes, inv = np.unique(keys[:, d], return_inverse=True)
+            out[col] = pd.Categorical.from_codes(inv.astype(np.int32), categories=uels[codes - 1])
+        df = pd.DataFrame(out)
+        typ = s["_typ"] if s["_typ"] != 4 else 0
+        if typ == 0:
+            if s["_has_text"] and len(self.set_texts) > 1:
+                idx = np.nan_to_num(vals[:, 0]).astype(np.int64)
+                texts = np.asarray(self.set_texts, dtype=object)
+                df["text"] = np.where((idx > 0) & (idx < len(texts)), texts[np.clip(idx, 0, len(texts) - 1)], "")
+        else:
+            for k, field in enumerate(VALUE_FIELDS[typ]):
+                df[field] = vals[:, k]
+        return df
+
+    def read_many(self, names=None):
+        """Several symbols at once (default: all) as {name: DataFrame}."""
+        names = [s["name"] for s in self._symbols] if names is None else names
+        return {n: self.read(n) for n in names}
+
+def read_gdx(path, *names, eps=0.0):
+    """Convenience: {name: DataFrame} for the requested symbols (all when none given)."""
+    with GdxFile(path, eps=eps) as g:
+        return g.read_many(list(names) or None)
+
+def list_symbols(path):
+    """Symbol table of a GDX file without reading data."""
+    with GdxFile(path) as g:
+        return g.symbols
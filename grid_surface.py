@@ -0,0 +1,216 @@
+# grid_surface.py
+# Grid-indexed 2-D surfaces (profit over price x distance, BE heatmaps, ...)
+# - GridSurface holds z[ix, iy] on sorted x / y axes; a long table is pivoted once
+#   (np.unique codes), after that no query scans or sorts the table
+# - GridAxis detects a regular axis once (start + k * step): grid lookups, ranges and
+#   interpolation cells are direct index arithmetic; irregular axes use searchsorted
+# - Queries: window (sub-rectangle as array views), slice_x / slice_y (exact row or
+#   interpolated), at (nearest / bilinear / cubic at any off-grid points, vectorized)
+# - Cubic: Keys cubic convolution (Catmull-Rom, a = -0.5) with Keys' boundary
+#   extension, exact for polynomials up to degree 2; needs regular axes with >= 3 points
+# - Outside the grid, queries are clamped to the border cells (linear/cubic extrapolate
+#   from the outermost cell)
+#
+#   surf = GridSurface.load("profit_surface.npz")      # or the long profit_surface.csv
+#   surf.slice_x(525)                                   # profit vs distance at 525 €/t
+#   surf.at([410, 612.5], [33.3, 150], method="cubic")
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from profit_surface import AXES, VALUE, read_surface
+
+class GridAxis:
+    """Sorted axis values; regular axes answer lookups by arithmetic."""
+
+    def __init__(self, values, name=None, unit=None):
+        v = np.asarray(values, dtype=float)
+        if v.ndim != 1 or len(v) == 0:
+            raise ValueError("axis needs a non-empty 1-D array")
+        if len(v) > 1 and not (np.diff(v) > 0).all():
+            raise ValueError(f"axis {name!r} must be strictly increasing")
+        self.values, self.name, self.unit = v, name, unit
+        self.start = float(v[0])
+        self.step = (float(v[-1]) - self.start) / (len(v) - 1) if len(v) > 1 else 0.0
+        self.regular = len(v) > 1 and np.allclose(np.diff(v), self.step, rtol=0, atol=1e-9 * abs(self.step))
+        self._tol = 1e-9 * max(1.0, abs(self.step), abs(self.start))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        kind = f"regular step {self.step:g}" if self.regular else "irregular"
+        return f"GridAxis({self.name!r}, {len(self)} points {self.values[0]:g}..{self.values[-1]:g}, {kind})"
+
+    @property
+    def lo(self):
+        return float(self.values[0])
+
+    @property
+    def hi(self):
+        return float(self.values[-1])
+
+    def nearest(self, q):
+        """Index of the nearest grid value (clamped to the axis)."""
+        q = np.asarray(q, dtype=float)
+        n = len(self)
+        if n == 1:
+            return np.zeros(q.shape, dtype=np.int64)
+        if self.regular:
+            return np.clip(np.rint((q - self.start) / self.step), 0, n - 1).astype(np.int64)
+        k = np.clip(np.searchsorted(self.values, q), 1, n - 1)
+        return np.where(np.abs(self.values[k - 1] - q) <= np.abs(self.values[k] - q), k - 1, k)
+
+    def index(self, q):
+        """Grid index of each value in q, -1 where q is not a grid value."""
+        q = np.asarray(q, dtype=float)
+        k = self.nearest(q)
+        return np.where(np.abs(self.values[k] - q) <= self._tol, k, -1)
+
+    def locate(self, q):
+        """Cell index i (0..n-2) and fraction t with q = values[i] + t * (values[i+1] - values[i])."""
+        q = np.asarray(q, dtype=float)
+        n = len(self)
+        if n == 1:
+            return np.zeros(q.shape, dtype=np.int64), np.zeros(q.shape)
+        if self.regular:
+            f = (q - self.start) / self.step
+            i = np.clip(np.floor(f), 0, n - 2).astype(np.int64)
+            return i, f - i
+        i = np.clip(np.searchsorted(self.values, q, side="right") - 1, 0, n - 2)
+        return i, (q - self.values[i]) / (self.values[i + 1] - self.values[i])
+
+    def span(self, lo=None, hi=None):
+        """slice of the grid values within [lo, hi]."""
+        n = len(self)
+        if self.regular:
+            a = 0 if lo is None else int(np.clip(np.ceil((lo - self.start) / self.step - 1e-9), 0, n))
+            b = n if hi is None else int(np.clip(np.floor((hi - self.start) / self.step + 1e-9) + 1, 0, n))
+        else:
+            a = 0 if lo is None else int(np.searchsorted(self.values, lo - self._tol, side="left"))
+            b = n if hi is None else int(np.searchsorted(self.values, hi + self._tol, side="right"))
+        return slice(a, max(a, b))
+
+def _keys_weights(t):
+    """Catmull-Rom weights of the points -1, 0, 1, 2 around a cell, t in [0, 1]."""
+    t2, t3 = t * t, t * t * t
+    return ((-t3 + 2 * t2 - t) / 2, (3 * t3 - 5 * t2 + 2) / 2, (-3 * t3 + 4 * t2 + t) / 2, (t3 - t2) / 2)
+
+def _keys_pad(z, axis):
+    """Extend z by one point on both ends of `axis` with Keys' boundary condition."""
+    z = np.moveaxis(z, axis, 0)
+    first = 3 * z[0] - 3 * z[1] + z[2]
+    last = 3 * z[-1] - 3 * z[-2] + z[-3]
+    return np.moveaxis(np.concatenate([first[None], z, last[None]]), 0, axis)
+
+class GridSurface:
+    """z[ix, iy] over x (axis 0) and y (axis 1), e.g. profit[price, distance]."""
+
+    def __init__(self, x, y, z, x_name="x", y_name="y", z_name="z", x_unit=None, y_unit=None, z_unit=None,
+                 meta=None):
+        self.x = x if isinstance(x, GridAxis) else GridAxis(x, x_name, x_unit)
+        self.y = y if isinstance(y, GridAxis) else GridAxis(y, y_name, y_unit)
+        self.z = np.asarray(z)
+        if self.z.shape != (len(self.x), len(self.y)):
+            raise ValueError(f"z has shape {self.z.shape}, axes give {(len(self.x), len(self.y))}")
+        self.z_name, self.z_unit = z_name, z_unit
+        self.meta = meta or {}
+        self._padded = None
+
+    def __repr__(self):
+        return f"GridSurface({self.z_name!r}, {self.x!r}, {self.y!r})"
+
+    @property
+    def shape(self):
+        return self.z.shape
+
+    # -----------------------
+    # Construction
+    # -----------------------
+    @classmethod
+    def from_frame(cls, df, x=AXES[0][0], y=AXES[1][0], z=VALUE[0]):
+        """Pivot a long table once (duplicates: last wins, missing cells: NaN)."""
+        df = df[[x, y, z]].apply(pd.to_numeric, errors="coerce").dropna(subset=[x, y])
+        xs, xi = np.unique(df[x].to_numpy(dtype=float), return_inverse=True)
+        ys, yi = np.unique(df[y].to_numpy(dtype=float), return_inverse=True)
+        Z = np.full((len(xs), len(ys)), np.nan)
+        Z[xi, yi] = df[z].to_numpy(dtype=float)
+        return cls(xs, ys, Z, x, y, z)
+
+    @classmethod
+    def from_surface(cls, surf):
+        """dict from profit_surface.surface / read_surface."""
+        (xn, xu), (yn, yu) = AXES
+        return cls(surf["price"], surf["dist"], surf["profit"], xn, yn, VALUE[0], xu, yu, VALUE[1],
+                   meta=dict(params=surf.get("params", {})))
+
+    @classmethod
+    def load(cls, path, x=AXES[0][0], y=AXES[1][0], z=VALUE[0]):
+        """.npz written by profit_surface.write_surface, or a long CSV with columns x, y, z."""
+        path = Path(path)
+        if path.suffix == ".npz":
+            return cls.from_surface(read_surface(path))
+        return cls.from_frame(pd.read_csv(path), x, y, z)
+
+    def _like(self, xs, ys, z):
+        return GridSurface(GridAxis(xs, self.x.name, self.x.unit), GridAxis(ys, self.y.name, self.y.unit), z,
+                           z_name=self.z_name, z_unit=self.z_unit, meta=self.meta)
+
+    # -----------------------
+    # Queries
+    # -----------------------
+    def window(self, x_range=None, y_range=None):
+        """Sub-rectangle of grid points within the (lo, hi) ranges (views, no copy); None if empty."""
+        sx = self.x.span(*(x_range or (None, None)))
+        sy = self.y.span(*(y_range or (None, None)))
+        if sx.start >= sx.stop or sy.start >= sy.stop:
+            return None
+        return self._like(self.x.values[sx], self.y.values[sy], self.z[sx, sy])
+
+    def slice_x(self, xv, method="linear"):
+        """z along y at x = xv (grid row when xv is on the grid) as a Series indexed by y."""
+        k = int(self.x.index(xv))
+        vals = self.z[k] if k >= 0 else self.at(xv, self.y.values, method)
+        return pd.Series(vals, index=pd.Index(self.y.values, name=self.y.name), name=self.z_name)
+
+    def slice_y(self, yv, method="linear"):
+        """z along x at y = yv as a Series indexed by x."""
+        k = int(self.y.index(yv))
+        vals = self.z[:, k] if k >= 0 else self.at(self.x.values, yv, method)
+        return pd.Series(vals, index=pd.Index(self.x.values, name=self.x.name), name=self.z_name)
+
+    def at(self, xq, yq, method="linear"):
+        """z at arbitrary (broadcast) points: 'nearest', 'linear' (bilinear) or 'cubic'."""
+        xq, yq = np.broadcast_arrays(np.asarray(xq, dtype=float), np.asarray(yq, dtype=float))
+        if method == "nearest":
+            return self.z[self.x.nearest(xq), self.y.nearest(yq)]
+        i, tx = self.x.locate(xq)
+        j, ty = self.y.locate(yq)
+        if method == "linear":
+            i1 = np.minimum(i + 1, len(self.x) - 1)
+            j1 = np.minimum(j + 1, len(self.y) - 1)
+            z = self.z
+            return ((1 - tx) * ((1 - ty) * z[i, j] + ty * z[i, j1])
+                    + tx * ((1 - ty) * z[i1, j] + ty * z[i1, j1]))
+        if method == "cubic":
+            if not (self.x.regular and self.y.regular and min(self.shape) >= 3):
+                raise ValueError("cubic interpolation needs regular axes with at least 3 points")
+            if self._padded is None:
+                self._padded = _keys_pad(_keys_pad(self.z.astype(float), 0), 1)
+            zp, wx, wy = self._padded, _keys_weights(tx), _keys_weights(ty)
+            out = np.zeros(xq.shape)
+            for a in range(4):
+                row = np.zeros(xq.shape)
+                for b in range(4):
+                    row += wy[b] * zp[i + a, j + b]      # padded index i + a  <->  grid index i - 1 + a
+                out += wx[a] * row
+            return out
+        raise ValueError(f"unknown method {method!r} (nearest, linear, cubic)")
+
+    def frame(self):
+        """Long format (x, y, z), x outer."""
+        nx, ny = self.shape
+        return pd.DataFrame({self.x.name: np.repeat(self.x.values, ny), self.y.name: np.tile(self.y.values, nx),
+                             self.z_name: self.z.reshape(-1)})
@@ -1,16 +1,43 @@
 from pathlib import Path
 import pandas as pd
 import matplotlib.pyplot as plt
-from gdx_dump_parser import parse_gdx_dump
+from gdx_reader import GdxFile
+from results_store import load_table
+from run_catalog import output_path
 
 # ---------- config ----------
 OUTDIR = Path("figures")
 OUTDIR.mkdir(exist_ok=True)
 FONT_SIZE = 10
+GDX_FILE = Path("excel_out.gdx")   # read symbols straight from here when a gdxdump CSV is missing
 plt.rcParams.update({"font.size": FONT_SIZE})
 
 def lane_label(df, i="i", j="j", m="m"):
-    return df[i] + "→" + df[j] + " (" + df[m] + ")"
+    return df[i].astype(str) + "→" + df[j].astype(str) + " (" + df[m].astype(str) + ")"
+
+def load_symbol(src):
+    """
+    gdxdump CSV path, or a tidy frame already in memory (e.g. upstream_lp.analytics_frames).
+    A missing '<SYMBOL>.csv' is read from GDX_FILE instead (no gdxdump needed).
+    """
+    if isinstance(src, pd.DataFrame):
+        return src.copy()
+    src = output_path(src)     # $PYROCOST_RUN selects a catalogued run
+    if not Path(src).exists() and GDX_FILE.exists():
+        with GdxFile(GDX_FILE) as g:
+            name = Path(src).stem
+            if name in g:
+                return g.read(name)
+    return load_table(src)     # gdxdump CSV, memory-mapped from .results/ after the first parse
+
+def available(csv_path):
+    """CSV dump on disk (or in the selected run), or the symbol inside GDX_FILE."""
+    if output_path(csv_path).exists():
+        return True
+    if GDX_FILE.exists():
+        with GdxFile(GDX_FILE) as g:
+            return Path(csv_path).stem in g
+    return False
 
 def save_bar(series: pd.Series, title: str, ylabel: str, fname: str, rotate=45):
     ax = series.plot(kind="bar", figsize=(10, 4), legend=False)
@@ -33,26 +60,26 @@ def save_grouped_bar(df: pd.DataFrame, title: str, ylabel: str, fname: str):
     plt.close()
 
 def uc_lane_total(csv_path="UC_lane.csv"):
-    df = parse_gdx_dump(csv_path)   # i,j,m,value
+    df = load_symbol(csv_path)   # i,j,m,value
     df["lane"] = lane_label(df)
     s = df.set_index("lane")["value"].sort_values(ascending=True)
     save_bar(s, "Unit Cost per Lane (UC_lane)", "€/t", "UC_lane_bar.png")
 
 def um_lane_total(csv_path="UM_lane.csv"):
-    df = parse_gdx_dump(csv_path)
+    df = load_symbol(csv_path)
     df["lane"] = lane_label(df)
     s = df.set_index("lane")["value"].sort_values(ascending=True)
     save_bar(s, "Unit Margin per Lane (UM_lane)", "€/t", "UM_lane_bar.png")
 
 def gm_lane_total(csv_path="GM_lane.csv"):
-    df = parse_gdx_dump(csv_path)
+    df = load_symbol(csv_path)
     df["lane"] = lane_label(df)
     s = df.set_index("lane")["value"].sort_values(ascending=True)
     save_bar(s, "Gross Margin per Lane (€/yr) (GM_lane)", "€/yr", "GM_lane_bar.png")
 
 def rev_cost_grouped(rev_csv="Rev_lane.csv", cost_csv="Cost_lane.csv"):
-    dfr = parse_gdx_dump(rev_csv)   # i,j,m,value  (€/yr)
-    dfc = parse_gdx_dump(cost_csv)  # i,j,m,value  (€/yr)
+    dfr = load_symbol(rev_csv)   # i,j,m,value  (€/yr)
+    dfc = load_symbol(cost_csv)  # i,j,m,value  (€/yr)
     dfr["lane"] = lane_label(dfr)
     dfc["lane"] = lane_label(dfc)
     merged = (dfr[["lane","value"]].rename(columns={"value":"Revenue"})
@@ -61,25 +88,25 @@ def rev_cost_grouped(rev_csv="Rev_lane.csv", cost_csv="Cost_lane.csv"):
 
 def be_radius(csv_path="BE_radius.csv"):
     # 2-tuple: j,m,value (km)
-    df = parse_gdx_dump(csv_path)
-    df["plant_mode"] = df["j"] + " (" + df["m"] + ")"
+    df = load_symbol(csv_path)
+    df["plant_mode"] = df["j"].astype(str) + " (" + df["m"].astype(str) + ")"
     s = df.set_index("plant_mode")["value"].sort_values(ascending=True)
     save_bar(s, "Break-even One-way Radius by Plant & Mode (BE_radius)", "km", "BE_radius_bar.png", rotate=0)
 
 def uc_by_ij_sum_modes(csv_path="UC_lane.csv"):
     # Optional: sum UC across modes by (i,j) to see per-lane average cost ignoring mode detail
-    df = parse_gdx_dump(csv_path)
-    df["ij"] = df["i"] + "→" + df["j"]
+    df = load_symbol(csv_path)
+    df["ij"] = df["i"].astype(str) + "→" + df["j"].astype(str)
     s = df.groupby("ij")["value"].mean().sort_values(ascending=True)  # mean of modes
     save_bar(s, "Unit Cost by (i→j) (mean across modes)", "€/t", "UC_by_ij_mean_modes.png")
 
 def gm_by_i(csv_path="GM_lane.csv"):
-    df = parse_gdx_dump(csv_path)
+    df = load_symbol(csv_path)
     s = df.groupby("i")["value"].sum().sort_values(ascending=True)  # €/yr by farm
     save_bar(s, "Gross Margin by Farm (sum over j,m)", "€/yr", "GM_by_farm.png")
 
 def gm_by_j(csv_path="GM_lane.csv"):
-    df = parse_gdx_dump(csv_path)
+    df = load_symbol(csv_path)
     s = df.groupby("j")["value"].sum().sort_values(ascending=True)  # €/yr by plant
     save_bar(s, "Gross Margin by Plant (sum over i,m)", "€/yr", "GM_by_plant.png")
 
@@ -99,20 +126,20 @@ def main():
     here = Path(".")
     print(f"[make_all_upstream_viz] looking in: {here.resolve()}")
     # 3-tuple charts
-    if Path("UC_lane.csv").exists():
+    if available("UC_lane.csv"):
         print("  • UC_lane.csv -> UC charts")
         uc_lane_total("UC_lane.csv")
         uc_by_ij_sum_modes("UC_lane.csv")
     else:
         print("  • UC_lane.csv not found — skipping")
 
-    if Path("UM_lane.csv").exists():
+    if available("UM_lane.csv"):
         print("  • UM_lane.csv -> UM charts")
         um_lane_total("UM_lane.csv")
     else:
         print("  • UM_lane.csv not found — skipping")
 
-    if Path("GM_lane.csv").exists():
+    if available("GM_lane.csv"):
         print("  • GM_lane.csv -> GM charts")
         gm_lane_total("GM_lane.csv")
         gm_by_i("GM_lane.csv")
@@ -120,14 +147,14 @@ def main():
     else:
         print("  • GM_lane.csv not found — skipping")
 
-    if Path("Rev_lane.csv").exists() and Path("Cost_lane.csv").exists():
+    if available("Rev_lane.csv") and available("Cost_lane.csv"):
         print("  • Rev_lane + Cost_lane -> grouped chart")
         rev_cost_grouped("Rev_lane.csv", "Cost_lane.csv")
     else:
         print("  • Rev_lane.csv or Cost_lane.csv missing — skipping grouped chart")
 
     # 2-tuple chart
-    if Path("BE_radius.csv").exists():
+    if available("BE_radius.csv"):
         print("  • BE_radius.csv -> BE radius chart")
         be_radius("BE_radius.csv")
     else:
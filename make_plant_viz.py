@@ -9,20 +9,22 @@
 import matplotlib
 matplotlib.use("Agg")  # non-GUI backend for batch save
 import matplotlib.pyplot as plt
-import pandas as pd
 from pathlib import Path
 
+from results_store import load_table
+from run_catalog import output_path
+
 ROOT = Path(".")
 FIGDIR = ROOT / "figures" / "plant"
 FIGDIR.mkdir(parents=True, exist_ok=True)
 
 # ---------- Helpers ----------
 def read_csv_safe(path):
-    p = Path(path)
+    p = output_path(path)   # $PYROCOST_RUN selects a catalogued run; default: repo-root file
     if not p.exists():
         raise FileNotFoundError(f"Missing file: {p.resolve()}")
-    # safe read (handles potential quoting)
-    return pd.read_csv(p)
+    # parsed once, then memory-mapped from .results/ until the CSV changes
+    return load_table(p)
 
 def save_and_close(figpath):
     plt.tight_layout()
@@ -0,0 +1,418 @@
+# monte_carlo.py
+# Monte Carlo uncertainty engine for the plant-first payable / break-even model
+# - Per-parameter marginals (normal, truncnormal, lognormal, uniform, triangular,
+#   pert) joined by a Gaussian copula (correlation matrix on the normal scores)
+# - Samples are drawn and evaluated in chunks with the compiled PLANTFLIP evaluator;
+#   every KPI is folded into a QuantileSketch (fixed-size histogram + moments), so
+#   memory stays flat from 10^4 to 10^7 samples
+# - Reproducible: chunk k always uses SeedSequence(seed).spawn(...)[k], whatever the
+#   number of workers; histograms merge exactly, so quantiles do not depend on
+#   workers either (process pool via workers=N, same pattern as upstream_scenarios)
+# - grid=("P_char", values): one input swept deterministically, every KPI becomes a
+#   band over the grid; probe: extra derived outputs (e.g. delivered cost vs km)
+#
+#   res = simulate(1_000_000, workers=4)
+#   summary_frame(res["sketches"])                  # mean, P10, P50, P90 per KPI
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+import numpy as np
+import pandas as pd
+from scipy.special import betainc, ndtr, ndtri
+
+from plantflip_kernel import DEFAULTS, MODES, PLANTFLIP
+
+CHUNK = 100_000          # samples per chunk (scaled down for wide grids / probes)
+CHUNK_CELLS = 4_000_000  # max samples x channels evaluated at once
+BINS = 2048              # histogram bins per channel
+
+# -----------------------
+# Default uncertainty (around DEFAULTS; placeholders until fitted to data)
+# -----------------------
+UNCERTAIN = dict(
+    P_char=("pert", 400.0, 550.0, 750.0),               # €/t biochar
+    P_el=("triangular", 0.08, 0.11, 0.15),              # €/kWh
+    MC_asrec=("uniform", 0.15, 0.35),                   # chip moisture (GAMS runs: .25/.35)
+    CO2eq_per_tchar=("pert", 2.2, 2.87, 3.2),           # placeholder value in DEFAULTS
+    Chipper_m3_h=("truncnormal", 25.0, 4.0, 12.0, 40.0),
+    BulkDensity_t_m3=("truncnormal", 0.30, 0.04, 0.20, 0.42),
+)
+
+# Gaussian-copula correlations (on normal scores, ~ rank correlation)
+CORRELATIONS = {
+    ("MC_asrec", "BulkDensity_t_m3"): 0.6,   # wetter chips are heavier per m³
+    ("P_char", "P_el"): 0.3,
+}
+
+MC_KPIS = (
+    "P_chip_payable_DM", "P_chip_payable_asrec", "P_chip_payable_asrec_withC", "CarbonPremium_DM",
+    *(f"BE_radius_{m}" for m in MODES), *(f"BE_radius_{m}_withC" for m in MODES), "PayableBudget_yr",
+)
+
+# quantities the probes below read from the evaluated chunk
+_PROBE_NEEDS = ("C_chip_eurt", "C_handle_eurt", *(f"C_surcharge_{m}" for m in MODES),
+                *(f"C_tkm_{m}" for m in MODES))
+
+# -----------------------
+# Marginals (inverse CDF of u in (0,1))
+# -----------------------
+def _ppf_normal(u, mu, sd):
+    return mu + sd * ndtri(u)
+
+def _ppf_truncnormal(u, mu, sd, lo, hi):
+    a, b = ndtr((lo - mu) / sd), ndtr((hi - mu) / sd)
+    return np.clip(mu + sd * ndtri(a + u * (b - a)), lo, hi)
+
+def _ppf_lognormal(u, mean, sd):
+    s2 = math.log1p((sd / mean) ** 2)
+    return np.exp(math.log(mean) - s2 / 2 + math.sqrt(s2) * ndtri(u))
+
+def _ppf_uniform(u, lo, hi):
+    return lo + u * (hi - lo)
+
+def _ppf_triangular(u, lo, mode, hi):
+    if hi == lo:                                  # point mass
+        return np.full(np.shape(u), float(lo))
+    c = (mode - lo) / (hi - lo)
+    return np.where(u < c, lo + np.sqrt(u * (hi - lo) * (mode - lo)),
+                    hi - np.sqrt((1 - u) * (hi - lo) * (hi - mode)))
+
+@lru_cache(maxsize=64)
+def _beta_cdf_table(a, b, points=8193):
+    # betaincinv is ~50x slower than the rest of a chunk: invert a tabulated CDF
+    # instead (error <= (hi - lo) / 8192, far below any input uncertainty)
+    x = np.linspace(0.0, 1.0, points)
+    return betainc(a, b, x), x
+
+def _ppf_pert(u, lo, mode, hi, lam=4.0):
+    if hi == lo:                                  # point mass
+        return np.full(np.shape(u), float(lo))
+    a = 1 + lam * (mode - lo) / (hi - lo)
+    b = 1 + lam * (hi - mode) / (hi - lo)
+    cdf, x = _beta_cdf_table(float(a), float(b))
+    return lo + (hi - lo) * np.interp(u, cdf, x)
+
+MARGINALS = dict(
+    normal=_ppf_normal, truncnormal=_ppf_truncnormal, lognormal=_ppf_lognormal,
+    uniform=_ppf_uniform, triangular=_ppf_triangular, pert=_ppf_pert,
+)
+
+def _center(dist):
+    kind, *a = dist
+    return dict(uniform=(a[0] + a[-1]) / 2, triangular=a[1], pert=a[1]).get(kind, a[0])
+
+def scaled_to(base, dists=UNCERTAIN):
+    """
+    Re-center each distribution on the value in `base` (mode/mean moves there, relative
+    spread kept), e.g. to put the default uncertainty around the app's current inputs.
+    A base value of 0 has no relative spread: the parameter becomes a point mass at 0.
+
+    >>> scaled_to(dict(P_el=0.0, P_char=1100.0))["P_el"], scaled_to(dict(P_char=1100.0))["P_char"]
+    (('uniform', 0.0, 0.0), ('pert', 800.0, 1100.0, 1500.0))
+    >>> res = simulate(2000, scaled_to(dict(P_el=0.0, P_char=0.0, CO2eq_per_tchar=0.0)), chunk=1000)
+    >>> float(res["sketches"]["P_chip_payable_DM"].max[0]) < 0      # no revenue at all
+    True
+    """
+    out = {}
+    for name, dist in dists.items():
+        c = _center(dist)
+        if name in base and float(base[name]) == 0.0:
+            out[name] = ("uniform", 0.0, 0.0)
+            continue
+        f = float(base[name]) / c if name in base and c else 1.0
+        out[name] = (dist[0], *(v * f for v in dist[1:]))
+    return out
+
+def correlation_matrix(names, corr=None):
+    """Symmetric correlation matrix over `names`; raises if not positive definite."""
+    names = list(names)
+    R = np.eye(len(names))
+    for (a, b), rho in (corr or {}).items():
+        if a in names and b in names:
+            i, j = names.index(a), names.index(b)
+            R[i, j] = R[j, i] = rho
+    try:
+        L = np.linalg.cholesky(R)
+    except np.linalg.LinAlgError:
+        raise ValueError(f"correlations {corr} are not a valid (positive definite) correlation matrix")
+    return R, L
+
+def sample(dists, n, rng, corr=None):
+    """n correlated draws per parameter -> dict name -> (n,) array."""
+    names = list(dists)
+    unknown = [k for k in names if k not in DEFAULTS]
+    if unknown:
+        raise KeyError(f"unknown parameter(s) {unknown}")
+    _, L = correlation_matrix(names, corr)
+    u = ndtr(rng.standard_normal((n, len(names))) @ L.T)
+    out = {}
+    for k, name in enumerate(names):
+        kind, *args = dists[name]
+        if kind not in MARGINALS:
+            raise ValueError(f"{name}: unknown distribution {kind!r} (one of {sorted(MARGINALS)})")
+        out[name] = MARGINALS[kind](u[:, k], *args)
+    return out
+
+# -----------------------
+# Streaming quantiles
+# -----------------------
+class QuantileSketch:
+    """
+    Streaming histogram of one quantity with per-channel shape (e.g. one channel per
+    km or per P_char grid point). Bin width is a power of two and bins are aligned to
+    multiples of it, chosen as the finest grid that fits the data seen so far in
+    `bins` bins; merging two sketches is therefore exact and order-independent.
+    Also keeps exact count, mean, variance, min and max. NaN/inf are counted apart.
+    """
+    def __init__(self, shape=(), bins=BINS):
+        self.shape = tuple(shape)
+        self.bins = bins
+        C = int(np.prod(self.shape))
+        self.counts = np.zeros((C, bins))
+        self.exp = np.zeros(C, dtype=np.int64)     # bin width = 2**exp
+        self.k0 = np.zeros(C, dtype=np.int64)      # first bin starts at k0 * width
+        self.n = np.zeros(C)
+        self.mean = np.zeros(C)
+        self.m2 = np.zeros(C)
+        self.min = np.full(C, np.inf)
+        self.max = np.full(C, -np.inf)
+        self.n_nonfinite = np.zeros(C)
+
+    # ----- grid -----
+    def _target_grid(self, lo, hi):
+        """Finest power-of-two width fitting [lo, hi] in `bins` bins (per channel)."""
+        span = np.maximum(hi - lo, 0.0)
+        scale = np.maximum(np.maximum(np.abs(lo), np.abs(hi)), 1e-12)
+        floor_exp = np.floor(np.log2(scale)).astype(np.int64) - 40    # never finer than ~1e-12 relative
+        with np.errstate(divide="ignore"):
+            e = np.where(span > 0, np.ceil(np.log2(span / self.bins)), floor_exp)
+        e = np.maximum(e.astype(np.int64), floor_exp)
+        while True:
+            w = np.ldexp(1.0, e)
+            too_wide = np.floor(hi / w) - np.floor(lo / w) > self.bins - 1
+            if not too_wide.any():
+                return e, np.floor(lo / w).astype(np.int64)
+            e = e + too_wide
+
+    def _rebin(self, rows, e1, k1):
+        """Move the counts of `rows` onto grids (e1, k1); e1 >= current exp."""
+        B = self.bins
+        shift = (e1 - self.exp[rows])[:, None]
+        idx = ((self.k0[rows][:, None] + np.arange(B)) >> shift) - k1[:, None]
+        idx = np.clip(idx, 0, B - 1) + np.arange(len(rows))[:, None] * B
+        self.counts[rows] = np.bincount(idx.ravel(), weights=self.counts[rows].ravel(),
+                                        minlength=len(rows) * B).reshape(len(rows), B)
+        self.exp[rows], self.k0[rows] = e1, k1
+
+    def _regrid(self, lo, hi):
+        ok = np.isfinite(lo)
+        e1, k1 = self._target_grid(np.where(ok, lo, 0.0), np.where(ok, hi, 0.0))
+        has = self.n > 0
+        moved = ok & has & ((e1 != self.exp) | (k1 != self.k0))
+        if moved.any():
+            rows = np.flatnonzero(moved)
+            self._rebin(rows, e1[rows], k1[rows])
+        fresh = ok & ~has
+        self.exp[fresh], self.k0[fresh] = e1[fresh], k1[fresh]
+
+    # ----- updates -----
+    def _add_moments(self, n, mean, m2, lo, hi):
+        tot = self.n + n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(tot > 0, self.mean + delta * np.where(tot > 0, n / tot, 0), self.mean)
+            self.m2 = self.m2 + m2 + np.where(tot > 0, delta ** 2 * self.n * n / np.where(tot > 0, tot, 1), 0)
+        self.n = tot
+        self.min = np.minimum(self.min, lo)
+        self.max = np.maximum(self.max, hi)
+
+    def update(self, x):
+        """Fold samples of shape (N,) + shape into the sketch."""
+        x = np.asarray(x, dtype=float).reshape(-1, self.counts.shape[0])
+        fin = np.isfinite(x)
+        self.n_nonfinite += (~fin).sum(axis=0)
+        n = fin.sum(axis=0).astype(float)
+        if not n.any():
+            return self
+        xs = np.where(fin, x, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = xs.sum(axis=0) / np.where(n > 0, n, 1)
+            m2 = (np.where(fin, x - mean, 0.0) ** 2).sum(axis=0)
+        lo = np.where(fin, x, np.inf).min(axis=0)
+        hi = np.where(fin, x, -np.inf).max(axis=0)
+
+        self._regrid(np.minimum(self.min, lo), np.maximum(self.max, hi))
+        self._add_moments(n, mean, m2, lo, hi)
+
+        w = np.ldexp(1.0, self.exp)
+        C, B = self.counts.shape
+        idx = np.clip(np.floor(xs / w).astype(np.int64) - self.k0, 0, B - 1) + np.arange(C) * B
+        self.counts += np.bincount(idx[fin], minlength=C * B).reshape(C, B)
+        return self
+
+    def merge(self, other):
+        """Add another sketch of the same shape (exact: grids are aligned)."""
+        if other.shape != self.shape or other.bins != self.bins:
+            raise ValueError(f"cannot merge sketches of shape {other.shape}/{other.bins} into {self.shape}/{self.bins}")
+        other = other.copy()
+        lo, hi = np.minimum(self.min, other.min), np.maximum(self.max, other.max)
+        self._regrid(lo, hi)
+        other._regrid(lo, hi)
+        self.counts += other.counts
+        self.n_nonfinite += other.n_nonfinite
+        self._add_moments(other.n, other.mean, other.m2, other.min, other.max)
+        return self
+
+    def copy(self):
+        new = QuantileSketch.__new__(QuantileSketch)
+        new.__dict__ = {k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in self.__dict__.items()}
+        return new
+
+    # ----- queries -----
+    def quantile(self, q):
+        """Quantiles (array-like q in [0,1]) -> shape q.shape + self.shape; error <= one bin width."""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        C, B = self.counts.shape
+        cum = np.cumsum(self.counts, axis=1)
+        w = np.ldexp(1.0, self.exp)
+        out = np.empty((len(q), C))
+        for i, qi in enumerate(q):
+            t = qi * self.n
+            b = np.minimum((cum < t[:, None]).sum(axis=1), B - 1)
+            rows = np.arange(C)
+            before = np.where(b > 0, cum[rows, np.maximum(b - 1, 0)], 0.0)
+            cnt = self.counts[rows, b]
+            frac = np.where(cnt > 0, (t - before) / np.where(cnt > 0, cnt, 1), 0.5)
+            out[i] = np.clip((self.k0 + b + frac) * w, self.min, self.max)
+        out[:, self.n == 0] = np.nan
+        return out.reshape(q.shape + self.shape)
+
+    @property
+    def std(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / (self.n - 1)).reshape(self.shape)
+
+    def cdf(self, x):
+        """P(X <= x) per channel (x scalar or broadcastable to shape)."""
+        x = np.broadcast_to(np.asarray(x, dtype=float), self.shape).reshape(-1)
+        w = np.ldexp(1.0, self.exp)
+        pos = (x / w - self.k0)
+        full = np.clip(np.floor(pos).astype(np.int64), 0, self.bins)
+        cum = np.concatenate([np.zeros((len(pos), 1)), np.cumsum(self.counts, axis=1)], axis=1)
+        rows = np.arange(len(pos))
+        part = np.where(full < self.bins, self.counts[rows, np.minimum(full, self.bins - 1)] * np.clip(pos - full, 0, 1), 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return ((cum[rows, full] + part) / self.n).reshape(self.shape)
+
+# -----------------------
+# Probes (picklable: module-level functions bound with functools.partial)
+# -----------------------
+def _delivered_cost(env, kms):
+    # env arrays are (N,) or (N, G) with a grid; km goes on a trailing axis -> (N, [G,] K)
+    kms = np.asarray(kms, dtype=float)
+    dry = (1 - env["MC_asrec"])[..., None]
+    out = {}
+    for m in MODES:
+        fixed = env["C_chip_eurt"] + env["C_handle_eurt"] + env[f"C_surcharge_{m}"]
+        out[f"cost_asrec_{m}"] = dry * (fixed[..., None] + (env["Backhaul"] * env[f"C_tkm_{m}"])[..., None] * kms)
+    return out
+
+def delivered_cost_probe(kms):
+    """Delivered cost (€/t as-received) per mode at each distance in kms -> 'cost_asrec_<mode>' ([grid,] km)."""
+    return partial(_delivered_cost, kms=np.asarray(kms, dtype=float))
+
+# -----------------------
+# Simulation
+# -----------------------
+def _run_chunks(spec, jobs):
+    """Worker body: evaluate the chunks in `jobs` ((size, SeedSequence) pairs) into sketches."""
+    outputs = list(spec["outputs"])
+    evaluate = PLANTFLIP.evaluator(list(dict.fromkeys(outputs + list(_PROBE_NEEDS))))
+    grid = spec["grid"]
+    sketches = {}
+    for size, ss in jobs:
+        draws = sample(spec["dists"], size, np.random.default_rng(ss), spec["corr"])
+        inputs = {**spec["base"], **draws}
+        if grid is not None:
+            gname, gvals = grid
+            inputs = {k: (v[:, None] if k in draws else v) for k, v in inputs.items()}
+            inputs[gname] = np.asarray(gvals, dtype=float)[None, :]
+        kpis = evaluate(inputs)
+        shape = np.shape(kpis[outputs[0]])
+        env = {k: np.broadcast_to(np.asarray(v, dtype=float), shape) for k, v in {**DEFAULTS, **inputs}.items()}
+        env.update(kpis)
+        results = {o: kpis[o] for o in outputs}
+        if spec["probe"] is not None:
+            extra = spec["probe"](env)
+            for name, v in extra.items():
+                if np.shape(v)[:len(shape)] != shape:
+                    raise ValueError(f"probe output {name!r} has shape {np.shape(v)}, "
+                                     f"expected leading axes {shape} (samples{', grid' if grid else ''})")
+            results.update(extra)
+        for name, v in results.items():
+            v = np.broadcast_to(v, (size,) + np.shape(v)[1:]) if np.ndim(v) else np.full(size, float(v))
+            if name not in sketches:
+                sketches[name] = QuantileSketch(v.shape[1:], spec["bins"])
+            sketches[name].update(v)
+    return sketches
+
+def simulate(n, dists=UNCERTAIN, corr=CORRELATIONS, base=None, outputs=MC_KPIS, grid=None, probe=None,
+             chunk=CHUNK, seed=0, workers=1, bins=BINS):
+    """
+    Monte Carlo over `dists` (name -> (kind, *params)) with Gaussian-copula `corr`.
+    base: fixed inputs overriding DEFAULTS (scalars); grid: (input name, values);
+    probe: f(env) -> {name: (N, ...) array} for derived outputs (picklable if workers > 1).
+    Returns dict(sketches={name: QuantileSketch}, n, seed, chunks, workers).
+    """
+    if grid is not None:
+        dists = {k: v for k, v in dists.items() if k != grid[0]}
+    base = {k: float(v) for k, v in (base or {}).items() if k not in dists}
+    width = max(1, len(grid[1]) if grid is not None else 1)
+    if probe is not None and isinstance(probe, partial) and "kms" in probe.keywords:
+        width *= len(MODES) * max(1, len(probe.keywords["kms"]))     # (N, [G,] K) per mode
+    chunk = max(1_000, min(int(chunk), CHUNK_CELLS // width))
+    sizes = [min(chunk, n - a) for a in range(0, n, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = list(zip(sizes, seeds))
+    spec = dict(dists=dict(dists), corr=dict(corr or {}), base=base, outputs=tuple(outputs),
+                grid=grid, probe=probe, bins=bins)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if workers == 1:
+        parts = [_run_chunks(spec, jobs)]
+    else:
+        blocks = [jobs[w::workers] for w in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(_run_chunks, [spec] * workers, blocks))
+
+    sketches = parts[0]
+    for part in parts[1:]:
+        for name, sk in part.items():
+            sketches[name].merge(sk)
+    return dict(sketches=sketches, n=n, seed=seed, chunks=len(jobs), workers=workers)
+
+# -----------------------
+# Tables
+# -----------------------
+def summary_frame(sketches, q=(0.1, 0.5, 0.9)):
+    """One row per scalar KPI: mean, std, min, quantiles, max."""
+    rows = []
+    for name, sk in sketches.items():
+        if sk.shape:
+            continue
+        qs = sk.quantile(q)
+        rows.append(dict(kpi=name, mean=float(sk.mean[0]), std=float(sk.std),
+                         min=float(sk.min[0]), **{f"P{round(100 * p)}": float(v) for p, v in zip(q, qs)},
+                         max=float(sk.max[0])))
+    return pd.DataFrame(rows)
+
+def band_frame(sketch, index, index_name="x", q=(0.1, 0.5, 0.9)):
+    """Quantile bands of a 1-D sketch over `index` (grid values / km): columns index_name, P10, P50, P90."""
+    qs = sketch.quantile(q)
+    df = pd.DataFrame({index_name: np.asarray(index, dtype=float)})
+    for p, v in zip(q, qs):
+        df[f"P{round(100 * p)}"] = v
+    return df
@@ -0,0 +1,370 @@
+# parity_check.py
+# Golden-file parity harness: Python engines vs the committed GAMS outputs
+# - One case per GAMS run; each case pins the parameters of that run explicitly (the
+#   app defaults differ: P_char 550 vs 600, MC_asrec 0.25 vs 0.35), evaluates the
+#   Python path and compares every reference file record by record
+#     plantflip3     Plantflip3.gms  -> plantflip_pipeline + compute_kpis_batch (apps)
+#     plant1_modeA   Plant1.gms      -> PLANTFLIP graph, breakeven_inverse, supply
+#                                       from the Upstream LP (miro_out.gdx FlowIJ)
+#     plant2_modeC   Plant2.gms      -> PLANTFLIP graph at the delivered Mode C price
+#     upstream_mc025 Upstream_4.gms (MC 0.25) -> upstream_lp vs the gdxdump CSVs
+#     upstream_mc035 Upstream_4.gms (MC 0.35) -> upstream_lp vs excel_out/miro_out.gdx
+#     graph_pyrolysis2 GAMS_Graph_Pyrolysis2.gms -> profit_surface (CSVs + results.gdx)
+# - Tolerances: `put` CSVs to half a unit of the last decimal written in the file
+#   (:0:2 -> 0.005); GDX / gdxdump values atol 1e-6 + rtol 1e-7. Records missing on
+#   one side count as 0 (GAMS does not store zeros)
+# - Timing: Python path best of --repeat; GAMS path measured with --run-gams when
+#   gams is on PATH, else the recorded time from the .log ("Job ... elapsed") or .lst
+#
+#   python parity_check.py
+#   python parity_check.py --case upstream_mc025 plant1_modeA --repeat 20 --out parity_report.csv
+
+import argparse
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from breakeven_inverse import breakeven
+from gdx_dump_parser import parse_gdx_dump
+from gdx_reader import read_gdx
+from plantflip_kernel import DEFAULTS, MODES, PLANTFLIP, compute_kpis_batch
+from plantflip_pipeline import run_pipeline
+from profit_surface import curves, surface, write_gams_csvs
+from upstream_lp import analytics_frames, farm_supply, lane_cost_params, solve_upstream
+
+ROOT = Path(__file__).resolve().parent
+PUT_ATOL = 1e-9          # float slack on top of half a unit in the last written decimal
+GDX_ATOL, GDX_RTOL = 1e-6, 1e-7
+
+# -----------------------
+# Comparisons
+# -----------------------
+def _read_put_csv(path):
+    """CSV written with GAMS put -> (DataFrame, {numeric column: decimals written})."""
+    raw = pd.read_csv(path, dtype=str)
+    df, dec = raw.copy(), {}
+    for c in raw.columns:
+        num = pd.to_numeric(raw[c], errors="coerce")
+        if num.notna().all():
+            df[c] = num
+            dec[c] = int(raw[c].str.partition(".")[2].str.len().max())
+    return df, dec
+
+def _result(case, check, reference, records, err, tol, ok, note=""):
+    return dict(case=case, check=check, reference=reference, records=int(records),
+                max_err=float(err), tol=float(tol), ok=bool(ok), note=note)
+
+def compare_put(case, check, ref_path, py):
+    """Row-by-row parity of a DataFrame (or CSV path) with a put CSV, same column order."""
+    ref, dec = _read_put_csv(ref_path)
+    if not isinstance(py, pd.DataFrame):
+        py = pd.read_csv(py)
+    name = Path(ref_path).name
+    if list(py.columns) != list(ref.columns):
+        return _result(case, check, name, len(ref), np.nan, np.nan, False,
+                       f"columns differ: {list(py.columns)}")
+    if len(py) != len(ref):
+        return _result(case, check, name, len(ref), np.nan, np.nan, False, f"{len(py)} rows vs {len(ref)}")
+    worst_err = worst_tol = 0.0
+    bad = []
+    for c in ref.columns:
+        if c not in dec:
+            if not (py[c].astype(str).to_numpy() == ref[c].to_numpy()).all():
+                bad.append(c)
+            continue
+        r = ref[c].to_numpy(dtype=float)
+        err = np.abs(py[c].to_numpy(dtype=float) - r)
+        tol = 0.5 * 10.0 ** -dec[c] + PUT_ATOL * np.maximum(1.0, np.abs(r))
+        if (err > tol).any():
+            bad.append(c)
+        k = int(np.argmax(err / tol))
+        if err[k] / tol[k] >= worst_err / max(worst_tol, 1e-300):
+            worst_err, worst_tol = err[k], tol[k]
+    return _result(case, check, name, len(ref), worst_err, worst_tol, not bad,
+                   f"mismatch in {bad}" if bad else "")
+
+def compare_records(case, check, reference, ref, py, atol=GDX_ATOL, rtol=GDX_RTOL):
+    """Keyed parity of GAMS records (index columns + value); missing records count as 0."""
+    keys = [c for c in ref.columns if c != "value"]
+    ref = ref.assign(**{k: ref[k].astype(str) for k in keys})
+    py = py.assign(**{k: py[k].astype(str) for k in keys})
+    if keys:
+        both = ref.merge(py, on=keys, how="outer", suffixes=("_gams", "_py")).fillna({"value_gams": 0.0,
+                                                                                       "value_py": 0.0})
+    else:
+        both = pd.DataFrame(dict(value_gams=ref["value"].to_numpy(), value_py=py["value"].to_numpy()))
+    r = both["value_gams"].to_numpy(dtype=float)
+    err = np.abs(both["value_py"].to_numpy(dtype=float) - r)
+    tol = atol + rtol * np.abs(r)
+    k = int(np.argmax(err / tol)) if len(err) else 0
+    ok = bool((err <= tol).all())
+    return _result(case, check, reference, len(ref), err[k] if len(err) else 0.0,
+                   tol[k] if len(tol) else atol, ok, "" if ok else f"{int((err > tol).sum())} record(s) off")
+
+# -----------------------
+# Cases
+# -----------------------
+# Upstream_4.gms data (alpha fixed to 0.187 / 0.119 / 0.062, P_chip 25 / 20, DemandUB inf)
+UPSTREAM_4 = dict(
+    farms=("i1", "i2", "i3"), plants=("j1", "j2"),
+    dist=np.array([[20.0, 60.0], [45.0, 30.0], [80.0, 25.0]]),
+    alpha=np.array([0.187, 0.119, 0.062]),
+    P_chip=np.array([25.0, 20.0]),
+)
+PLANT1 = dict(P_char=600.0, P_chip_DM_deliv=25.0, MC_asrec=0.35)
+PLANT2_HAUL = dict(P_chipDM_roadside=65.0, d_feed_km=40.0, r_truck_eur_per_km=2.0, payload_chip_tFM=24.0,
+                   MC_chip=0.30)
+PLANT2 = dict(P_char=500.0)
+
+KPI_COLS = ("Rev", "Cfs", "Clab", "Com", "Cbuy", "GM", "GM_per_tDM", "GM_per_year")
+PIPELINE_DIR = Path(tempfile.gettempdir()) / "parity_plantflip3"
+
+def _solve_upstream_4(MC):
+    u = UPSTREAM_4
+    res = solve_upstream(u["dist"], farm_supply(u["alpha"], MC=MC), u["P_chip"], **lane_cost_params())
+    frames = analytics_frames(res, u["farms"], u["plants"])
+    frames["UR_j"] = pd.DataFrame(dict(j=u["plants"], value=res["UR_j"]))
+    frames["GM_total"] = pd.DataFrame(dict(value=[res["GM_total"]]))
+    lanes = res["lanes"]
+    frames["Flow"] = pd.DataFrame(dict(
+        i=np.asarray(u["farms"])[lanes["i"]], j=np.asarray(u["plants"])[lanes["j"]],
+        m=np.asarray(MODES)[lanes["m"]], value=res["x"],
+    ))
+    frames["FlowIJ"] = frames["Flow"].groupby(["i", "j"], as_index=False)["value"].sum()
+    return res, frames
+
+_PLANT = PLANTFLIP.evaluator(["Rev_h", "GM_h"])
+
+def _plant_kpis(values):
+    """Plant1/Plant2 KPI block (€/h) at P_chip_DM_deliv from the PLANTFLIP graph, BE by inversion."""
+    v = {**DEFAULTS, **values}
+    k = _PLANT(values)
+    GM = float(k["GM_h"])
+    return dict(
+        Rev=float(k["Rev_h"]), Cfs=v["Qin_DM_h"] * v["P_chip_DM_deliv"], Clab=v["n_ops"] * v["w_hour"],
+        Com=v["OM_hour"], Cbuy=v["P_buy"] * v["E_buy_kWh"], GM=GM,
+        GM_per_tDM=GM / v["Qin_DM_h"], GM_per_year=GM * v["Hop_year"],
+        Pchar_BE=float(breakeven("P_char", "margin", values, value=0.0)),
+        Pchip_BE=float(breakeven("P_chip_DM_deliv", "margin", values, value=0.0)),
+    )
+
+# plantflip3: all six Plantflip3 CSVs through the pipeline, plus the app KPI path
+def _plantflip3_run():
+    return dict(files=run_pipeline(out_dir=PIPELINE_DIR), kpis=compute_kpis_batch())
+
+def _plantflip3_checks(out):
+    res = [compare_put("plantflip3", f"pipeline {p.stem}", ROOT / p.name, p) for p in out["files"]]
+    k = out["kpis"]
+    app = pd.DataFrame([dict(
+        plant="j1",
+        P_chip_payable_EUR_per_tDM=k["P_chip_payable_DM"], P_chip_payable_EUR_per_t_asrec=k["P_chip_payable_asrec"],
+        BE_radius_tractor_km=k["BE_radius_tractor"], BE_radius_truck_km=k["BE_radius_truck"],
+        PayableBudget_yr_EUR=k["PayableBudget_yr"], CharOutput_yr_t=k["CharOutput_yr"],
+        Qin_asrec_yr_t=k["Qin_asrec_yr"],
+    )])
+    res.append(compare_put("plantflip3", "compute_kpis_batch (apps)", ROOT / "plant_first_payable_radius_j1.csv", app))
+    return res
+
+# plant1_modeA: Plant1.gms; its supply reads FlowIJ from miro_out.gdx (the MC 0.35 upstream run)
+def _plant1_run():
+    lp, _ = _solve_upstream_4(MC=0.35)
+    return dict(kpis=_plant_kpis(PLANT1), supply_asrec=float(lp["x"][lp["lanes"]["j"] == 0].sum()))
+
+def _plant1_checks(out):
+    p, k, sup = {**DEFAULTS, **PLANT1}, out["kpis"], out["supply_asrec"]
+    kpi = pd.DataFrame([dict(
+        plant="j1", P_char=p["P_char"], E_net_kW=p["E_elec_kW"], H_use_kW=p["E_heat_kW"],
+        P_chipDM_deliv=p["P_chip_DM_deliv"], **{c: k[c] for c in KPI_COLS},
+    )])
+    be = pd.DataFrame([dict(Pchar_BE_EURt=k["Pchar_BE"], Pchip_BE_EURtDM=k["Pchip_BE"])])
+    cap_DM_h = p["Qin_DM_h"]
+    cap_asrec_yr = cap_DM_h * p["Hop_year"] / (1 - p["MC_asrec"])
+    sup_DM_h = sup * (1 - p["MC_asrec"]) / p["Hop_year"]
+    svc = pd.DataFrame([dict(
+        Cap_DM_h=cap_DM_h, Cap_DM_yr=cap_DM_h * p["Hop_year"], Cap_asrec_yr=cap_asrec_yr,
+        Sup_asrec_yr=sup, Sup_DM_yr=sup * (1 - p["MC_asrec"]), Sup_DM_h=sup_DM_h,
+        Diff_DM_h=cap_DM_h - sup_DM_h, Diff_asrec_yr=cap_asrec_yr - sup,
+        Util_DM=min(1.0, sup_DM_h / cap_DM_h) if cap_DM_h > 0 else 0.0,
+    )])
+    return [
+        compare_put("plant1_modeA", "KPIs", ROOT / "plant_modeA_kpi_j1.csv", kpi),
+        compare_put("plant1_modeA", "KPIs (PlantA)", ROOT / "plant_modeA_kpi.csv", kpi.assign(plant="PlantA")),
+        compare_put("plant1_modeA", "break-even", ROOT / "plant_modeA_breakeven_j1.csv", be),
+        compare_put("plant1_modeA", "break-even (PlantA)", ROOT / "plant_modeA_breakeven.csv", be),
+        compare_put("plant1_modeA", "supply vs capacity", ROOT / "supply_vs_capacity_j1.csv", svc),
+    ]
+
+# plant2_modeC: Plant2.gms, roadside price + haul 2 * d * €/km / payload (t FM) / (1 - MC_chip)
+def _plant2_run():
+    h = PLANT2_HAUL
+    c_haul_DM = 2 * h["d_feed_km"] * h["r_truck_eur_per_km"] / h["payload_chip_tFM"] / (1 - h["MC_chip"])
+    deliv = h["P_chipDM_roadside"] + c_haul_DM
+    return dict(c_haul_DM=c_haul_DM, deliv=deliv, kpis=_plant_kpis({**PLANT2, "P_chip_DM_deliv": deliv}))
+
+def _plant2_checks(out):
+    h, k = PLANT2_HAUL, out["kpis"]
+    kpi = pd.DataFrame([dict(
+        plant="PlantA", mode="ModeC", P_char=PLANT2["P_char"], P_chipDM_roadside=h["P_chipDM_roadside"],
+        P_chipDM_deliv=out["deliv"], d_km=h["d_feed_km"], **{c: k[c] for c in KPI_COLS},
+        Pchar_BE=k["Pchar_BE"], Pchip_roadside_BE=k["Pchip_BE"] - out["c_haul_DM"],
+    )])
+    return [compare_put("plant2_modeC", "KPIs", ROOT / "plant_modeC_kpi.csv", kpi)]
+
+# upstream_mc025: the gdxdump CSVs were written by a run of Upstream_4 with MC = 0.25
+DUMP_SYMBOLS = ("UC_lane", "UM_lane", "BE_radius", "Rev_lane", "Cost_lane", "GM_lane")
+
+def _upstream_mc025_checks(frames):
+    return [compare_records("upstream_mc025", s, f"{s}.csv", parse_gdx_dump(ROOT / f"{s}.csv"), frames[s])
+            for s in DUMP_SYMBOLS]
+
+# upstream_mc035: excel_out.gdx / miro_out.gdx were written by the MC = 0.35 run
+EXCEL_SYMBOLS = ("UC_lane", "UR_j", "UM_lane", "BE_price", "BE_radius", "Rev_lane", "Cost_lane", "GM_lane",
+                 "GM_farm", "GM_site", "GM_mode", "GM_total")
+MIRO_SYMBOLS = dict(Flow="Flow", FlowIJ="FlowIJ", SiteGM="GM_site", TotalGM="GM_total", UClane="UC_lane",
+                    UMlane="UM_lane", BErad="BE_radius", Pprice="UR_j")
+
+def _upstream_mc035_checks(frames):
+    excel = read_gdx(ROOT / "excel_out.gdx", *EXCEL_SYMBOLS)
+    miro = read_gdx(ROOT / "miro_out.gdx", *MIRO_SYMBOLS)
+    return [compare_records("upstream_mc035", s, "excel_out.gdx", excel[s], frames[s]) for s in EXCEL_SYMBOLS] + \
+        [compare_records("upstream_mc035", s, "miro_out.gdx", miro[s], frames[f]) for s, f in MIRO_SYMBOLS.items()]
+
+# graph_pyrolysis2: profit surface and 1-D curves at the GAMS defaults and grid
+SURFACE_DIR = Path(tempfile.gettempdir()) / "parity_surface"
+
+def _graph_pyrolysis2_run():
+    surf = surface()
+    return dict(surf=surf, files=write_gams_csvs(surf, SURFACE_DIR))
+
+def _graph_pyrolysis2_checks(out):
+    s = out["surf"]
+    res = [compare_put("graph_pyrolysis2", p.stem, ROOT / p.name, p) for p in out["files"]]
+    ref = read_gdx(ROOT / "results.gdx", "PROFITMAP", "CurveDist", "CurvePrice")
+    p_lab = np.array([f"p{v:g}" for v in s["price"]])
+    d_lab = np.array([f"d{v:g}" for v in s["dist"]])
+    P, D = s["profit"].shape
+    c = curves(s)
+    py = dict(
+        PROFITMAP=pd.DataFrame(dict(p=np.repeat(p_lab, D), d=np.tile(d_lab, P), value=s["profit"].reshape(-1))),
+        CurveDist=pd.DataFrame(dict(d=np.repeat(d_lab, 2), metric=np.tile(["x", "y"], D),
+                                    value=np.column_stack([s["dist"], c["distance"]["profit_eur"]]).reshape(-1))),
+        CurvePrice=pd.DataFrame(dict(p=np.repeat(p_lab, 2), metric=np.tile(["x", "y"], P),
+                                     value=np.column_stack([s["price"], c["price"]["profit_eur"]]).reshape(-1))),
+    )
+    return res + [compare_records("graph_pyrolysis2", k, "results.gdx", ref[k], py[k]) for k in py]
+
+# case -> GAMS model of the reference run, Python path (timed), checks on its output
+CASES = dict(
+    plantflip3=dict(gms="Plantflip3.gms", run=_plantflip3_run, checks=_plantflip3_checks),
+    plant1_modeA=dict(gms="Plant1.gms", run=_plant1_run, checks=_plant1_checks),
+    plant2_modeC=dict(gms="Plant2.gms", run=_plant2_run, checks=_plant2_checks),
+    upstream_mc025=dict(gms="Upstream_4.gms", run=lambda: _solve_upstream_4(MC=0.25)[1],
+                        checks=_upstream_mc025_checks),
+    upstream_mc035=dict(gms="Upstream_4.gms", run=lambda: _solve_upstream_4(MC=0.35)[1],
+                        checks=_upstream_mc035_checks),
+    graph_pyrolysis2=dict(gms="GAMS_Graph_Pyrolysis2.gms", run=_graph_pyrolysis2_run,
+                          checks=_graph_pyrolysis2_checks),
+)
+
+# -----------------------
+# Timing
+# -----------------------
+_LOG_ELAPSED = re.compile(r"--- Job \S+ Stop .* elapsed (\d+):(\d+):([\d.]+)")
+_LST_TIME = re.compile(r"^(COMPILATION|GENERATION|EXECUTION) TIME\s+=\s+([\d.]+) SECONDS", re.M)
+
+def recorded_gams_time(gms):
+    """Seconds of the recorded GAMS run (.log job elapsed, else .lst phase times) and the source."""
+    stem = ROOT / Path(gms).stem
+    log = stem.with_suffix(".log")
+    if log.exists():
+        m = _LOG_ELAPSED.search(log.read_text(encoding="utf-8", errors="ignore"))
+        if m:
+            h, mi, s = m.groups()
+            return int(h) * 3600 + int(mi) * 60 + float(s), log.name
+    lst = stem.with_suffix(".lst")
+    if lst.exists():
+        text = lst.read_text(encoding="utf-8", errors="ignore")
+        if "USER ERROR" not in text:
+            times = [float(t) for _, t in _LST_TIME.findall(text)]
+            if times:
+                return sum(times), lst.name
+    return np.nan, "n/a"
+
+def run_gams(gms):
+    """Wall time of a fresh GAMS run in a scratch copy of the model folder (needs gams on PATH)."""
+    work = Path(tempfile.mkdtemp(prefix="parity_gams_"))
+    try:
+        for f in ROOT.iterdir():
+            if f.suffix.lower() in (".gms", ".gdx", ".inc"):
+                shutil.copy2(f, work / f.name)
+        t0 = time.perf_counter()
+        subprocess.run(["gams", gms, "lo=0"], cwd=work, check=True, capture_output=True)
+        return time.perf_counter() - t0, "run"
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+def python_time(run, repeat=5):
+    """Best-of-`repeat` wall time of a case's Python path; returns (seconds, last output)."""
+    best, out = np.inf, None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = run()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+# -----------------------
+# Harness
+# -----------------------
+def parity_report(cases=None, repeat=5, gams=False):
+    """
+    Run the selected cases (default all). Returns dict(checks=DataFrame, timing=DataFrame, ok=bool).
+    gams=True measures the GAMS path by running it (only when gams is on PATH).
+    """
+    names = list(cases or CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        raise KeyError(f"unknown case(s) {unknown}; available: {list(CASES)}")
+    can_run = gams and shutil.which("gams") is not None
+    checks, timing = [], []
+    for name in names:
+        c = CASES[name]
+        t_py, out = python_time(c["run"], repeat)
+        checks += c["checks"](out)
+        t_gams, src = run_gams(c["gms"]) if can_run else recorded_gams_time(c["gms"])
+        timing.append(dict(case=name, gms=c["gms"], python_s=t_py, gams_s=t_gams, gams_source=src,
+                           speedup=t_gams / t_py if t_py > 0 else np.nan))
+    checks = pd.DataFrame(checks)
+    return dict(checks=checks, timing=pd.DataFrame(timing), ok=bool(checks["ok"].all()))
+
+# -----------------------
+# CLI
+# -----------------------
+def main():
+    ap = argparse.ArgumentParser(description="Parity of the Python engines with the committed GAMS outputs")
+    ap.add_argument("--case", nargs="+", choices=list(CASES), help="cases to run (default: all)")
+    ap.add_argument("--repeat", type=int, default=5, help="Python timing: best of N runs")
+    ap.add_argument("--run-gams", action="store_true", help="time a fresh GAMS run instead of the recorded one")
+    ap.add_argument("--out", help="write the check table to this CSV")
+    args = ap.parse_args()
+
+    rep = parity_report(args.case, args.repeat, args.run_gams)
+    with pd.option_context("display.width", 160, "display.max_colwidth", 40):
+        print(rep["checks"].to_string(index=False))
+        print()
+        print(rep["timing"].to_string(index=False, float_format=lambda x: f"{x:.4g}"))
+    n_bad = int((~rep["checks"]["ok"]).sum())
+    print(f"\n{len(rep['checks']) - n_bad}/{len(rep['checks'])} checks within tolerance")
+    if args.out:
+        rep["checks"].to_csv(args.out, index=False)
+        print(f"wrote {args.out}")
+    sys.exit(1 if n_bad else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# plant_siting.py
+# Facility location for new ClinX-150-type plants on top of the upstream cost model
+# - Candidate sites k with plant economics from plantflip_kernel (payable €/t DM,
+#   intake capacity Qin_DM_h * Hop_year) and a fixed cost per opened plant (€/yr)
+# - Lane margin (€/t DM): payable_DM(k) - (C_chip + C_hand) - C_surcharge(m)
+#   - Backhaul * dist(i,k) * C_tkm(m); only the best mode per (farm, site) is kept
+#   (always optimal) and only pairs with a positive margin
+# - maximize  sum margin * x - sum F_k * y_k
+#   s.t. sum_k x(i,k) <= Supply_DM(i),  sum_i x(i,k) <= Cap_k * y_k
+# - Heuristic for thousands of candidates: greedy opening + open/drop/swap local search
+#   on a vectorized capacitated assignment, final allocation by exact LP (HiGHS)
+# - Exact MILP (scipy.optimize.milp) for small instances to validate the heuristic
+
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+
+from plantflip_kernel import MODES, as_param_arrays, chip_handle_costs, payable_DM, surcharges, tkm_costs
+
+# -----------------------
+# Problem
+# -----------------------
+def siting_problem(dist, supply_DM, fixed_cost, plant_params=None, **overrides):
+    """
+    dist         : I × K km (dense, scipy.sparse, or I × K × M per mode; inf/missing = no lane)
+    supply_DM    : Supply(i) in t DM/yr
+    fixed_cost   : €/yr per opened plant (scalar or (K,))
+    plant_params : plant-first parameters (plantflip_kernel names), scalars or one row per
+                   candidate (dict of (K,) arrays or a K-row DataFrame)
+    """
+    p = as_param_arrays(plant_params, **overrides)
+    supply = np.asarray(supply_DM, dtype=float)
+    I = len(supply)
+    K = dist.shape[1]
+    kk = lambda v: np.broadcast_to(np.asarray(v, dtype=float), (K,))
+
+    pay = kk(payable_DM(p))
+    C_chip, C_hand = chip_handle_costs(p)
+    gate = pay - kk(C_chip + C_hand)
+    tkm = {m: kk(v) for m, v in tkm_costs(p).items()}
+    surch = {m: kk(v) for m, v in surcharges(p).items()}
+    backhaul = kk(p["Backhaul"])
+    cap = kk(p["Qin_DM_h"] * p["Hop_year"])
+
+    if sp.issparse(dist):
+        coo = sp.coo_matrix(dist)
+        pi, pk = coo.row.astype(np.int64), coo.col.astype(np.int64)
+        d = np.repeat(coo.data[:, None], len(MODES), axis=1)
+    else:
+        D = np.asarray(dist, dtype=float)
+        pi, pk = (a.ravel().astype(np.int64) for a in np.meshgrid(np.arange(I), np.arange(K), indexing="ij"))
+        d = D[pi, pk] if D.ndim == 3 else np.repeat(D[pi, pk][:, None], len(MODES), axis=1)
+
+    margins = np.column_stack([
+        gate[pk] - surch[m][pk] - backhaul[pk] * tkm[m][pk] * d[:, n] for n, m in enumerate(MODES)
+    ])
+    margins[~np.isfinite(margins)] = -np.inf
+    mode = margins.argmax(axis=1)
+    margin = margins[np.arange(len(pi)), mode]
+    keep = margin > 0
+    order = np.lexsort((-margin[keep], pi[keep]))          # per farm, best pair first
+    return dict(
+        i=pi[keep][order], k=pk[keep][order], m=mode[keep][order], margin=margin[keep][order],
+        dist=d[keep][order, mode[keep][order]],
+        supply=supply, cap=cap.copy(), fixed=kk(fixed_cost).copy(), payable_DM=pay.copy(), shape=(I, K),
+    )
+
+# -----------------------
+# Allocation for a given set of open sites
+# -----------------------
+def estimate_allocation(prob, open_mask):
+    """
+    Fast capacitated assignment (not always optimal): every farm proposes its remaining
+    supply to its best open site with spare capacity; sites accept the highest-margin
+    proposals up to capacity; rejected supply moves on to the next-best site.
+    Returns dict(x per pair, value = sum margin * x - fixed cost of open sites).
+    """
+    I, K = prob["shape"]
+    sel = np.flatnonzero(open_mask[prob["k"]])
+    fi, fk, mg = prob["i"][sel], prob["k"][sel], prob["margin"][sel]
+    start = np.searchsorted(fi, np.arange(I + 1))
+    ptr = start[:-1].copy()
+    end = start[1:]
+    rem = prob["supply"].copy()
+    cap = np.where(open_mask, prob["cap"], 0.0)
+    x = np.zeros(len(sel))
+
+    while True:
+        farms = np.flatnonzero((rem > 1e-9) & (ptr < end))
+        if not len(farms):
+            break
+        q = ptr[farms]
+        o = np.lexsort((-mg[q], fk[q]))                    # by site, best margin first
+        q, farms = q[o], farms[o]
+        site = fk[q]
+        amt = rem[farms]
+        cum = np.cumsum(amt)
+        first = np.searchsorted(site, site, side="left")
+        before = cum - amt - (cum[first] - amt[first])
+        acc = np.clip(cap[site] - before, 0.0, amt)
+        x[q] += acc
+        rem[farms] -= acc
+        np.subtract.at(cap, site, acc)
+        ptr[farms] += 1                                    # a site that cut a farm short is full
+    value = float(mg @ x - prob["fixed"][open_mask].sum())
+    out = np.zeros(len(prob["i"]))
+    out[sel] = x
+    return dict(x=out, value=value)
+
+def allocate(prob, open_mask):
+    """Exact optimal allocation for a fixed set of open sites (transportation LP, HiGHS)."""
+    I, K = prob["shape"]
+    sel = np.flatnonzero(open_mask[prob["k"]])
+    n = len(sel)
+    x = np.zeros(len(prob["i"]))
+    if n == 0:
+        return dict(x=x, value=-float(prob["fixed"][open_mask].sum()))
+    cols = np.arange(n)
+    A = sp.vstack([
+        sp.csr_matrix((np.ones(n), (prob["i"][sel], cols)), shape=(I, n)),
+        sp.csr_matrix((np.ones(n), (prob["k"][sel], cols)), shape=(K, n)),
+    ], format="csr")
+    b = np.concatenate([prob["supply"], np.where(open_mask, prob["cap"], 0.0)])
+    res = linprog(-prob["margin"][sel], A_ub=A, b_ub=b, bounds=(0, None), method="highs")
+    if res.status != 0:
+        raise RuntimeError(f"Siting allocation LP not solved: {res.message}")
+    x[sel] = res.x
+    return dict(x=x, value=float(-res.fun - prob["fixed"][open_mask].sum()))
+
+# -----------------------
+# Heuristic: greedy + local search
+# -----------------------
+def _add_gains(prob, x, sites=None):
+    """
+    Estimated net gain of opening each site given the current allocation x:
+    farms fill the site's capacity in order of margin improvement per t over their
+    current average margin (unallocated supply counts as margin 0).
+    `sites` (bool mask) limits the estimate to those sites; others get -inf.
+    """
+    I, K = prob["shape"]
+    fi, fk = prob["i"], prob["k"]
+    cur = np.bincount(fi, prob["margin"] * x, I) / np.maximum(prob["supply"], 1e-12)
+    imp = prob["margin"] - cur[fi]
+    ok = imp > 0
+    if sites is not None:
+        ok &= sites[fk]
+    fi, fk, imp = fi[ok], fk[ok], imp[ok]
+    o = np.lexsort((-imp, fk))
+    fi, fk, imp = fi[o], fk[o], imp[o]
+    amt = prob["supply"][fi]
+    cum = np.cumsum(amt)
+    first = np.searchsorted(fk, fk, side="left")
+    before = cum - amt - (cum[first] - amt[first])
+    take = np.clip(prob["cap"][fk] - before, 0.0, amt)
+    gains = np.bincount(fk, imp * take, K) - prob["fixed"]
+    return gains if sites is None else np.where(sites, gains, -np.inf)
+
+def _site_index(prob):
+    """Pairs grouped by site: farms of site k are prob['i'][by_k[start[k]:start[k+1]]]."""
+    by_k = np.argsort(prob["k"], kind="stable")
+    return by_k, np.searchsorted(prob["k"][by_k], np.arange(prob["shape"][1] + 1))
+
+def greedy_siting(prob, n_eval=5):
+    """
+    Open sites by estimated gain. Each round opens a batch of candidates that share no
+    farms (their gains barely interact) and keeps it if the assignment value improves;
+    otherwise the best of the top `n_eval` single candidates is opened.
+    """
+    I, K = prob["shape"]
+    by_k, start = _site_index(prob)
+    open_mask = np.zeros(K, dtype=bool)
+    best = estimate_allocation(prob, open_mask)
+    while True:
+        gains = np.where(open_mask, -np.inf, _add_gains(prob, best["x"]))
+        cand = np.argsort(-gains)
+        cand = cand[gains[cand] > 0]
+        if not len(cand):
+            return open_mask, best
+
+        touched = np.zeros(I, dtype=bool)
+        batch = []
+        for k in cand:
+            farms = prob["i"][by_k[start[k]:start[k + 1]]]
+            if not touched[farms].any():
+                touched[farms] = True
+                batch.append(k)
+        if len(batch) > 1:
+            m = open_mask.copy()
+            m[batch] = True
+            r = estimate_allocation(prob, m)
+            if r["value"] > best["value"] + 1e-9:
+                open_mask, best = m, r
+                continue
+
+        trial = None
+        for k in cand[:n_eval]:
+            m = open_mask.copy()
+            m[k] = True
+            r = estimate_allocation(prob, m)
+            if r["value"] > best["value"] + 1e-9 and (trial is None or r["value"] > trial[1]["value"]):
+                trial = (m, r)
+        if trial is None:
+            return open_mask, best
+        open_mask, best = trial
+
+def local_search(prob, open_mask, n_swap=3, max_passes=5, time_limit=None):
+    """
+    Drop and swap moves on the assignment estimate, scanning open sites round-robin
+    (first improvement), then an open move (the closed sites with the best positive
+    estimated gain, top `n_swap` tried), until a full pass finds nothing or time runs
+    out. Swap partners for an open site are the closed sites that share farms with it,
+    ranked by estimated gain once it is closed. The open move re-adds sites after
+    greedy stopped early or a drop freed supply.
+    """
+    t0 = time.perf_counter()
+    I, K = prob["shape"]
+    by_k, start = _site_index(prob)
+    farm_start = np.searchsorted(prob["i"], np.arange(I + 1))
+    open_mask = open_mask.copy()
+    best = estimate_allocation(prob, open_mask)
+
+    for _ in range(max_passes):
+        improved = False
+        for k in np.flatnonzero(open_mask):
+            if time_limit is not None and time.perf_counter() - t0 > time_limit:
+                return open_mask, best
+            if not open_mask[k]:
+                continue
+            m = open_mask.copy()
+            m[k] = False
+            r_drop = estimate_allocation(prob, m)
+            if r_drop["value"] > best["value"] + 1e-9:
+                open_mask, best, improved = m, r_drop, True
+                continue
+
+            farms = prob["i"][by_k[start[k]:start[k + 1]]]
+            pairs = np.concatenate([np.arange(farm_start[f], farm_start[f + 1]) for f in farms]) \
+                if len(farms) else np.zeros(0, dtype=np.int64)
+            nb = np.zeros(K, dtype=bool)
+            nb[prob["k"][pairs]] = True
+            nb &= ~m
+            nb[k] = False
+            if not nb.any():
+                continue
+            gains = _add_gains(prob, r_drop["x"], nb)
+            for c in np.argsort(-gains)[:n_swap]:
+                if not np.isfinite(gains[c]):
+                    break
+                s = m.copy()
+                s[c] = True
+                r = estimate_allocation(prob, s)
+                if r["value"] > best["value"] + 1e-9:
+                    open_mask, best, improved = s, r, True
+                    break
+
+        if time_limit is not None and time.perf_counter() - t0 > time_limit:
+            return open_mask, best
+        # open: judged by the exact allocation LP, since the estimate under-rates a site
+        # that only pays off once supply is re-routed around it (a few LPs per pass)
+        gains = _add_gains(prob, best["x"], ~open_mask)
+        cur = None
+        for c in np.argsort(-gains)[:n_swap]:
+            if not gains[c] > 0:
+                break
+            cur = allocate(prob, open_mask)["value"] if cur is None else cur
+            m = open_mask.copy()
+            m[c] = True
+            if allocate(prob, m)["value"] > cur + 1e-9:
+                open_mask, best, improved = m, estimate_allocation(prob, m), True
+                break
+        if not improved:
+            break
+    return open_mask, best
+
+def solve_siting_heuristic(prob, n_eval=5, n_swap=3, max_passes=5, time_limit=None):
+    """Greedy + local search, then the exact LP allocation for the chosen sites."""
+    open_mask, _ = greedy_siting(prob, n_eval)
+    open_mask, _ = local_search(prob, open_mask, n_swap, max_passes, time_limit)
+    alloc = allocate(prob, open_mask)
+    return dict(open=open_mask, x=alloc["x"], value=alloc["value"], method="heuristic")
+
+# -----------------------
+# Exact MILP
+# -----------------------
+def solve_siting_milp(prob, strong=True, time_limit=None):
+    """
+    Exact facility-location MILP with scipy.optimize.milp (HiGHS branch-and-bound).
+    strong=True adds x(i,k) <= Supply(i) * y_k, which tightens the LP bound.
+    Meant for small instances (validation of the heuristic).
+    """
+    I, K = prob["shape"]
+    n = len(prob["i"])
+    cols = np.arange(n)
+    ycol = n + np.arange(K)
+    c = np.concatenate([-prob["margin"], prob["fixed"]])
+
+    A_sup = sp.csr_matrix((np.ones(n), (prob["i"], cols)), shape=(I, n + K))
+    A_cap = sp.csr_matrix((np.concatenate([np.ones(n), -prob["cap"]]),
+                           (np.concatenate([prob["k"], np.arange(K)]), np.concatenate([cols, ycol]))),
+                          shape=(K, n + K))
+    cons = [LinearConstraint(A_sup, -np.inf, prob["supply"]), LinearConstraint(A_cap, -np.inf, 0.0)]
+    if strong:
+        A_link = sp.csr_matrix((np.concatenate([np.ones(n), -prob["supply"][prob["i"]]]),
+                                (np.concatenate([cols, cols]), np.concatenate([cols, n + prob["k"]]))),
+                               shape=(n, n + K))
+        cons.append(LinearConstraint(A_link, -np.inf, 0.0))
+
+    integrality = np.concatenate([np.zeros(n), np.ones(K)])
+    bounds = Bounds(np.zeros(n + K), np.concatenate([np.full(n, np.inf), np.ones(K)]))
+    options = {} if time_limit is None else dict(time_limit=time_limit)
+    res = milp(c, constraints=cons, integrality=integrality, bounds=bounds, options=options)
+    if res.x is None:
+        raise RuntimeError(f"Siting MILP not solved: {res.message}")
+    return dict(open=res.x[n:] > 0.5, x=res.x[:n], value=float(-res.fun), method="milp",
+                mip_gap=getattr(res, "mip_gap", None), status=res.status)
+
+# -----------------------
+# Output
+# -----------------------
+def siting_frames(prob, result, farm_ids=None, site_ids=None):
+    """Tidy tables: opened sites (throughput, utilization, margin) and farm -> site flows."""
+    I, K = prob["shape"]
+    farm_ids = np.asarray([f"i{n + 1}" for n in range(I)] if farm_ids is None else farm_ids)
+    site_ids = np.asarray([f"k{n + 1}" for n in range(K)] if site_ids is None else site_ids)
+    x = result["x"]
+    thru = np.bincount(prob["k"], x, K)
+    gm = np.bincount(prob["k"], prob["margin"] * x, K)
+    sites = pd.DataFrame(dict(
+        site=site_ids, open=result["open"], throughput_tDM=thru,
+        utilization=thru / np.maximum(prob["cap"], 1e-12), lane_margin_eur=gm,
+        fixed_cost_eur=np.where(result["open"], prob["fixed"], 0.0),
+    ))
+    sites["net_eur"] = sites["lane_margin_eur"] - sites["fixed_cost_eur"]
+    f = x > 1e-9
+    flows = pd.DataFrame(dict(
+        i=farm_ids[prob["i"][f]], site=site_ids[prob["k"][f]], m=np.asarray(MODES)[prob["m"][f]],
+        dist_km=prob["dist"][f], flow_tDM=x[f], margin_eur_per_tDM=prob["margin"][f],
+    ))
+    return sites, flows
@@ -0,0 +1,95 @@
+# plantflip_heatmap.py
+# Broadcast-based sensitivity surfaces for the plant-first model
+# - Any two axes out of the plant-first parameters (P_char, MC_asrec, P_CO2,
+#   Qin_DM_h, ...) plus the haul distance "distance_km"
+# - Metrics: cost gap at a distance (€/t as-received) or BE radius (km, DM basis)
+# - One NumPy pass over the full grid: mode-independent terms are computed once
+#   and broadcast, so 1000×1000 grids take a few tens of milliseconds
+# - breakeven_lines: where delivery at the distance just breaks even (gap = 0, or
+#   BE radius = distance), as polylines from contours.marching_squares
+
+import numpy as np
+import pandas as pd
+
+from contours import marching_squares
+from plantflip_kernel import (
+    DEFAULTS, as_param_arrays, payable_DM, carbon_premium_DM,
+    chip_handle_costs, tkm_costs, surcharges, be_radius,
+)
+
+DISTANCE_AXIS = "distance_km"
+
+AXES = dict(
+    P_char="Biochar price (€/t)",
+    MC_asrec="Moisture content (fraction)",
+    P_CO2="Carbon price (€/t CO₂-eq)",
+    Qin_DM_h="Intake capacity (t DM/h)",
+    distance_km="Distance (km one-way)",
+)
+
+METRICS = ("gap", "be")
+
+def heatmap_grid(base, x, x_values, y, y_values, metric="gap", mode="truck",
+                 distance_km=0.0, with_carbon=False):
+    """
+    Evaluate `metric` on the y × x grid and return a 2D array of shape
+    (len(y_values), len(x_values)).
+
+    base        : dict of plant-first parameters (DEFAULTS names); missing keys use DEFAULTS
+    x, y        : axis names, any DEFAULTS key or "distance_km"
+    metric      : "gap" = payable_asrec − delivered_cost_asrec at distance_km (€/t as-received)
+                  "be"  = break-even radius (km one-way, DM basis)
+    with_carbon : add the carbon premium (Y_char·CO2eq_per_tchar·P_CO2) to the payable
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}, got {metric!r}")
+    if x == y:
+        raise ValueError("x and y must be different axes")
+    for name in (x, y):
+        if name != DISTANCE_AXIS and name not in DEFAULTS:
+            raise KeyError(f"Unknown heatmap axis: {name!r}")
+
+    params = {k: v for k, v in dict(base).items() if k != DISTANCE_AXIS}
+    grid = {
+        x: np.asarray(x_values, dtype=float)[None, :],
+        y: np.asarray(y_values, dtype=float)[:, None],
+    }
+    dist = grid.pop(DISTANCE_AXIS, distance_km)
+    params.update(grid)
+    p = as_param_arrays(params)
+
+    pay = payable_DM(p)
+    if with_carbon:
+        pay = pay + carbon_premium_DM(p)
+    C_chip, C_hand = chip_handle_costs(p)
+    fixed = C_chip + C_hand + surcharges(p)[mode]
+    tkm = tkm_costs(p)[mode]
+
+    if metric == "be":
+        Z = be_radius(pay, fixed, tkm, p["Backhaul"])
+    else:
+        Z = (pay - fixed - p["Backhaul"] * tkm * dist) * (1 - p["MC_asrec"])
+    return np.broadcast_to(Z, (len(y_values), len(x_values)))
+
+def heatmap_frame(x, x_values, y, y_values, Z, value_name="value"):
+    """Long-format DataFrame (x, y, value) for charting / CSV download."""
+    X, Y = np.meshgrid(np.asarray(x_values, dtype=float), np.asarray(y_values, dtype=float))
+    return pd.DataFrame({x: X.ravel(), y: Y.ravel(), value_name: np.asarray(Z).ravel()})
+
+def breakeven_lines(x, x_values, y, y_values, Z, metric="gap", distance_km=0.0):
+    """
+    Break-even isolines of a heatmap_grid result as a list of (k, 2) arrays of (x, y).
+    "gap": gap = 0.  "be": BE radius = distance (the distance axis, else distance_km),
+    the same line the gap metric gives for that distance. Cells where the BE radius is
+    floored at 0 (payable below the fixed costs) carry no line.
+    """
+    Z = np.asarray(Z, dtype=float)
+    if metric == "be":
+        Z = np.where(Z > 0, Z, np.nan)
+        if DISTANCE_AXIS == x:
+            Z = Z - np.asarray(x_values, dtype=float)[None, :]
+        elif DISTANCE_AXIS == y:
+            Z = Z - np.asarray(y_values, dtype=float)[:, None]
+        else:
+            Z = Z - distance_km
+    return marching_squares(x_values, y_values, Z.T)      # heatmap_grid is (y, x)
@@ -0,0 +1,389 @@
+# plantflip_kernel.py
+# Vectorized batch engine for the plant-first (flip) payable / break-even model
+# - Same formulas as Plantflip3.gms and compute_payable_and_costs()/compute_kpis()
+#   in the Streamlit apps, but evaluated for many parameter sets at once
+# - Inputs: dict of scalars/arrays (NumPy broadcasting) or a columnar DataFrame
+# - Outputs: payable (DM & as-received), C_chip, C_hand, C_tkm per mode,
+#   BE radii per mode (with and without carbon premium), annual KPIs
+# - Every quantity is declared once in the PLANTFLIP formula graph; the helpers
+#   below, the apps (incremental Session) and batch runs (evaluator) all use it
+
+import numpy as np
+import pandas as pd
+
+from formula_graph import FormulaGraph
+
+# -----------------------
+# Defaults (aligned with Plantflip3.gms)
+# -----------------------
+DEFAULTS = dict(
+    # Brochure + operations
+    Qin_DM_h=0.299,      # t DM/h
+    Y_char=0.25,         # t char / t DM
+    E_elec_kW=130.0,     # kW electricity
+    E_heat_kW=200.0,     # kWth heat
+    Hop_year=8000.0,     # h/year
+    P_char=550.0,        # €/t (biochar)
+    P_el=0.11,           # €/kWh
+    P_heat=0.06,         # €/kWh_th
+    n_ops=1.0,           # operators/shift
+    w_hour=28.0,         # €/h
+    OM_hour=30.0,        # €/h fixed O&M
+    P_buy=0.28,          # €/kWh imported electricity
+    E_buy_kWh=0.0,       # kWh/h imported electricity
+    MarginTarget=0.0,    # €/h target gross margin
+    MC_asrec=0.25,       # moisture content of chips (as-received)
+
+    # KTBL-style upstream cost blocks
+    Tractor_eur_h=41.84,
+    PTOChipper_eur_h=22.63,
+    Body_Tractor_eur_t=0.82,
+    SemiTrailer_eur_t=0.89,
+    Bucket_eur_t=0.39,
+    FrontLoader_eur_h=8.68,
+    Tractor_speed_kmh=40.0,
+    Chipper_m3_h=25.0,
+    BulkDensity_t_m3=0.30,
+    Handling_tph=20.0,
+    Truck_speed_kmh=70.0,
+    PayloadTruck_t=25.0,
+    chip_box_m3=22.0,         # m³ chip box on tractor
+    Backhaul=2.0,             # 1=one-way, 2=round trip
+
+    # Labor toggles (0/1, multiplied in like GAMS)
+    IncludeLabor=1.0,
+    IncludeChipOp=1.0,
+    IncludeLoader=1.0,
+    IncludeDriver=1.0,
+    AddLaborToTruckTkm=1.0,
+    WageBase_eur_h=12.82,
+    OncostFrac=0.22,
+    C_tkm_truck_mach=0.12,    # €/t-km for truck (machine)
+
+    # Carbon extension
+    P_CO2=80.0,               # €/t CO2-eq
+    CO2eq_per_tchar=2.87,     # t CO2-eq per t char (placeholder)
+)
+
+MODES = ("tractor", "truck")
+
+# 0/1 switches among the inputs (not meaningful as derivatives / sampled ranges)
+TOGGLES = ("IncludeLabor", "IncludeChipOp", "IncludeLoader", "IncludeDriver", "AddLaborToTruckTkm")
+
+EPS = 1e-9
+
+# -----------------------
+# Input handling
+# -----------------------
+def as_param_arrays(params=None, **overrides):
+    """
+    Merge `params` (dict or DataFrame) and keyword overrides onto DEFAULTS and
+    return a dict of float arrays. Arrays are not broadcast here; the formulas
+    broadcast them, so a (n,) P_char against a (m,1) MC_asrec gives (m,n) KPIs.
+    Unknown names raise KeyError (catches typos such as 'Truck_speed').
+    """
+    merged = dict(DEFAULTS)
+    given = {}
+    if params is not None:
+        if isinstance(params, pd.DataFrame):
+            given.update({c: params[c].to_numpy() for c in params.columns})
+        else:
+            given.update(params)
+    given.update(overrides)
+
+    unknown = sorted(set(given) - set(DEFAULTS))
+    if unknown:
+        raise KeyError(f"Unknown plant-first parameter(s): {unknown}")
+    merged.update(given)
+    return {k: np.asarray(v, dtype=float) for k, v in merged.items()}
+
+# -----------------------
+# Formula graph (single source of truth for the plant-first model)
+# -----------------------
+PLANTFLIP = FormulaGraph("plantflip")
+PLANTFLIP.inputs(DEFAULTS)
+f = PLANTFLIP.formula
+
+@f
+def Wage_eur_h(WageBase_eur_h, OncostFrac):
+    return WageBase_eur_h * (1 + OncostFrac)
+
+@f
+def Rev_h(P_char, Y_char, Qin_DM_h, P_el, E_elec_kW, P_heat, E_heat_kW):
+    """Hourly revenue: char + electricity + heat (€/h)."""
+    return P_char * Y_char * Qin_DM_h + P_el * E_elec_kW + P_heat * E_heat_kW
+
+@f
+def Cost_h(n_ops, w_hour, OM_hour, P_buy, E_buy_kWh):
+    """Hourly non-feedstock cost: labour + O&M + imported electricity (€/h)."""
+    return n_ops * w_hour + OM_hour + P_buy * E_buy_kWh
+
+@f
+def P_chip_payable_DM(Rev_h, Cost_h, MarginTarget, Qin_DM_h):
+    """Max payable chip price at plant gate (€/t DM), breakeven w.r.t. MarginTarget."""
+    return (Rev_h - Cost_h - MarginTarget) / np.maximum(EPS, Qin_DM_h)
+
+@f
+def P_chip_payable_asrec(P_chip_payable_DM, MC_asrec):
+    return P_chip_payable_DM * (1 - MC_asrec)
+
+@f
+def CarbonPremium_DM(Y_char, CO2eq_per_tchar, P_CO2):
+    """Carbon value per t DM of chips (€/t DM)."""
+    return Y_char * CO2eq_per_tchar * P_CO2
+
+@f
+def CarbonPremium_asrec(CarbonPremium_DM, MC_asrec):
+    return CarbonPremium_DM * (1 - MC_asrec)
+
+@f
+def P_chip_payable_DM_withC(P_chip_payable_DM, CarbonPremium_DM):
+    return P_chip_payable_DM + CarbonPremium_DM
+
+@f
+def P_chip_payable_asrec_withC(P_chip_payable_DM_withC, MC_asrec):
+    return P_chip_payable_DM_withC * (1 - MC_asrec)
+
+@f
+def chip_tph(Chipper_m3_h, BulkDensity_t_m3):
+    return np.maximum(EPS, Chipper_m3_h * BulkDensity_t_m3)
+
+@f
+def hand_tph(Handling_tph):
+    return np.maximum(EPS, Handling_tph)
+
+@f
+def C_chip_eurt(Tractor_eur_h, PTOChipper_eur_h, chip_tph, IncludeLabor, IncludeChipOp, Wage_eur_h):
+    """Chipping cost incl. operator labour toggle (€/t DM)."""
+    return (Tractor_eur_h + PTOChipper_eur_h) / chip_tph + IncludeLabor * IncludeChipOp * Wage_eur_h / chip_tph
+
+@f
+def C_handle_eurt(Bucket_eur_t, FrontLoader_eur_h, hand_tph, IncludeLabor, IncludeLoader, Wage_eur_h):
+    """Handling cost incl. loader labour toggle (€/t DM)."""
+    return Bucket_eur_t + FrontLoader_eur_h / hand_tph + IncludeLabor * IncludeLoader * Wage_eur_h / hand_tph
+
+@f
+def tractor_tkm_rate(Tractor_speed_kmh, chip_box_m3, BulkDensity_t_m3):
+    return np.maximum(EPS, Tractor_speed_kmh * chip_box_m3 * BulkDensity_t_m3)
+
+@f
+def truck_tkm_rate(Truck_speed_kmh, PayloadTruck_t):
+    return np.maximum(EPS, Truck_speed_kmh * PayloadTruck_t)
+
+@f
+def C_tkm_tractor(Tractor_eur_h, tractor_tkm_rate, IncludeLabor, IncludeDriver, Wage_eur_h):
+    """Tractor transport cost (€/t-km)."""
+    return Tractor_eur_h / tractor_tkm_rate + IncludeLabor * IncludeDriver * Wage_eur_h / tractor_tkm_rate
+
+@f
+def C_tkm_truck(C_tkm_truck_mach, truck_tkm_rate, IncludeLabor, IncludeDriver, AddLaborToTruckTkm, Wage_eur_h):
+    """Truck transport cost (€/t-km)."""
+    return C_tkm_truck_mach + IncludeLabor * IncludeDriver * AddLaborToTruckTkm * Wage_eur_h / truck_tkm_rate
+
+@f
+def C_surcharge_tractor(Body_Tractor_eur_t):
+    return Body_Tractor_eur_t
+
+@f
+def C_surcharge_truck(SemiTrailer_eur_t):
+    return SemiTrailer_eur_t
+
+def be_radius(payable, fixed_cost, tkm, backhaul):
+    """Break-even one-way radius (km): payable = fixed_cost + backhaul*tkm*d, floored at 0."""
+    return np.maximum(0.0, (payable - fixed_cost) / np.maximum(EPS, backhaul * tkm))
+
+def _fixed_cost(C_chip, C_hand, surcharge):
+    return C_chip + C_hand + surcharge
+
+for _m in MODES:
+    f(_fixed_cost, name=f"C_fixed_{_m}", deps=("C_chip_eurt", "C_handle_eurt", f"C_surcharge_{_m}"))
+    f(be_radius, name=f"BE_radius_{_m}", deps=("P_chip_payable_DM", f"C_fixed_{_m}", f"C_tkm_{_m}", "Backhaul"))
+    f(be_radius, name=f"BE_radius_{_m}_withC",
+      deps=("P_chip_payable_DM_withC", f"C_fixed_{_m}", f"C_tkm_{_m}", "Backhaul"))
+
+@f
+def PayableBudget_yr(P_chip_payable_DM, Qin_DM_h, Hop_year):
+    return P_chip_payable_DM * Qin_DM_h * Hop_year
+
+@f
+def CharOutput_yr(Y_char, Qin_DM_h, Hop_year):
+    return Y_char * Qin_DM_h * Hop_year
+
+@f
+def Qin_asrec_yr(Qin_DM_h, Hop_year, MC_asrec):
+    return Qin_DM_h * Hop_year / np.maximum(EPS, 1 - MC_asrec)
+
+@f
+def CO2_balance_yr(CharOutput_yr, CO2eq_per_tchar):
+    return CharOutput_yr * CO2eq_per_tchar
+
+@f
+def CO2_rev_yr(CO2_balance_yr, P_CO2):
+    return CO2_balance_yr * P_CO2
+
+# Plant gross margin at a delivered chip price and farm-side gap at a distance
+# (Plant1.gms GM; targets of the break-even inverse in breakeven_inverse.py)
+PLANTFLIP.input("P_chip_DM_deliv", 25.0, doc="delivered chip price paid by the plant (€/t DM)")
+PLANTFLIP.input("distance_km", 0.0, doc="one-way haul distance (km)")
+
+@f
+def GM_h(Rev_h, Cost_h, Qin_DM_h, P_chip_DM_deliv):
+    """Plant gross margin (€/h) buying chips at P_chip_DM_deliv."""
+    return Rev_h - Cost_h - Qin_DM_h * P_chip_DM_deliv
+
+@f
+def GM_h_withC(GM_h, CarbonPremium_DM, Qin_DM_h):
+    return GM_h + CarbonPremium_DM * Qin_DM_h
+
+def _gap(payable, fixed_cost, tkm, backhaul, distance_km):
+    """Payable minus delivered cost at distance_km (€/t DM); 0 at the BE radius."""
+    return payable - (fixed_cost + backhaul * tkm * distance_km)
+
+for _m in MODES:
+    f(_gap, name=f"gap_{_m}", deps=("P_chip_payable_DM", f"C_fixed_{_m}", f"C_tkm_{_m}", "Backhaul", "distance_km"))
+    f(_gap, name=f"gap_{_m}_withC",
+      deps=("P_chip_payable_DM_withC", f"C_fixed_{_m}", f"C_tkm_{_m}", "Backhaul", "distance_km"))
+
+del f, _m
+
+KPI_NAMES = (
+    "P_chip_payable_DM", "P_chip_payable_asrec", "C_chip_eurt", "C_handle_eurt",
+    *(f"C_tkm_{m}" for m in MODES), *(f"C_surcharge_{m}" for m in MODES),
+    *(f"BE_radius_{m}" for m in MODES), *(f"BE_radius_{m}_withC" for m in MODES),
+    "PayableBudget_yr", "CharOutput_yr", "Qin_asrec_yr", "CO2_balance_yr", "CO2_rev_yr",
+    "CarbonPremium_DM", "CarbonPremium_asrec", "P_chip_payable_DM_withC", "P_chip_payable_asrec_withC",
+)
+
+# Streamlit apps name some inputs without units; map their variables onto graph inputs
+APP_ALIASES = dict(
+    WageBase="WageBase_eur_h", E_elec="E_elec_kW", E_heat="E_heat_kW", E_buy="E_buy_kWh", Tractor_speed="Tractor_speed_kmh",
+    Truck_speed="Truck_speed_kmh", PayloadTruck="PayloadTruck_t", BulkDensity="BulkDensity_t_m3",
+)
+
+def graph_inputs(namespace, names):
+    """App variables -> PLANTFLIP inputs (aliases resolved, toggles as 0/1, derived names skipped)."""
+    out = {}
+    for n in names:
+        key = APP_ALIASES.get(n, n)
+        if key in PLANTFLIP.defaults:
+            out[key] = float(namespace[n])
+    return out
+
+_PAYABLE = PLANTFLIP.evaluator(["P_chip_payable_DM"], broadcast=False)
+_PREMIUM = PLANTFLIP.evaluator(["CarbonPremium_DM"], broadcast=False)
+_CHIP_HANDLE = PLANTFLIP.evaluator(["C_chip_eurt", "C_handle_eurt"], broadcast=False)
+_TKM = PLANTFLIP.evaluator([f"C_tkm_{m}" for m in MODES], broadcast=False)
+_KPIS = PLANTFLIP.evaluator(KPI_NAMES)
+_PCHAR_GRID = PLANTFLIP.evaluator(["P_chip_payable_DM", "P_chip_payable_asrec", "P_chip_payable_DM_withC",
+                                   "P_chip_payable_asrec_withC", *(f"BE_radius_{m}" for m in MODES),
+                                   *(f"BE_radius_{m}_withC" for m in MODES)])
+
+# -----------------------
+# Formula blocks (graph-backed; p = as_param_arrays(...))
+# -----------------------
+def wage_eur_h(p):
+    return Wage_eur_h(p["WageBase_eur_h"], p["OncostFrac"])
+
+def payable_DM(p):
+    """Max payable chip price at plant gate (€/t DM), breakeven w.r.t. MarginTarget."""
+    return _PAYABLE(p)["P_chip_payable_DM"]
+
+def carbon_premium_DM(p):
+    """Carbon value per t DM of chips (€/t DM)."""
+    return _PREMIUM(p)["CarbonPremium_DM"]
+
+def chip_handle_costs(p):
+    """Chipping and handling unit costs incl. labor toggles (€/t DM)."""
+    out = _CHIP_HANDLE(p)
+    return out["C_chip_eurt"], out["C_handle_eurt"]
+
+def tkm_costs(p):
+    """Transport cost per t-km by mode (€/t-km) as a dict keyed by mode."""
+    out = _TKM(p)
+    return {m: out[f"C_tkm_{m}"] for m in MODES}
+
+def surcharges(p):
+    """Per-trip body surcharge by mode (€/t)."""
+    return dict(tractor=p["Body_Tractor_eur_t"], truck=p["SemiTrailer_eur_t"])
+
+def be_distance(payable, fixed_cost, tkm, backhaul, cost_factor=1.0):
+    """
+    Exact distance (km one-way) where the delivered cost line
+      cost_factor * (fixed_cost + backhaul * tkm * d)
+    crosses `payable`. Works for any basis: DM (cost_factor=1, payable €/t DM),
+    as-received (cost_factor=1-MC, payable €/t as-received), with or without the
+    carbon premium in `payable`. Not floored: a negative result means the payable
+    is below the gate cost even at 0 km.
+    """
+    return (np.asarray(payable, dtype=float) / np.maximum(EPS, cost_factor) - fixed_cost) \
+        / np.maximum(EPS, backhaul * tkm)
+
+def distance_payable_frame(kms, payable_asrec, fixed_cost, tkm, backhaul, MC_asrec, modes=MODES):
+    """
+    Delivered cost vs distance (as-received) for one parameter set, in the layout of
+    distance_payable_curve_j1.csv (km, mode, cost_asrec_eurpt, payable_asrec_eurpt, is_be).
+    fixed_cost / tkm are dicts keyed by mode (€/t DM, €/t-km). The BE row is the exact
+    crossing inserted into the grid (flagged is_be=1), so it does not depend on km step.
+    """
+    kms = np.asarray(kms, dtype=float)
+    dry = 1 - MC_asrec
+    frames = []
+    for m in modes:
+        km_m = kms
+        cost = dry * (fixed_cost[m] + backhaul * tkm[m] * kms)
+        is_be = np.zeros(len(kms), dtype=int)
+        d_be = float(be_distance(payable_asrec, fixed_cost[m], tkm[m], backhaul, dry))
+        if len(kms) and kms[0] <= d_be <= kms[-1]:
+            k = int(np.searchsorted(kms, d_be))
+            if k < len(kms) and np.isclose(kms[k], d_be):
+                is_be[k] = 1
+            else:
+                km_m = np.insert(kms, k, d_be)
+                cost = np.insert(cost, k, payable_asrec)
+                is_be = np.insert(is_be, k, 1)
+        frames.append(pd.DataFrame(dict(
+            km=km_m, mode=m, cost_asrec_eurpt=cost,
+            payable_asrec_eurpt=payable_asrec, is_be=is_be,
+        )))
+    return pd.concat(frames, ignore_index=True)
+
+# -----------------------
+# Batch evaluation
+# -----------------------
+def compute_kpis_batch(params=None, **overrides):
+    """
+    Evaluate the plant-first model for all parameter sets at once.
+
+    Returns a dict of arrays with the broadcast shape of the inputs:
+      P_chip_payable_DM, P_chip_payable_asrec, C_chip_eurt, C_handle_eurt,
+      C_tkm_<mode>, C_surcharge_<mode>, BE_radius_<mode>, BE_radius_<mode>_withC,
+      PayableBudget_yr, CharOutput_yr, Qin_asrec_yr, CO2_balance_yr, CO2_rev_yr,
+      CarbonPremium_DM, CarbonPremium_asrec, P_chip_payable_DM_withC,
+      P_chip_payable_asrec_withC
+    """
+    return _KPIS(as_param_arrays(params, **overrides))
+
+def pchar_grid_frame(inputs, P_char_grid, with_carbon=False):
+    """
+    Payable and BE radius over a biochar price grid (layout of payable_vs_biochar_j1.csv).
+    inputs: PLANTFLIP inputs of the current scenario (e.g. graph_inputs(globals(), ...)).
+    with_carbon: carbon premium added to the payable (and hence to the radii).
+    """
+    k = _PCHAR_GRID(inputs, P_char=np.asarray(P_char_grid, dtype=float))
+    sfx = "_withC" if with_carbon else ""
+    return pd.DataFrame({
+        "Pchar_eurpt": P_char_grid,
+        "Pchip_pay_DM_eurptDM": k[f"P_chip_payable_DM{sfx}"],
+        "Pchip_pay_asrec_eurpt": k[f"P_chip_payable_asrec{sfx}"],
+        "BE_radius_tractor_km": k[f"BE_radius_tractor{sfx}"],
+        "BE_radius_truck_km": k[f"BE_radius_truck{sfx}"],
+    })
+
+def compute_kpis_frame(df):
+    """
+    Columnar variant: every column of `df` named like a DEFAULTS key is an input;
+    other columns (ids, labels) are passed through. Returns df with KPI columns appended.
+    """
+    inputs = df[[c for c in df.columns if c in DEFAULTS]]
+    kpis = compute_kpis_batch(inputs)
+    return df.assign(**{k: np.broadcast_to(v, (len(df),)) for k, v in kpis.items()})
@@ -0,0 +1,229 @@
+# plantflip_pipeline.py
+# Vectorized port of the Plantflip3.gms CSV generators, for any number of plants
+# - plants: DataFrame with a 'plant' column and any PLANTFLIP input columns (missing
+#   inputs take DEFAULTS); every table is built as one array over
+#   plants x grid x modes and written with a single to_csv per file
+# - Same rows, row order, columns and rounding as the GAMS `put` statements
+#   (:0:2 -> 2 decimals, :0:0 -> integer), including its quirks: curve 2 ignores
+#   MarginTarget, the P_char grid is centered with ceil(n/2), is_be marks the
+#   grid row(s) nearest to the crossing
+# - layout="per_plant" writes <table>_<plant>.csv in the exact GAMS layout (what
+#   the dashboards read for j1); layout="combined" writes one <table>.csv with a
+#   leading plant column
+#
+#   python plantflip_pipeline.py --plants plant_variants.csv --out-dir runs/variants --layout combined
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from plantflip_kernel import DEFAULTS, MODES, PLANTFLIP
+
+# table -> GAMS file stem (per-plant files get _<plant> appended, as _j1 in Plantflip3.gms)
+TABLES = dict(
+    summary="plant_first_payable_radius",
+    carbon="plant_first_payable_with_carbon",
+    distance="distance_payable_curve",
+    pchar="payable_vs_biochar",
+    profit="plant_profit_curve",
+    farm="farm_margin_vs_distance",
+)
+
+# Plantflip3.gms writes these two without the plant suffix (one line per plant already)
+UNSUFFIXED = ("carbon",)
+
+# columns written with :0:0 (everything else :0:2)
+INT_COLUMNS = dict(
+    summary=("PayableBudget_yr_EUR",),
+    carbon=("CO2_rev_yr_EUR",),
+    distance=("km", "is_be"),
+    profit=("GM_base_EUR_per_yr", "GM_withC_EUR_per_yr"),
+    farm=("km",),
+)
+
+_NEEDS = (
+    "P_chip_payable_DM", "P_chip_payable_asrec", "P_chip_payable_DM_withC", "P_chip_payable_asrec_withC",
+    "C_chip_eurt", "C_handle_eurt", *(f"C_surcharge_{m}" for m in MODES), *(f"C_tkm_{m}" for m in MODES),
+    *(f"BE_radius_{m}" for m in MODES), "PayableBudget_yr", "CharOutput_yr", "Qin_asrec_yr",
+    "CO2_balance_yr", "CO2_rev_yr", "Rev_h", "Cost_h",
+)
+_EVAL = PLANTFLIP.evaluator(_NEEDS)
+
+def plant_inputs(plants=None):
+    """plants (DataFrame/dict/None) -> (names, {input: (P,) array}); None = one plant 'j1' at DEFAULTS."""
+    if plants is None:
+        plants = pd.DataFrame({"plant": ["j1"]})
+    plants = pd.DataFrame(plants).reset_index(drop=True)
+    names = plants["plant"].astype(str).to_numpy() if "plant" in plants else \
+        np.array([f"j{k + 1}" for k in range(len(plants))])
+    unknown = [c for c in plants.columns if c != "plant" and c not in DEFAULTS]
+    if unknown:
+        raise KeyError(f"unknown plant input column(s) {unknown}")
+    P = len(plants)
+    values = {k: np.full(P, float(v)) for k, v in DEFAULTS.items()}
+    values.update({c: plants[c].to_numpy(dtype=float) for c in plants.columns if c != "plant"})
+    return names, values
+
+# -----------------------
+# Tables (rows in GAMS loop order)
+# -----------------------
+def build_tables(plants=None, km_max=200, km_step=1.0, price_points=11, dP=50.0, profit_points=21,
+                 modes=MODES):
+    """All Plantflip3.gms tables for every plant -> dict table -> DataFrame (with a plant column)."""
+    names, v = plant_inputs(plants)
+    P, M = len(names), len(modes)
+    k = _EVAL(v)
+    dry = 1 - v["MC_asrec"]
+    out = {}
+
+    out["summary"] = pd.DataFrame(dict(
+        plant=names,
+        P_chip_payable_EUR_per_tDM=k["P_chip_payable_DM"],
+        P_chip_payable_EUR_per_t_asrec=k["P_chip_payable_asrec"],
+        BE_radius_tractor_km=k["BE_radius_tractor"],
+        BE_radius_truck_km=k["BE_radius_truck"],
+        PayableBudget_yr_EUR=k["PayableBudget_yr"],
+        CharOutput_yr_t=k["CharOutput_yr"],
+        Qin_asrec_yr_t=k["Qin_asrec_yr"],
+    ))
+    out["carbon"] = pd.DataFrame(dict(
+        plant=names,
+        P_CO2_EUR_per_tCO2=v["P_CO2"],
+        CO2eq_per_tchar_tCO2pt=v["CO2eq_per_tchar"],
+        P_chip_DM_base_EURptDM=k["P_chip_payable_DM"],
+        P_chip_asrec_base_EURpt=k["P_chip_payable_asrec"],
+        P_chip_DM_withC_EURptDM=k["P_chip_payable_DM_withC"],
+        P_chip_asrec_withC_EURpt=k["P_chip_payable_asrec_withC"],
+        CharOutput_yr_t=k["CharOutput_yr"],
+        CO2_balance_yr_tCO2=k["CO2_balance_yr"],
+        CO2_rev_yr_EUR=k["CO2_rev_yr"],
+    ))
+
+    # Curve 1: delivered cost (as-received) vs distance, loop(r, loop(mplot)) -> (P, R, M)
+    km = np.arange(int(round(km_max / km_step)) + 1) * km_step
+    R = len(km)
+    fixed = np.stack([k["C_chip_eurt"] + k["C_handle_eurt"] + k[f"C_surcharge_{m}"] for m in modes], axis=-1)
+    tkm = np.stack([k[f"C_tkm_{m}"] for m in modes], axis=-1)
+    cost = (fixed * dry[:, None])[:, None, :] + (v["Backhaul"][:, None] * tkm * dry[:, None])[:, None, :] \
+        * km[None, :, None]
+    pay = k["P_chip_payable_asrec"]
+    diff = np.abs(cost - pay[:, None, None])
+    is_be = (diff == diff.min(axis=1, keepdims=True)).astype(np.int64)
+    out["distance"] = pd.DataFrame(dict(
+        plant=np.repeat(names, R * M),
+        km=np.tile(np.repeat(km, M), P),
+        mode=np.tile(np.asarray(modes), P * R),
+        cost_asrec_eurpt=cost.reshape(-1),
+        payable_asrec_eurpt=np.repeat(pay, R * M),
+        is_be=is_be.reshape(-1),
+    ))
+
+    # Curve 2: payable vs biochar price; Pchar_grid(bp) = P_char + (ord(bp) - ceil(card/2)) * dP
+    offs = np.arange(1, price_points + 1) - int(np.ceil(price_points / 2))
+    Pc = v["P_char"][:, None] + offs[None, :] * dP
+    Q = v["Qin_DM_h"][:, None]
+    pay_DM = (Pc * v["Y_char"][:, None] * Q + (v["P_el"] * v["E_elec_kW"])[:, None]
+              + (v["P_heat"] * v["E_heat_kW"])[:, None] - k["Cost_h"][:, None]) / np.maximum(1e-9, Q)
+    be = np.maximum(0, (pay_DM[..., None] - fixed[:, None, :])
+                    / np.maximum(1e-9, v["Backhaul"][:, None, None] * tkm[:, None, :]))
+    out["pchar"] = pd.DataFrame(dict(
+        plant=np.repeat(names, price_points),
+        Pchar_eurpt=Pc.reshape(-1),
+        Pchip_pay_DM_eurptDM=pay_DM.reshape(-1),
+        Pchip_pay_asrec_eurpt=(pay_DM * dry[:, None]).reshape(-1),
+        **{f"BE_radius_{m}_km": be[..., j].reshape(-1) for j, m in enumerate(modes)},
+    ))
+
+    # Plant gross margin vs payable chip price (kP grid: 0.6*payable .. 1.4*payable with carbon)
+    lo, hi = 0.6 * k["P_chip_payable_DM"], 1.4 * k["P_chip_payable_DM_withC"]
+    step = (hi - lo) / max(1, profit_points - 1)
+    Pchip = lo[:, None] + np.arange(profit_points)[None, :] * step[:, None]
+    GM_base_h = k["Rev_h"][:, None] - k["Cost_h"][:, None] - Pchip * Q
+    GM_withC_h = k["Rev_h"][:, None] + (k["CO2_rev_yr"] / v["Hop_year"])[:, None] - k["Cost_h"][:, None] - Pchip * Q
+    out["profit"] = pd.DataFrame(dict(
+        plant=np.repeat(names, profit_points),
+        P_chip_EUR_per_tDM=Pchip.reshape(-1),
+        GM_base_EUR_per_yr=(GM_base_h * v["Hop_year"][:, None]).reshape(-1),
+        GM_withC_EUR_per_yr=(GM_withC_h * v["Hop_year"][:, None]).reshape(-1),
+    ))
+
+    # Farm margin vs distance, loop((r, m, scen)) -> (P, R, M, 2)
+    gate = np.stack([k["P_chip_payable_asrec"], k["P_chip_payable_asrec_withC"]], axis=-1)
+    gm_farm = gate[:, None, None, :] - cost[..., None]
+    out["farm"] = pd.DataFrame(dict(
+        plant=np.repeat(names, R * M * 2),
+        km=np.tile(np.repeat(km, M * 2), P),
+        mode=np.tile(np.repeat(np.asarray(modes), 2), P * R),
+        scenario=np.tile(np.array(["base", "withC"]), P * R * M),
+        gate_price_asrec_eurpt=np.broadcast_to(gate[:, None, None, :], gm_farm.shape).reshape(-1),
+        delivered_cost_asrec_eurpt=np.broadcast_to(cost[..., None], gm_farm.shape).reshape(-1),
+        GM_farm_asrec_eurpt=gm_farm.reshape(-1),
+    ))
+    return out
+
+# -----------------------
+# Writing
+# -----------------------
+def _gams_format(name, df):
+    """:0:0 columns -> rounded integers (km keeps 2 decimals if the grid is fractional)."""
+    df = df.copy()
+    for c in INT_COLUMNS.get(name, ()):
+        if c == "km" and not np.allclose(df[c], np.rint(df[c])):
+            continue
+        df[c] = np.rint(df[c].to_numpy(dtype=float)).astype(np.int64)
+    return df
+
+def write_tables(tables, out_dir=".", layout="per_plant"):
+    """Write tables in GAMS layout; returns the list of files written."""
+    if layout not in ("per_plant", "combined"):
+        raise ValueError("layout must be 'per_plant' or 'combined'")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, df in tables.items():
+        df = _gams_format(name, df)
+        stem = TABLES[name]
+        keep_plant = name in ("summary", "carbon", "profit")    # GAMS writes these with a plant column
+        if layout == "combined" or name in UNSUFFIXED:
+            path = out_dir / f"{stem}.csv"
+            cols = df.columns if (keep_plant or layout == "combined") else df.columns.drop("plant")
+            df.to_csv(path, columns=list(cols), index=False, float_format="%.2f")
+            written.append(path)
+            continue
+        cols = list(df.columns if keep_plant else df.columns.drop("plant"))
+        for plant, part in df.groupby("plant", sort=False):
+            path = out_dir / f"{stem}_{plant}.csv"
+            part.to_csv(path, columns=cols, index=False, float_format="%.2f")
+            written.append(path)
+    return written
+
+def run_pipeline(plants=None, out_dir=".", layout="per_plant", **grid):
+    """build_tables + write_tables; grid: km_max, km_step, price_points, dP, profit_points."""
+    return write_tables(build_tables(plants, **grid), out_dir, layout)
+
+# -----------------------
+# CLI
+# -----------------------
+def main():
+    ap = argparse.ArgumentParser(description="Plantflip3.gms CSV tables for many plants (vectorized)")
+    ap.add_argument("--plants", help="CSV with a 'plant' column and PLANTFLIP input columns (default: j1 at DEFAULTS)")
+    ap.add_argument("--out-dir", default=".", help="output directory (default: current, like GAMS)")
+    ap.add_argument("--layout", choices=("per_plant", "combined"), default="per_plant")
+    ap.add_argument("--km-max", type=float, default=200)
+    ap.add_argument("--km-step", type=float, default=1.0)
+    ap.add_argument("--price-points", type=int, default=11)
+    ap.add_argument("--dP", type=float, default=50.0)
+    ap.add_argument("--profit-points", type=int, default=21)
+    args = ap.parse_args()
+
+    plants = pd.read_csv(args.plants) if args.plants else None
+    t0 = time.perf_counter()
+    files = run_pipeline(plants, args.out_dir, args.layout, km_max=args.km_max, km_step=args.km_step,
+                         price_points=args.price_points, dP=args.dP, profit_points=args.profit_points)
+    print(f"wrote {len(files)} files to {args.out_dir} in {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# profit_surface.py
+# Solverless BiocharProfit surface (GAMS_Graph_Pyrolysis2.gms) at any resolution
+# - Same expression as the GAMS loops:
+#     Profit = P * Q_char + Rev_elec
+#              - (c_tkm * d * Q_ship + surcharge * Q_ship              C_transport
+#                 + v_up * Q_char + labor_on * v_labor * Q_char        C_upstream
+#                 + fixed_plant + v_plant * Q_char)                    C_plant
+# - biochar_profit broadcasts over any inputs; surface() evaluates a price x distance
+#   grid in one outer sum (profit[p, d], price on axis 0 like PROFITMAP(p,d))
+# - write_surface / read_surface: compact .npz (profit array + axis vectors) with a JSON
+#   header: axis names/units/start/step, value name, model parameters, dtype
+# - write_gams_csvs: profit_surface.csv, curve_distance.csv, curve_price.csv in the
+#   GAMS put layout (for the CSV dashboards and parity_check)
+#
+#   python profit_surface.py --price 200 800 --price-step 1 --dist 0 200 --dist-step 0.5
+#   python profit_surface.py --set P_BIOCHAR=550 Q_char=120 --csv
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# GAMS_Graph_Pyrolysis2.gms external inputs
+DEFAULTS = dict(
+    P_BIOCHAR=500.0,     # €/t biochar (price for the distance curve)
+    d_active=50.0,       # km (distance for the price curve)
+    Q_char=100.0,        # t biochar
+    Q_ship=100.0,        # t shipped
+    c_tkm=0.12,          # €/t-km
+    surcharge=5.0,       # €/t
+    v_up=50.0,           # €/t upstream variable cost
+    fixed_plant=10000.0, # €
+    v_plant=30.0,        # €/t plant variable cost
+    Rev_elec=0.0,        # €
+    labor_on=1.0,        # 0/1 toggle
+    v_labor=8.0,         # €/t
+)
+
+# GAMS grid: p200..p800 step 50, d0..d200 step 10
+PRICE_AXIS = (200.0, 800.0, 50.0)
+DIST_AXIS = (0.0, 200.0, 10.0)
+
+AXES = (("price_eur_per_t", "EUR/t"), ("dist_km", "km"))
+VALUE = ("profit_eur", "EUR")
+FORMAT_VERSION = 1
+
+def biochar_profit(P_BIOCHAR, d_active, params=None, **overrides):
+    """Profit (€) for any broadcastable prices, distances and parameters."""
+    p = {**DEFAULTS, **(params or {}), **overrides}
+    labor_cost = p["labor_on"] * p["v_labor"] * p["Q_char"]
+    C_transport = p["c_tkm"] * d_active * p["Q_ship"] + p["surcharge"] * p["Q_ship"]
+    C_upstream = p["v_up"] * p["Q_char"] + labor_cost
+    C_plant = p["fixed_plant"] + p["v_plant"] * p["Q_char"]
+    Revenue = P_BIOCHAR * p["Q_char"] + p["Rev_elec"]
+    return Revenue - (C_transport + C_upstream + C_plant)
+
+def axis(start, stop, step=None, n=None):
+    """Grid start..stop by `step` (stop included when it lies on the grid) or `n` points."""
+    if n is not None:
+        return np.linspace(start, stop, int(n))
+    k = int(np.floor((stop - start) / step + 1e-9))
+    return start + np.arange(k + 1) * step
+
+# -----------------------
+# Surface
+# -----------------------
+def surface(prices=None, dists=None, params=None, dtype=np.float64, **overrides):
+    """
+    Profit on the price x distance grid -> dict(price, dist, profit[P, D], params).
+    Profit is separable (revenue in P, transport in d), so the grid is one outer sum.
+    """
+    p = {**DEFAULTS, **(params or {}), **overrides}
+    unknown = [k for k in p if k not in DEFAULTS]
+    if unknown:
+        raise KeyError(f"unknown parameter(s) {unknown}")
+    prices = axis(*PRICE_AXIS) if prices is None else np.asarray(prices, dtype=float)
+    dists = axis(*DIST_AXIS) if dists is None else np.asarray(dists, dtype=float)
+    base = biochar_profit(0.0, 0.0, p)
+    by_price = prices * p["Q_char"] + base
+    by_dist = -p["c_tkm"] * p["Q_ship"] * dists
+    profit = np.add.outer(by_price.astype(dtype), by_dist.astype(dtype))
+    return dict(price=prices, dist=dists, profit=profit, params=p)
+
+def curves(surf=None, params=None, **overrides):
+    """GAMS 1-D curves: profit vs distance at P_BIOCHAR and profit vs price at d_active."""
+    s = surf if surf is not None else surface(params=params, **overrides)
+    p = {**s["params"], **(params or {}), **overrides}
+    return dict(
+        distance=pd.DataFrame(dict(dist_km=s["dist"], profit_eur=biochar_profit(p["P_BIOCHAR"], s["dist"], p))),
+        price=pd.DataFrame(dict(price_eur_per_t=s["price"], profit_eur=biochar_profit(s["price"], p["d_active"], p))),
+    )
+
+def surface_frame(surf):
+    """Long format (price, dist, profit) in GAMS loop order (price outer)."""
+    P, D = surf["profit"].shape
+    return pd.DataFrame(dict(
+        price_eur_per_t=np.repeat(surf["price"], D),
+        dist_km=np.tile(surf["dist"], P),
+        profit_eur=surf["profit"].reshape(-1),
+    ))
+
+# -----------------------
+# Storage
+# -----------------------
+def _axis_meta(name, unit, values):
+    n = len(values)
+    step = (values[-1] - values[0]) / (n - 1) if n > 1 else None
+    uniform = step is not None and np.allclose(np.diff(values), step, rtol=0, atol=1e-9 * max(1.0, abs(step)))
+    return dict(name=name, unit=unit, n=int(n), start=float(values[0]) if n else None,
+                step=float(step) if uniform else None)
+
+def write_surface(path, surf, compressed=False):
+    """Profit grid + axes as .npz with a JSON header (meta); returns the path."""
+    meta = dict(
+        format="pyrocost.surface", version=FORMAT_VERSION, model="GAMS_Graph_Pyrolysis2.gms",
+        value=dict(name=VALUE[0], unit=VALUE[1]),
+        axes=[_axis_meta(n, u, surf[k]) for (n, u), k in zip(AXES, ("price", "dist"))],
+        dtype=str(surf["profit"].dtype), params=surf["params"],
+    )
+    path = Path(path)
+    if path.suffix != ".npz":            # np.savez appends .npz; return the file actually written
+        path = path.with_name(path.name + ".npz")
+    save = np.savez_compressed if compressed else np.savez
+    save(path, profit=surf["profit"], price=surf["price"], dist=surf["dist"], meta=np.array(json.dumps(meta)))
+    return path
+
+def read_surface(path):
+    """.npz written by write_surface -> dict(price, dist, profit, params, meta)."""
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(str(z["meta"]))
+        if meta.get("format") != "pyrocost.surface":
+            raise ValueError(f"{path}: not a surface file")
+        out = dict(price=z["price"], dist=z["dist"], profit=z["profit"])
+    out.update(params=meta["params"], meta=meta)
+    return out
+
+def write_gams_csvs(surf, out_dir=".", params=None):
+    """profit_surface.csv, curve_distance.csv, curve_price.csv as GAMS writes them (:0:0 axes, :0:2 profit)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    c = curves(surf, params)
+    tables = {"profit_surface.csv": surface_frame(surf), "curve_distance.csv": c["distance"],
+              "curve_price.csv": c["price"]}
+    written = []
+    for name, df in tables.items():
+        df = df.copy()
+        for col in ("price_eur_per_t", "dist_km"):
+            if col in df and np.allclose(df[col], np.rint(df[col])):     # :0:0 unless the grid is finer
+                df[col] = np.rint(df[col].to_numpy()).astype(np.int64)
+        df.to_csv(out_dir / name, index=False, float_format="%.2f")
+        written.append(out_dir / name)
+    return written
+
+# -----------------------
+# CLI
+# -----------------------
+def _overrides(items):
+    out = {}
+    for item in items or ():
+        key, _, val = item.partition("=")
+        if key not in DEFAULTS:
+            raise SystemExit(f"unknown parameter {key!r}; one of {', '.join(DEFAULTS)}")
+        out[key] = float(val)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="BiocharProfit price x distance surface (GAMS_Graph_Pyrolysis2)")
+    ap.add_argument("--price", nargs=2, type=float, default=PRICE_AXIS[:2], metavar=("MIN", "MAX"))
+    ap.add_argument("--price-step", type=float, default=PRICE_AXIS[2])
+    ap.add_argument("--dist", nargs=2, type=float, default=DIST_AXIS[:2], metavar=("MIN", "MAX"))
+    ap.add_argument("--dist-step", type=float, default=DIST_AXIS[2])
+    ap.add_argument("--set", nargs="+", metavar="NAME=VALUE", help="override GAMS scalars")
+    ap.add_argument("--float32", action="store_true", help="store profit as float32 (half the size)")
+    ap.add_argument("--out", default="profit_surface.npz")
+    ap.add_argument("--csv", nargs="?", const=".", metavar="DIR", help="also write the GAMS CSVs to DIR")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    surf = surface(axis(*args.price, args.price_step), axis(*args.dist, args.dist_step), _overrides(args.set),
+                   dtype=np.float32 if args.float32 else np.float64)
+    path = write_surface(args.out, surf)
+    P, D = surf["profit"].shape
+    print(f"{P} x {D} surface -> {path} ({path.stat().st_size / 1e6:.2f} MB) in {time.perf_counter() - t0:.2f}s")
+    if args.csv:
+        for f in write_gams_csvs(surf, args.csv):
+            print(f"wrote {f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# results_store.py
+# Columnar, memory-mapped store for model outputs (no extra dependencies)
+# - One directory per table: <root>/<name>/schema.json + one .npy per column
+# - Numeric / bool columns stored as-is; string and categorical columns
+#   dictionary-encoded (int codes in the .npy, labels in schema.json)
+# - Columns opened with np.load(mmap_mode="r"): only touched pages are read and
+#   pages are shared between processes through the OS cache
+# - Zone maps (min / max per row group) in the schema; filters skip row groups
+#   that cannot match before any column data is read
+# - Filters: "j == 'j1' and m == 'truck'", [("value", ">", 0)], or {"m": ["truck"]}
+# - load_table(path): CSV or gdxdump file through the store (ingested on first use,
+#   re-ingested when the source file changes)
+
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from gdx_dump_parser import read_gdx_dump
+
+DEFAULT_ROOT = Path(".results")
+ROW_GROUP = 1 << 16
+LANE_INDEX = ("i", "j", "m")     # names for (*,*,*) / (*,*) dumps, as parse_gdx_dump
+SCHEMA_VERSION = 1
+
+_OPS = {
+    "==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+    ">": np.greater, ">=": np.greater_equal,
+}
+_TERM = re.compile(
+    r"^\s*(\w+)\s*(==|!=|<=|>=|<|>|\bin\b|\bnot in\b)\s*(.+?)\s*$", re.I
+)
+
+# -----------------------
+# Filters
+# -----------------------
+def _literal(text):
+    """'j1' / "j1" / 3.5 / ['a', 'b'] -> Python value."""
+    text = text.strip()
+    if text.startswith(("[", "(")):
+        return [_literal(t) for t in re.findall(r"'[^']*'|\"[^\"]*\"|[^,\[\]()\s]+", text)]
+    if text[:1] in "'\"":
+        return text[1:-1]
+    try:
+        return float(text) if any(ch in text for ch in ".eE") or text.lower() in ("inf", "-inf", "nan") \
+            else int(text)
+    except ValueError:
+        return text
+
+def parse_where(where):
+    """Normalise a filter to a list of (column, op, value); terms are AND-ed."""
+    if where is None:
+        return []
+    if isinstance(where, dict):
+        return [(c, "in" if isinstance(v, (list, tuple, set)) else "==", v) for c, v in where.items()]
+    if isinstance(where, str):
+        terms = []
+        for part in re.split(r"\s+and\s+|\s*&\s*", where.strip(), flags=re.I):
+            m = _TERM.match(part)
+            if not m:
+                raise ValueError(f"cannot parse filter term {part!r} (use: col op literal, joined by 'and')")
+            terms.append((m.group(1), m.group(2).lower(), _literal(m.group(3))))
+        return terms
+    return [tuple(t) for t in where]
+
+# -----------------------
+# Store
+# -----------------------
+class ResultsStore:
+    """
+    Directory of memory-mapped tables.
+
+        store = ResultsStore()
+        store.write("UC_lane", df)
+        store.read("UC_lane", columns=["i", "value"], where="j == 'j1' and m == 'truck'")
+    """
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = Path(root)
+        self._schemas = {}
+
+    # ----- catalogue -----
+    def tables(self):
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / "schema.json").exists())
+
+    def __contains__(self, name):
+        return (self.root / name / "schema.json").exists()
+
+    def schema(self, name):
+        path = self.root / name / "schema.json"
+        mtime = path.stat().st_mtime_ns
+        cached = self._schemas.get(name)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, json.loads(path.read_text()))
+            self._schemas[name] = cached
+        return cached[1]
+
+    def drop(self, name):
+        shutil.rmtree(self.root / name, ignore_errors=True)
+        self._schemas.pop(name, None)
+
+    # ----- write -----
+    def write(self, name, df, sort_by=None, source=None, meta=None, row_group=ROW_GROUP):
+        """
+        Write a DataFrame once. sort_by: columns to order rows by (makes zone maps
+        selective for filters on those columns). source: file the table came from
+        (path + mtime recorded for freshness checks).
+        """
+        df = df.reset_index(drop=True)
+        if sort_by:
+            df = df.sort_values(list(sort_by), kind="stable").reset_index(drop=True)
+        tmp = self.root / f".{name}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        n = len(df)
+        groups = [(a, min(n, a + row_group)) for a in range(0, n, row_group)]
+        cols = []
+        for k, c in enumerate(df.columns):
+            s = df[c]
+            entry = dict(name=str(c), file=f"c{k}.npy")
+            if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object or pd.api.types.is_string_dtype(s):
+                cat = s.astype("category") if not isinstance(s.dtype, pd.CategoricalDtype) else s
+                cats = [str(x) for x in cat.cat.categories]
+                codes = cat.cat.codes.to_numpy()
+                codes = codes.astype(np.int16 if len(cats) < 2**15 else np.int32)
+                entry.update(kind="category", categories=cats)
+                arr = codes
+            else:
+                arr = s.to_numpy()
+                entry.update(kind="numeric")
+            entry["dtype"] = arr.dtype.str
+            if arr.dtype.kind in "iuf" and n:
+                entry["zone_min"], entry["zone_max"] = _zone_map(arr, groups)
+            np.save(tmp / entry["file"], np.ascontiguousarray(arr))
+            cols.append(entry)
+        schema = dict(version=SCHEMA_VERSION, name=name, rows=n, row_group=row_group, columns=cols,
+                      sort_by=list(sort_by or []), meta=meta or {})
+        if source is not None:
+            src = Path(source)
+            schema["source"] = dict(path=str(src.resolve()), mtime_ns=src.stat().st_mtime_ns,
+                                    size=src.stat().st_size)
+        (tmp / "schema.json").write_text(json.dumps(schema, indent=1))
+        dest = self.root / name
+        old = self.root / f".{name}.old{os.getpid()}"
+        if dest.exists():
+            dest.rename(old)
+        tmp.rename(dest)
+        shutil.rmtree(old, ignore_errors=True)
+        self._schemas.pop(name, None)
+        return schema
+
+    def tables_from(self, source):
+        """Tables written from `source` that are still up to date with it."""
+        return [t for t in self.tables() if self.is_fresh(t, source)]
+
+    def is_fresh(self, name, source):
+        """True when the table exists and was written from `source` as it is now."""
+        if name not in self:
+            return False
+        src = self.schema(name).get("source")
+        p = Path(source)
+        return bool(src) and p.exists() and src["path"] == str(p.resolve()) \
+            and src["mtime_ns"] == p.stat().st_mtime_ns and src["size"] == p.stat().st_size
+
+    # ----- read -----
+    def column(self, name, col):
+        """Raw memory-mapped column (codes for categorical columns)."""
+        entry = self._entry(name, col)
+        return np.load(self.root / name / entry["file"], mmap_mode="r")
+
+    def _entry(self, name, col):
+        for e in self.schema(name)["columns"]:
+            if e["name"] == col:
+                return e
+        raise KeyError(f"{name}: no column {col!r}; columns: {[e['name'] for e in self.schema(name)['columns']]}")
+
+    def _term_mask(self, name, col, op, value, rows):
+        """Boolean mask of one filter term over the given row slice (codes compared for categoricals)."""
+        entry = self._entry(name, col)
+        arr = self.column(name, col)[rows]
+        if entry["kind"] == "category":
+            lookup = {c: k for k, c in enumerate(entry["categories"])}
+            if op in ("in", "not in"):
+                codes = [lookup[str(v)] for v in value if str(v) in lookup]
+                m = np.isin(arr, codes)
+                return ~m if op == "not in" else m
+            if op in ("==", "!="):
+                code = lookup.get(str(value), -2)
+                return arr == code if op == "==" else arr != code
+            # ordered comparison on the labels themselves
+            labels = np.asarray(entry["categories"], dtype=object)
+            ok = np.nonzero(_OPS[op](labels, str(value)))[0]
+            return np.isin(arr, ok)
+        if op in ("in", "not in"):
+            m = np.isin(arr, list(value))
+            return ~m if op == "not in" else m
+        return _OPS[op](arr, value)
+
+    def _groups_for(self, name, terms):
+        """Row groups that may satisfy every term (zone-map pruning)."""
+        sch = self.schema(name)
+        n, rg = sch["rows"], sch["row_group"]
+        keep = np.ones((n + rg - 1) // rg, dtype=bool)
+        for col, op, value in terms:
+            entry = self._entry(name, col)
+            if "zone_min" not in entry:
+                continue
+            lo = np.array([np.nan if v is None else v for v in entry["zone_min"]], dtype=float)
+            hi = np.array([np.nan if v is None else v for v in entry["zone_max"]], dtype=float)
+            if entry["kind"] == "category":
+                lookup = {c: k for k, c in enumerate(entry["categories"])}
+                if op == "==":
+                    v = lookup.get(str(value))
+                    keep &= False if v is None else (lo <= v) & (hi >= v)
+                elif op == "in":
+                    vs = [lookup[str(x)] for x in value if str(x) in lookup]
+                    keep &= np.any([(lo <= v) & (hi >= v) for v in vs], axis=0) if vs else False
+                continue
+            with np.errstate(invalid="ignore"):
+                if op == "==":
+                    keep &= (lo <= value) & (hi >= value)
+                elif op in ("<", "<="):
+                    keep &= _OPS[op](lo, value)
+                elif op in (">", ">="):
+                    keep &= _OPS[op](hi, value)
+                elif op == "in":
+                    keep &= np.any([(lo <= v) & (hi >= v) for v in value], axis=0) if len(value) else False
+        return np.nonzero(keep)[0]
+
+    def row_index(self, name, where=None):
+        """Row numbers matching the filter (None = all rows)."""
+        terms = parse_where(where)
+        if not terms:
+            return None
+        sch = self.schema(name)
+        n, rg = sch["rows"], sch["row_group"]
+        hits = []
+        for g in self._groups_for(name, terms):
+            rows = slice(g * rg, min(n, (g + 1) * rg))
+            m = np.ones(rows.stop - rows.start, dtype=bool)
+            for col, op, value in terms:
+                m &= self._term_mask(name, col, op, value, rows)
+                if not m.any():
+                    break
+            hits.append(np.nonzero(m)[0] + rows.start)
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+    def read(self, name, columns=None, where=None, categorical=True):
+        """
+        Projected, filtered table. Only the requested columns are opened; with a filter
+        only the surviving rows are copied out of the memory maps.
+        """
+        sch = self.schema(name)
+        idx = self.row_index(name, where)
+        out = {}
+        for col in columns or [e["name"] for e in sch["columns"]]:
+            entry = self._entry(name, col)
+            arr = self.column(name, col)
+            arr = np.asarray(arr) if idx is None else arr[idx]
+            if entry["kind"] == "category":
+                cat = pd.Categorical.from_codes(arr.astype(np.int32), categories=entry["categories"])
+                out[col] = cat if categorical else np.asarray(cat, dtype=object)
+            else:
+                out[col] = arr
+        return pd.DataFrame(out)
+
+    # ----- ingest -----
+    def ingest(self, path, name=None, sort_index=True):
+        """
+        Store a results file: gdxdump text or a plain CSV table, named after the file stem
+        (several symbols in one dump -> "<stem>.<symbol>"). Returns the table names written.
+        """
+        p = Path(path)
+        written = []
+        symbols = read_gdx_dump(p) if _looks_like_gdxdump(p) else {}
+        if symbols:
+            for sym, df in symbols.items():
+                idx = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+                anon = [c for c in idx if re.fullmatch(r"dim\d+", c)]
+                if anon == idx and len(idx) in (2, 3):
+                    df = df.rename(columns=dict(zip(idx, LANE_INDEX[-len(idx):])))
+                    idx = list(LANE_INDEX[-len(idx):])
+                table = (name or p.stem) if len(symbols) == 1 else f"{name or p.stem}.{sym}"
+                self.write(table, df, sort_by=idx if sort_index else None, source=p, meta=dict(kind="gdxdump"))
+                written.append(table)
+        else:
+            table = name or p.stem
+            self.write(table, pd.read_csv(p), source=p, meta=dict(kind="csv"))
+            written.append(table)
+        return written
+
+def _zone_map(arr, groups):
+    """Per row group min / max (JSON-safe: all-NaN groups -> None, ±inf clipped to ±1e308)."""
+    lo, hi = [], []
+    for a, b in groups:
+        part = arr[a:b]
+        if part.dtype.kind == "f":
+            part = part[~np.isnan(part)]
+        if len(part) == 0:
+            lo.append(None); hi.append(None)
+            continue
+        lo.append(float(np.clip(part.min(), -1e308, 1e308)))
+        hi.append(float(np.clip(part.max(), -1e308, 1e308)))
+    return lo, hi
+
+def _looks_like_gdxdump(path):
+    with open(path, encoding="utf-8", errors="ignore") as fh:
+        head = fh.read(4096)
+    return bool(re.search(r"^\s*(Set|Parameter|Scalar|Variable|Equation)s?\s+\w+", head, re.I | re.M)) \
+        or head.lstrip().startswith("'")
+
+# -----------------------
+# Drop-in loader
+# -----------------------
+_STORES = {}
+
+def load_table(path, columns=None, where=None, store=None, categorical=False):
+    """
+    Read a CSV / gdxdump results file through the store: the first call (or a call after
+    the file changed) ingests it, later calls memory-map the stored columns.
+    A gdxdump file with several symbols returns the first one; use ResultsStore.read for others.
+    """
+    if store is None:
+        root = DEFAULT_ROOT
+        store = _STORES.setdefault(str(root), ResultsStore(root))
+    p = Path(path)
+    names = [p.stem] if store.is_fresh(p.stem, p) else store.tables_from(p) or store.ingest(p)
+    return store.read(names[0], columns=columns, where=where, categorical=categorical)
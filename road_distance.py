@@ -0,0 +1,171 @@
+# road_distance.py
+# Road-network haul distances per (farm, plant, mode) with an on-disk cache
+# - Local road graph from a pre-extracted edge list CSV (u, v, length_km, optional
+#   maxspeed_kmh, oneway, access_<mode>) plus a node CSV (node_id, lat, lon)
+# - Farms / plants are snapped to their nearest graph node (KD-tree); the snap leg
+#   is added as straight-line km
+# - Per mode: fastest path with edge speed = min(mode speed, maxspeed), Dijkstra from
+#   every plant on the reversed graph (farm -> plant), km of that path by pointer
+#   doubling over the shortest-path tree
+# - Results (km, hours as I × J × M) cached as .npz keyed on graph hash + query hash,
+#   with a JSON index, so repeated sweeps never recompute paths
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+from distance_matrix import EARTH_RADIUS_KM, unit_xyz
+from plantflip_kernel import DEFAULTS, MODES
+
+MODE_SPEEDS = dict(
+    tractor=DEFAULTS["Tractor_speed_kmh"],
+    truck=DEFAULTS["Truck_speed_kmh"],
+)
+
+# -----------------------
+# Graph
+# -----------------------
+def load_road_graph(edge_path, node_path):
+    """
+    Read the edge list and node table.
+    edges: u, v, length_km [, maxspeed_kmh, oneway (0/1), access_tractor, access_truck (0/1)]
+    nodes: node_id, lat, lon
+    Returns dict(nodes=DataFrame, u, v (int codes), length_km, maxspeed_kmh, oneway, access={mode: bool})
+    """
+    edges = pd.read_csv(edge_path)
+    nodes = pd.read_csv(node_path)
+    for c in ("u", "v", "length_km"):
+        if c not in edges.columns:
+            raise KeyError(f"{edge_path}: missing column {c!r}")
+    code = pd.Index(nodes["node_id"].astype(str))
+    u = code.get_indexer(edges["u"].astype(str))
+    v = code.get_indexer(edges["v"].astype(str))
+    if (u < 0).any() or (v < 0).any():
+        raise ValueError(f"{edge_path}: edges reference nodes missing from {node_path}")
+    n = len(edges)
+    return dict(
+        nodes=nodes.assign(node_id=nodes["node_id"].astype(str)),
+        u=u, v=v,
+        length_km=edges["length_km"].to_numpy(dtype=float),
+        maxspeed_kmh=edges["maxspeed_kmh"].fillna(np.inf).to_numpy(dtype=float)
+                     if "maxspeed_kmh" in edges else np.full(n, np.inf),
+        oneway=edges["oneway"].fillna(0).to_numpy(dtype=bool) if "oneway" in edges else np.zeros(n, dtype=bool),
+        access={m: edges[f"access_{m}"].fillna(1).to_numpy(dtype=bool) if f"access_{m}" in edges
+                else np.ones(n, dtype=bool) for m in MODES},
+    )
+
+def graph_hash(graph):
+    """Content hash of the road graph (topology, lengths, speeds, access)."""
+    h = hashlib.sha256()
+    for a in (graph["u"], graph["v"], graph["length_km"], graph["maxspeed_kmh"], graph["oneway"],
+              *(graph["access"][m] for m in MODES),
+              graph["nodes"]["lat"].to_numpy(dtype=float), graph["nodes"]["lon"].to_numpy(dtype=float)):
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()[:16]
+
+def _mode_matrices(graph, mode, speed_kmh):
+    """Reversed (v -> u) hour and km CSR matrices for one mode, parallel edges reduced to the fastest."""
+    ok = graph["access"][mode]
+    u, v, km = graph["u"][ok], graph["v"][ok], graph["length_km"][ok]
+    hours = km / np.minimum(speed_kmh, graph["maxspeed_kmh"][ok])
+    two = ~graph["oneway"][ok]
+    # both directions for two-way edges; reversed so Dijkstra from a plant gives farm -> plant times
+    src = np.concatenate([v, u[two]])
+    dst = np.concatenate([u, v[two]])
+    km = np.concatenate([km, km[two]])
+    hours = np.concatenate([hours, hours[two]])
+    e = pd.DataFrame(dict(s=src, d=dst, h=hours, k=km)).sort_values("h").drop_duplicates(["s", "d"])
+    N = len(graph["nodes"])
+    H = sp.csr_matrix((np.maximum(e["h"].to_numpy(), 1e-12), (e["s"].to_numpy(), e["d"].to_numpy())), shape=(N, N))
+    K = sp.csr_matrix((e["k"].to_numpy(), (e["s"].to_numpy(), e["d"].to_numpy())), shape=(N, N))
+    return H, K
+
+def _path_km(pred, K):
+    """km along every shortest-path tree (rows = sources) by pointer doubling."""
+    S, N = pred.shape
+    rows = np.repeat(np.arange(S), N).reshape(S, N)
+    has = pred >= 0
+    step = np.zeros((S, N))
+    p, c = pred[has], np.broadcast_to(np.arange(N), (S, N))[has]
+    step[has] = np.asarray(K[p, c]).ravel()
+    anc = np.where(has, pred, -1)
+    acc = step
+    while (anc >= 0).any():
+        valid = anc >= 0
+        a = np.where(valid, anc, 0)
+        acc = acc + np.where(valid, acc[rows, a], 0.0)
+        anc = np.where(valid, anc[rows, a], -1)
+    return acc
+
+# -----------------------
+# Snapping
+# -----------------------
+def snap_to_nodes(graph, points):
+    """Nearest graph node and straight-line snap km for points (DataFrame with lat, lon)."""
+    tree = cKDTree(unit_xyz(graph["nodes"]["lat"], graph["nodes"]["lon"]))
+    chord, idx = tree.query(unit_xyz(points["lat"], points["lon"]))
+    return idx, 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+# -----------------------
+# Distances
+# -----------------------
+def road_distances(graph, farms, plants, speeds=None, max_hours=np.inf, chunk_sources=64):
+    """
+    km and hours per (i, j, m) as arrays of shape (I, J, M), modes ordered as MODES.
+    Unreachable pairs (or beyond max_hours) are inf, so upstream_lanes prunes them.
+    """
+    speeds = {**MODE_SPEEDS, **(speeds or {})}
+    f_node, f_snap = snap_to_nodes(graph, farms)
+    p_node, p_snap = snap_to_nodes(graph, plants)
+    I, J, M = len(farms), len(plants), len(MODES)
+    km = np.full((I, J, M), np.inf)
+    hours = np.full((I, J, M), np.inf)
+    for k, m in enumerate(MODES):
+        H, K = _mode_matrices(graph, m, speeds[m])
+        snap = f_snap[:, None] + p_snap[None, :]
+        for a in range(0, J, chunk_sources):
+            src = p_node[a:a + chunk_sources]
+            t, pred = dijkstra(H, directed=True, indices=src, return_predecessors=True, limit=max_hours)
+            d = _path_km(pred, K)
+            d[~np.isfinite(t)] = np.inf
+            km[:, a:a + len(src), k] = d[:, f_node].T + snap[:, a:a + len(src)]
+            hours[:, a:a + len(src), k] = t[:, f_node].T + snap[:, a:a + len(src)] / speeds[m]
+    return dict(km=km, hours=hours, farm_node=f_node, plant_node=p_node)
+
+def _query_hash(farms, plants, speeds, max_hours):
+    h = hashlib.sha256()
+    for df in (farms, plants):
+        h.update(np.ascontiguousarray(df[["lat", "lon"]].to_numpy(dtype=float)).tobytes())
+    h.update(json.dumps(dict(speeds=speeds, max_hours=float(max_hours)), sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+def cached_road_distances(graph, farms, plants, speeds=None, max_hours=np.inf, cache_dir=".road_cache"):
+    """
+    road_distances through an on-disk cache: <cache_dir>/<graph_hash>_<query_hash>.npz,
+    indexed in <cache_dir>/index.json (graph hash -> query hash -> file + metadata).
+    """
+    speeds = {**MODE_SPEEDS, **(speeds or {})}
+    cache = Path(cache_dir)
+    cache.mkdir(parents=True, exist_ok=True)
+    gkey, qkey = graph_hash(graph), _query_hash(farms, plants, speeds, max_hours)
+    path = cache / f"{gkey}_{qkey}.npz"
+    if path.exists():
+        z = np.load(path)
+        return dict(km=z["km"], hours=z["hours"], farm_node=z["farm_node"], plant_node=z["plant_node"],
+                    cache_hit=True)
+
+    res = road_distances(graph, farms, plants, speeds, max_hours)
+    np.savez_compressed(path, **res)
+    index_path = cache / "index.json"
+    index = json.loads(index_path.read_text()) if index_path.exists() else {}
+    index.setdefault(gkey, {})[qkey] = dict(
+        file=path.name, n_farms=len(farms), n_plants=len(plants), speeds=speeds, max_hours=float(max_hours),
+    )
+    index_path.write_text(json.dumps(index, indent=1))
+    return {**res, "cache_hit": False}
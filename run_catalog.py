@@ -0,0 +1,389 @@
+# run_catalog.py
+# Catalog of model runs (SQLite, stdlib only)
+# - Each registered run gets its own folder runs/<run_id>/ with copies of its outputs
+#   (UC_lane.csv, miro_out.gdx, plant_modeA_kpi_j1.csv, ...), so later runs that
+#   overwrite the repo-root files no longer destroy earlier ones
+# - Tables: runs (model, param hash, timestamps, folder), params (one row per
+#   run × parameter, numeric and text values indexed), outputs (symbol -> file),
+#   metrics (scalar results such as GM_total)
+# - Queries: find("P_char between 500 and 700 and MC = 0.25"), then
+#   collect("BE_radius", where=..., filter="m == 'truck'") stacks one symbol over
+#   all matching runs (read through results_store, memory-mapped per run)
+# - Dashboards: output_path("UC_lane.csv") -> file of the run in $PYROCOST_RUN
+#   ("latest" or a run id), else the repo-root file, else the latest run that has it
+#
+#   python run_catalog.py register Upstream_5.gms --params MC=0.25 P_chip=70 \
+#       --gdx-params miro_in.gdx --outputs UC_lane.csv BE_radius.csv miro_out.gdx
+#   python run_catalog.py find "P_chip between 60 and 80 and MC = 0.25"
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from results_store import ResultsStore, load_table
+
+DEFAULT_DB = Path("runs") / "catalog.sqlite"
+RUN_ENV = "PYROCOST_RUN"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     INTEGER PRIMARY KEY,
+    model      TEXT NOT NULL,
+    param_hash TEXT NOT NULL,
+    started    TEXT,
+    finished   TEXT,
+    status     TEXT,
+    out_dir    TEXT,
+    note       TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    name   TEXT NOT NULL COLLATE NOCASE,
+    num    REAL,
+    txt    TEXT
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    symbol TEXT NOT NULL COLLATE NOCASE,
+    path   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    name   TEXT NOT NULL COLLATE NOCASE,
+    value  REAL
+);
+CREATE INDEX IF NOT EXISTS ix_params_num ON params(name, num, run_id);
+CREATE INDEX IF NOT EXISTS ix_params_txt ON params(name, txt, run_id);
+CREATE INDEX IF NOT EXISTS ix_params_run ON params(run_id);
+CREATE INDEX IF NOT EXISTS ix_outputs ON outputs(symbol, run_id);
+CREATE INDEX IF NOT EXISTS ix_metrics ON metrics(name, value, run_id);
+CREATE INDEX IF NOT EXISTS ix_runs_hash ON runs(param_hash);
+CREATE INDEX IF NOT EXISTS ix_runs_model ON runs(model, finished);
+"""
+
+FILTER_OPS = ("=", "!=", "<", "<=", ">", ">=", "between", "in")
+
+_TERM = re.compile(
+    r"^\s*(\w+)\s*(?:(between)\s+(\S+)\s+and\s+(\S+)|(==|=|!=|<=|>=|<|>)\s*(.+?))\s*$", re.I
+)
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def _is_num(v):
+    """Numeric parameter value (Python or NumPy number; bools are stored as text)."""
+    return isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_))
+
+def param_hash(params):
+    """Canonical hash of a parameter set (key order and int/float spelling do not matter)."""
+    canon = {str(k).lower(): (float(v) if _is_num(v) else str(v)) for k, v in params.items()}
+    return hashlib.sha256(json.dumps(canon, sort_keys=True).encode()).hexdigest()[:16]
+
+def gdx_scalars(path):
+    """Scalar parameters of a GDX file (e.g. miro_in.gdx) as a params dict."""
+    from gdx_reader import GdxFile
+    out = {}
+    with GdxFile(path) as g:
+        for name in g.symbols.query("dim == 0 and type == 'parameter'")["name"]:
+            v = g.read(name)["value"]
+            if len(v):
+                out[name] = float(v.iloc[0])
+    return out
+
+def _split_terms(where):
+    """'a between 1 and 2 and b = 3' -> ['a between 1 and 2', 'b = 3'] (keeps BETWEEN's AND)."""
+    parts, out = re.split(r"\s+and\s+", where.strip(), flags=re.I), []
+    k = 0
+    while k < len(parts):
+        if re.search(r"\bbetween\s+\S+$", parts[k], re.I) and k + 1 < len(parts):
+            out.append(parts[k] + " and " + parts[k + 1])
+            k += 2
+        else:
+            out.append(parts[k])
+            k += 1
+    return out
+
+def _value(text):
+    text = text.strip()
+    if text[:1] in "'\"":
+        return text[1:-1]
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def parse_param_filter(where):
+    """
+    Filter on run parameters -> list of (name, op, value).
+    Accepts "P_char between 500 and 700 and MC = 0.25", a dict {name: value | (lo, hi) | [values]},
+    or (name, op, value) tuples; op is one of FILTER_OPS ("==" means "=").
+    """
+    if where is None:
+        return []
+    if isinstance(where, dict):
+        terms = []
+        for k, v in where.items():
+            if isinstance(v, tuple) and len(v) == 2:
+                terms.append((k, "between", v))
+            elif isinstance(v, (list, set)):
+                terms.append((k, "in", list(v)))
+            else:
+                terms.append((k, "=", v))
+        return terms
+    if isinstance(where, str):
+        terms = []
+        for part in _split_terms(where):
+            m = _TERM.match(part)
+            if not m:
+                raise ValueError(f"cannot parse run filter {part!r}")
+            if m.group(2):
+                terms.append((m.group(1), "between", (_value(m.group(3)), _value(m.group(4)))))
+            else:
+                terms.append((m.group(1), "=" if m.group(5) == "==" else m.group(5), _value(m.group(6))))
+        return terms
+    terms = []
+    for name, op, value in where:
+        op = str(op).strip().lower()
+        op = "=" if op == "==" else op
+        if op not in FILTER_OPS:
+            raise ValueError(f"unsupported filter operator {op!r} for {name!r}; use one of {FILTER_OPS}")
+        terms.append((name, op, value))
+    return terms
+
+class RunCatalog:
+    """
+    SQLite index of runs.
+
+        cat = RunCatalog()
+        rid = cat.register("Upstream_5.gms", {"MC": 0.25, "P_chip": 70}, ["UC_lane.csv", "BE_radius.csv"])
+        cat.find("P_chip between 60 and 80 and MC = 0.25")
+        cat.collect("BE_radius", where="MC = 0.25", filter="m == 'truck'")
+    """
+    def __init__(self, path=DEFAULT_DB):
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ----- write -----
+    def register(self, model, params, outputs=(), metrics=None, started=None, finished=None,
+                 status="ok", note=None, copy=True):
+        """
+        Record one run. outputs: file paths (symbol = file stem) or {symbol: path}.
+        copy=True copies the files into runs/<run_id>/ so they survive the next run.
+        Returns the run id.
+        """
+        outputs = dict(outputs) if isinstance(outputs, dict) else {Path(p).stem: p for p in outputs}
+        with self.db:
+            cur = self.db.execute(
+                "INSERT INTO runs(model, param_hash, started, finished, status, note) VALUES (?,?,?,?,?,?)",
+                (str(model), param_hash(params), started or _now(), finished or _now(), status, note))
+            run_id = cur.lastrowid
+            out_dir = self.root / f"{run_id:06d}"
+            rows = []
+            for sym, p in outputs.items():
+                p = Path(p)
+                if copy:
+                    out_dir.mkdir(parents=True, exist_ok=True)
+                    dest = out_dir / p.name
+                    shutil.copy2(p, dest)
+                    p = dest
+                rows.append((run_id, sym, str(p)))
+            self.db.execute("UPDATE runs SET out_dir = ? WHERE run_id = ?",
+                            (str(out_dir) if copy else None, run_id))
+            self.db.executemany("INSERT INTO outputs VALUES (?,?,?)", rows)
+            self.db.executemany("INSERT INTO params VALUES (?,?,?,?)", [
+                (run_id, k, float(v), None) if _is_num(v)
+                else (run_id, k, None, str(v)) for k, v in params.items()])
+            self.db.executemany("INSERT INTO metrics VALUES (?,?,?)",
+                                [(run_id, k, float(v)) for k, v in (metrics or {}).items()])
+        return run_id
+
+    def delete(self, run_id):
+        with self.db:
+            row = self.db.execute("SELECT out_dir FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            self.db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        if row and row[0]:
+            shutil.rmtree(row[0], ignore_errors=True)
+
+    # ----- query -----
+    def _run_ids_sql(self, where, model=None, symbol=None):
+        """SQL selecting matching run ids: one indexed sub-select per term, intersected."""
+        subs, args = [], []
+        for name, op, value in parse_param_filter(where):
+            if op == "between":
+                subs.append("SELECT run_id FROM params WHERE name = ? AND num BETWEEN ? AND ?")
+                args += [name, float(value[0]), float(value[1])]
+            elif op == "in":
+                nums = [v for v in value if _is_num(v)]
+                txts = [str(v) for v in value if not _is_num(v)]
+                q = []
+                if nums:
+                    q.append(f"num IN ({','.join('?' * len(nums))})")
+                if txts:
+                    q.append(f"txt IN ({','.join('?' * len(txts))})")
+                subs.append(f"SELECT run_id FROM params WHERE name = ? AND ({' OR '.join(q) or '0'})")
+                args += [name, *map(float, nums), *txts]
+            else:
+                if op not in FILTER_OPS:         # op is spliced into the SQL text: whitelist only
+                    raise ValueError(f"unsupported filter operator {op!r} for {name!r}; use one of {FILTER_OPS}")
+                num = _is_num(value)
+                subs.append(f"SELECT run_id FROM params WHERE name = ? AND {'num' if num else 'txt'} {op} ?")
+                args += [name, float(value) if num else str(value)]
+        if model is not None:
+            subs.append("SELECT run_id FROM runs WHERE model = ?")
+            args.append(str(model))
+        if symbol is not None:
+            subs.append("SELECT run_id FROM outputs WHERE symbol = ?")
+            args.append(symbol)
+        if not subs:
+            return "SELECT run_id FROM runs", []
+        return " INTERSECT ".join(subs), args
+
+    def run_ids(self, where=None, model=None, symbol=None):
+        sql, args = self._run_ids_sql(where, model, symbol)
+        return [r[0] for r in self.db.execute(sql + " ORDER BY run_id", args)]
+
+    def find(self, where=None, model=None, symbol=None, limit=None, params=True):
+        """Matching runs as a DataFrame (one row per run, parameters as columns when params=True)."""
+        sql, args = self._run_ids_sql(where, model, symbol)
+        lim = f" LIMIT {int(limit)}" if limit else ""
+        runs = pd.read_sql_query(
+            f"SELECT r.* FROM runs r JOIN ({sql}) s USING (run_id) ORDER BY r.run_id DESC{lim}", self.db, params=args)
+        if not params or runs.empty:
+            return runs
+        ids = runs["run_id"].tolist()
+        p = pd.read_sql_query(
+            f"SELECT run_id, name, COALESCE(num, txt) AS value FROM params "
+            f"WHERE run_id IN ({','.join('?' * len(ids))})", self.db, params=ids)
+        wide = p.pivot_table(index="run_id", columns="name", values="value", aggfunc="first")
+        return runs.merge(wide, left_on="run_id", right_index=True, how="left")
+
+    def latest(self, symbol=None, model=None, where=None):
+        """Most recent run id (optionally one that has `symbol` among its outputs), or None."""
+        ids = self.run_ids(where, model, symbol)
+        return ids[-1] if ids else None
+
+    def output_path(self, run_id, symbol):
+        row = self.db.execute("SELECT path FROM outputs WHERE run_id = ? AND symbol = ?",
+                              (run_id, symbol)).fetchone()
+        if row is None:
+            raise KeyError(f"run {run_id} has no output {symbol!r}")
+        return Path(row[0])
+
+    def params(self, run_id):
+        return {n: (v if t is None else t) for n, v, t in
+                self.db.execute("SELECT name, num, txt FROM params WHERE run_id = ?", (run_id,))}
+
+    def load(self, run_id, symbol, columns=None, filter=None):
+        """One output of one run as a DataFrame (memory-mapped from the run's own results store)."""
+        p = self.output_path(run_id, symbol)
+        return load_table(p, columns=columns, where=filter, store=ResultsStore(p.parent / ".results"))
+
+    def collect(self, symbol, where=None, filter=None, columns=None, model=None, with_params=()):
+        """
+        Stack `symbol` over every run matching `where`, with a run_id column
+        (plus the requested parameters as columns).
+            cat.collect("BE_radius", "P_char between 500 and 700 and MC = 0.25", filter="m == 'truck'")
+        """
+        frames = []
+        for rid in self.run_ids(where, model, symbol):
+            df = self.load(rid, symbol, columns=columns, filter=filter)
+            df.insert(0, "run_id", rid)
+            if with_params:
+                pv = self.params(rid)
+                for k in with_params:
+                    df[k] = pv.get(k)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# -----------------------
+# Dashboard helper
+# -----------------------
+def output_path(filename, run=None, catalog=DEFAULT_DB):
+    """
+    Where a dashboard should read `filename` from.
+    run: run id, "latest", or None (then $PYROCOST_RUN). With no run selected the
+    repo-root file wins; if it is missing, the latest catalogued run that has it.
+    """
+    run = run if run is not None else os.environ.get(RUN_ENV)
+    p = Path(filename)
+    if run is None and p.exists():
+        return p
+    if not Path(catalog).exists():
+        return p
+    with RunCatalog(catalog) as cat:
+        rid = cat.latest(symbol=p.stem) if run in (None, "latest") else int(run)
+        if rid is None:
+            return p
+        try:
+            return cat.output_path(rid, p.stem)
+        except KeyError:
+            return p
+
+# -----------------------
+# CLI
+# -----------------------
+def _kv(items):
+    out = {}
+    for it in items or []:
+        k, _, v = it.partition("=")
+        out[k] = _value(v)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Run catalog")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("register", help="record a finished run")
+    r.add_argument("model")
+    r.add_argument("--params", nargs="*", help="name=value ...")
+    r.add_argument("--gdx-params", help="take scalar parameters from this GDX (e.g. miro_in.gdx)")
+    r.add_argument("--outputs", nargs="*", default=[])
+    r.add_argument("--metrics", nargs="*", help="name=value ...")
+    r.add_argument("--note")
+    f = sub.add_parser("find", help="list runs matching a parameter filter")
+    f.add_argument("where", nargs="?")
+    f.add_argument("--model")
+    f.add_argument("--limit", type=int, default=50)
+    c = sub.add_parser("collect", help="stack one output over matching runs")
+    c.add_argument("symbol")
+    c.add_argument("where", nargs="?")
+    c.add_argument("--filter")
+    ap.add_argument("--db", default=str(DEFAULT_DB))
+    args = ap.parse_args()
+
+    with RunCatalog(args.db) as cat:
+        if args.cmd == "register":
+            params = {**(gdx_scalars(args.gdx_params) if args.gdx_params else {}), **_kv(args.params)}
+            t0 = time.time()
+            rid = cat.register(args.model, params, args.outputs, metrics=_kv(args.metrics), note=args.note)
+            print(f"run {rid} registered ({len(args.outputs)} outputs, {time.time() - t0:.2f}s)")
+        elif args.cmd == "find":
+            print(cat.find(args.where, model=args.model, limit=args.limit).to_string(index=False))
+        else:
+            print(cat.collect(args.symbol, args.where, filter=args.filter).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+# scenario_cache.py
+# Process-wide scenario cache shared by the Streamlit apps
+# - Params: canonical, immutable parameter set (sorted names, floats normalised,
+#   arrays by content) with a stable BLAKE2 digest computed once
+# - ScenarioCache: LRU over (namespace, key digest) with a byte budget, hit / miss /
+#   eviction counters and single-flight (concurrent sessions asking for the same
+#   grid wait for one computation instead of each running it)
+# - Optional disk tier (pickles under .scenario_cache/, off unless
+#   $SCENARIO_CACHE_DISK_MB is set) so separate Streamlit processes share results
+# - Keys carry a code version: CACHE_VERSION plus a digest of the model sources
+#   (MODEL_MODULES and the module that defines the cached function), so edited formulas
+#   or frame layouts never read results pickled by older code. Kernels cached by their
+#   own name (cached_call(distance_payable_frame, ...)) get the same key in every app
+# - cached() decorator / cached_call() for plain functions; returned DataFrames and
+#   arrays are copies, so a session cannot mutate the cached object
+
+import hashlib
+import importlib.util
+import os
+import pickle
+import re
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 256 * 2**20        # in-memory budget
+DEFAULT_DISK_BYTES = 0                 # on-disk budget (0 disables the disk tier; opt in per deployment)
+DEFAULT_DISK_DIR = Path(".scenario_cache")
+
+CACHE_VERSION = 1                      # bump when cached value layouts change without a source edit
+MODEL_MODULES = ("plantflip_kernel", "formula_graph", "monte_carlo", "sensitivity", "plantflip_heatmap")
+
+# -----------------------
+# Canonical keys
+# -----------------------
+def _feed(h, obj):
+    """Stream a canonical, type-tagged encoding of obj into hash h."""
+    if obj is None:
+        h.update(b"N")
+    elif isinstance(obj, Params):
+        h.update(b"P" + obj.digest.encode())
+    elif isinstance(obj, (bool, np.bool_)):
+        h.update(b"B1" if obj else b"B0")
+    elif isinstance(obj, (int, float, np.integer, np.floating)):
+        x = float(obj)
+        h.update(b"F" + struct.pack("<d", 0.0 if x == 0.0 else x))   # -0.0 == 0.0, 3 == 3.0
+    elif isinstance(obj, str):
+        h.update(b"S" + struct.pack("<I", len(obj)) + obj.encode())
+    elif isinstance(obj, (bytes, bytearray)):
+        h.update(b"Y" + struct.pack("<I", len(obj)) + bytes(obj))
+    elif isinstance(obj, np.ndarray):
+        a = np.ascontiguousarray(obj)
+        if a.dtype.kind in "iub":
+            a = a.astype(float)
+        h.update(b"A" + a.dtype.str.encode() + struct.pack(f"<{a.ndim + 1}q", a.ndim, *a.shape))
+        h.update(a.tobytes() if a.dtype.kind != "O" else repr(a.tolist()).encode())
+    elif isinstance(obj, dict):
+        h.update(b"D" + struct.pack("<I", len(obj)))
+        for k in sorted(obj, key=str):
+            _feed(h, str(k))
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"L" + struct.pack("<I", len(obj)))
+        for v in obj:
+            _feed(h, v)
+    elif isinstance(obj, (set, frozenset)):
+        _feed(h, sorted(obj, key=repr))
+    elif isinstance(obj, pd.DataFrame):
+        h.update(b"T")
+        _feed(h, [str(c) for c in obj.columns])
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(b"R")
+        _feed(h, str(obj.name))
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    else:
+        h.update(b"O" + repr(obj).encode())
+
+def canonical_hash(*parts):
+    """Stable hex digest of any nesting of scalars / strings / arrays / dicts / frames / Params."""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        _feed(h, p)
+    return h.hexdigest()
+
+class Params:
+    """
+    Immutable, canonical parameter set.
+
+        base = Params(P_char=550, MC_asrec=0.25)
+        base.with_(P_char=600).digest   # stable across processes and sessions
+    Numbers compare as floats (550 == 550.0), names are kept as given.
+    """
+    __slots__ = ("_items", "_digest")
+
+    def __init__(self, mapping=None, **kw):
+        merged = {**(dict(mapping) if mapping is not None else {}), **kw}
+        items = []
+        for k in sorted(merged):
+            v = merged[k]
+            if isinstance(v, (bool, np.bool_)):
+                v = bool(v)
+            elif isinstance(v, (int, float, np.integer, np.floating)):
+                v = float(v)
+            elif isinstance(v, np.ndarray):
+                v = v.copy()
+                v.setflags(write=False)
+            items.append((str(k), v))
+        object.__setattr__(self, "_items", tuple(items))
+        object.__setattr__(self, "_digest", None)
+
+    @classmethod
+    def from_namespace(cls, namespace, names):
+        """Pick `names` out of a namespace dict (e.g. an app's globals() after the sidebar)."""
+        return cls({n: namespace[n] for n in names})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Params is immutable; use with_()")
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            for k, v in self._items:
+                _feed(h, k)
+                _feed(h, v)
+            object.__setattr__(self, "_digest", h.hexdigest())
+        return self._digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __eq__(self, other):
+        return isinstance(other, Params) and self.digest == other.digest
+
+    def __getitem__(self, name):
+        for k, v in self._items:
+            if k == name:
+                return v
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return any(k == name for k, _ in self._items)
+
+    def __iter__(self):
+        return (k for k, _ in self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"Params({', '.join(f'{k}={v!r}' for k, v in self._items)})"
+
+    def to_dict(self):
+        return dict(self._items)
+
+    def with_(self, **overrides):
+        return Params(self.to_dict(), **overrides)
+
+# -----------------------
+# Code version
+# -----------------------
+_SOURCE_DIGESTS = {}
+
+def _module_file(name):
+    if name == "__main__":
+        return getattr(sys.modules.get("__main__"), "__file__", None)
+    mod = sys.modules.get(name)
+    if mod is not None:
+        return getattr(mod, "__file__", None)
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec is not None else None
+
+def code_version(*modules):
+    """Short digest of CACHE_VERSION and the source files of `modules` (+ MODEL_MODULES)."""
+    h = hashlib.blake2b(digest_size=6)
+    h.update(str(CACHE_VERSION).encode())
+    for name in sorted({*MODEL_MODULES, *modules}):
+        path = _module_file(name)
+        if not path or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        sig = (path, st.st_mtime_ns, st.st_size)
+        digest = _SOURCE_DIGESTS.get(sig)
+        if digest is None:
+            with open(path, "rb") as fh:
+                digest = _SOURCE_DIGESTS[sig] = hashlib.blake2b(fh.read(), digest_size=16).digest()
+        h.update(name.encode() + digest)
+    return h.hexdigest()
+
+# -----------------------
+# Cache
+# -----------------------
+def nbytes(obj):
+    """Approximate retained size of a cached value."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(nbytes(k) + nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+def _detach(obj):
+    """Copy mutable containers on the way out so callers cannot edit the cached value."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return obj.copy()
+    if isinstance(obj, dict):
+        return {k: _detach(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_detach(v) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(_detach(v) for v in obj)
+    return obj
+
+class ScenarioCache:
+    """Thread-safe LRU keyed by (namespace, canonical hash) with a byte budget and counters."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=None,
+                 disk_dir=DEFAULT_DISK_DIR, max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if (disk_dir and max_disk_bytes) else None
+        self.max_disk_bytes = max_disk_bytes
+        self._data = OrderedDict()          # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight = {}                 # key -> Event
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+        self.compute_seconds = 0.0
+
+    # ----- stats -----
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return dict(entries=len(self._data), bytes=self._bytes, max_bytes=self.max_bytes,
+                        hits=self.hits, misses=self.misses, disk_hits=self.disk_hits,
+                        evictions=self.evictions, hit_rate=self.hits / total if total else 0.0,
+                        compute_seconds=round(self.compute_seconds, 3))
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+        if disk and self.disk_dir is not None and self.disk_dir.exists():
+            for p in self.disk_dir.glob("*.pkl"):
+                p.unlink(missing_ok=True)
+
+    # ----- memory tier -----
+    def _put(self, key, value):
+        size = nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (self._bytes > self.max_bytes or
+                                  (self.max_entries and len(self._data) > self.max_entries)):
+                _, (_, s) = self._data.popitem(last=False)
+                self._bytes -= s
+                self.evictions += 1
+
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            self._data.move_to_end(key)
+            return True, item[0]
+
+    # ----- disk tier -----
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key[0]}-{key[1]}.pkl"
+
+    def _disk_get(self, key):
+        if self.disk_dir is None:
+            return False, None
+        p = self._disk_path(key)
+        try:
+            with open(p, "rb") as fh:
+                value = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False, None
+        os.utime(p)                         # LRU on disk by mtime
+        return True, value
+
+    def _disk_put(self, key, value):
+        if self.disk_dir is None:
+            return
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        p = self._disk_path(key)
+        tmp = p.with_suffix(f".tmp{os.getpid()}_{threading.get_ident()}")
+        try:
+            with open(tmp, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, p)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            tmp.unlink(missing_ok=True)
+            return
+        files = sorted(self.disk_dir.glob("*.pkl"), key=lambda q: q.stat().st_mtime)
+        total = sum(q.stat().st_size for q in files)
+        for q in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= q.stat().st_size
+            q.unlink(missing_ok=True)
+
+    # ----- main entry -----
+    def get_or_compute(self, namespace, key, compute):
+        """
+        Value for (namespace, key); `compute()` runs at most once per key at a time.
+        key: anything canonical_hash accepts (Params, tuples of Params and grid options, ...).
+        The namespace is salted with code_version() of its defining module (first dotted part),
+        so stale disk entries are never read.
+        """
+        ns = re.sub(r"[^\w.\-]", "_", str(namespace))
+        k = (f"{ns}.v{code_version(ns.split('.', 1)[0])}", canonical_hash(key))
+        while True:
+            found, value = self._get(k)
+            if found:
+                with self._lock:
+                    self.hits += 1
+                return _detach(value)
+            with self._lock:
+                ev = self._inflight.get(k)
+                if ev is None:
+                    ev = self._inflight[k] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+            if owner:
+                break
+            ev.wait()                       # someone else is computing this key
+        try:
+            found, value = self._disk_get(k)
+            if found:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+            else:
+                t0 = time.perf_counter()
+                value = compute()
+                with self._lock:
+                    self.misses += 1
+                    self.compute_seconds += time.perf_counter() - t0
+                self._disk_put(k, value)
+            self._put(k, value)
+            return _detach(value)
+        finally:
+            with self._lock:
+                self._inflight.pop(k).set()
+
+# -----------------------
+# Process-wide instance
+# -----------------------
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache():
+    """The process-wide cache (sizes from $SCENARIO_CACHE_MB / $SCENARIO_CACHE_DISK_MB; disk off by default)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            mem = float(os.environ.get("SCENARIO_CACHE_MB", DEFAULT_MAX_BYTES / 2**20))
+            disk = float(os.environ.get("SCENARIO_CACHE_DISK_MB", DEFAULT_DISK_BYTES / 2**20))
+            _CACHE = ScenarioCache(max_bytes=int(mem * 2**20), max_disk_bytes=int(disk * 2**20))
+        return _CACHE
+
+def _namespace(fn):
+    mod = getattr(fn, "__module__", None) or "?"
+    if mod == "__main__":                   # Streamlit scripts run as __main__: use the file name
+        mod = Path(getattr(sys.modules["__main__"], "__file__", "__main__")).stem
+    return f"{mod}.{getattr(fn, '__qualname__', repr(fn))}"
+
+def cached_call(fn, *args, **kwargs):
+    """fn(*args, **kwargs) through the shared cache, keyed on fn's name and canonical arguments."""
+    return get_cache().get_or_compute(_namespace(fn), (args, kwargs), lambda: fn(*args, **kwargs))
+
+def cached(namespace=None):
+    """Decorator form of cached_call (replacement for per-function st.cache_data)."""
+    def wrap(fn):
+        ns = namespace or _namespace(fn)
+
+        def inner(*args, **kwargs):
+            return get_cache().get_or_compute(ns, (args, kwargs), lambda: fn(*args, **kwargs))
+        inner.__name__, inner.__doc__, inner.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return inner
+    return wrap
@@ -0,0 +1,198 @@
+# sensitivity.py
+# Exact partial derivatives and elasticities of formula-graph outputs (forward-mode AD)
+# - Dual: value + tangents w.r.t. all seeded inputs at once (tangent axis last), so
+#   one pass through the graph gives the values and the full gradient of every output
+# - Works with the NumPy formulas of formula_graph.FormulaGraph as written (+ - * /,
+#   np.maximum/minimum, powers, sqrt/exp/log); base points can be arrays (batch)
+# - Kinks (np.maximum floors such as BE radius >= 0) take the derivative of the
+#   active branch; a clamped radius has zero gradient
+# - kpi_sensitivities / tornado_frame: plant-first KPIs (plantflip_kernel.PLANTFLIP)
+#   w.r.t. every continuous DEFAULTS input; a full tornado costs one evaluation
+#
+#   res = kpi_sensitivities(P_char=np.linspace(400, 800, 41))
+#   res["elasticity"]["BE_radius_truck"]      # (41, n_inputs)
+#   tornado_frame("BE_radius_truck", swing=0.1)
+
+import numpy as np
+import pandas as pd
+
+from plantflip_kernel import DEFAULTS, PLANTFLIP, TOGGLES
+
+SENSITIVITY_KPIS = (
+    "P_chip_payable_DM", "BE_radius_tractor", "BE_radius_truck", "CarbonPremium_DM", "PayableBudget_yr",
+)
+
+# -----------------------
+# Dual numbers
+# -----------------------
+class Dual:
+    """val: array of shape S; der: d val / d seeds, shape S + (n_seeds,)."""
+    __array_priority__ = 100
+
+    def __init__(self, val, der):
+        self.val = np.asarray(val, dtype=float)
+        der = np.asarray(der, dtype=float)
+        if der.shape[:-1] != self.val.shape:
+            der = np.broadcast_to(der, self.val.shape + der.shape[-1:])
+        self.der = der
+
+    def __repr__(self):
+        return f"Dual({self.val!r}, der shape {self.der.shape})"
+
+    @property
+    def shape(self):
+        return self.val.shape
+
+    def __array_ufunc__(self, ufunc, method, *args, **kwargs):
+        if method != "__call__" or kwargs or ufunc not in _RULES:
+            return NotImplemented
+        vals = [a.val if isinstance(a, Dual) else np.asarray(a, dtype=float) for a in args]
+        ders = [a.der if isinstance(a, Dual) else None for a in args]
+        val, der = _RULES[ufunc](vals, ders)
+        return Dual(val, der)
+
+    __add__ = lambda self, o: np.add(self, o)
+    __radd__ = lambda self, o: np.add(o, self)
+    __sub__ = lambda self, o: np.subtract(self, o)
+    __rsub__ = lambda self, o: np.subtract(o, self)
+    __mul__ = lambda self, o: np.multiply(self, o)
+    __rmul__ = lambda self, o: np.multiply(o, self)
+    __truediv__ = lambda self, o: np.true_divide(self, o)
+    __rtruediv__ = lambda self, o: np.true_divide(o, self)
+    __pow__ = lambda self, o: np.power(self, o)
+    __rpow__ = lambda self, o: np.power(o, self)
+    __neg__ = lambda self: np.negative(self)
+    __pos__ = lambda self: self
+    __abs__ = lambda self: np.absolute(self)
+
+def _lin(*terms):
+    """sum(coef * der) over terms whose der is not None; coef broadcast onto the tangent axis."""
+    out = None
+    for coef, der in terms:
+        if der is None:
+            continue
+        t = der if coef is None else np.asarray(coef)[..., None] * der
+        out = t if out is None else out + t
+    return out
+
+def _or0(der):
+    return 0.0 if der is None else der
+
+def _pick(cond, da, db):
+    return np.where(cond[..., None], _or0(da), _or0(db))
+
+def _power(vals, ders):
+    (a, b), (da, db) = vals, ders
+    v = a ** b
+    log_a = np.log(np.where(a > 0, a, 1.0)) if db is not None else None
+    return v, _lin((b * a ** (b - 1), da), (v * log_a if db is not None else None, db))
+
+_RULES = {
+    np.add: lambda v, d: (v[0] + v[1], _lin((None, d[0]), (None, d[1]))),
+    np.subtract: lambda v, d: (v[0] - v[1], _lin((None, d[0]), (-1.0, d[1]))),
+    np.multiply: lambda v, d: (v[0] * v[1], _lin((v[1], d[0]), (v[0], d[1]))),
+    np.true_divide: lambda v, d: (v[0] / v[1], _lin((1.0 / v[1], d[0]), (-v[0] / v[1] ** 2, d[1]))),
+    np.negative: lambda v, d: (-v[0], _lin((-1.0, d[0]))),
+    np.absolute: lambda v, d: (np.abs(v[0]), _lin((np.sign(v[0]), d[0]))),
+    np.maximum: lambda v, d: (np.maximum(v[0], v[1]), _pick(v[0] >= v[1], d[0], d[1])),
+    np.minimum: lambda v, d: (np.minimum(v[0], v[1]), _pick(v[0] <= v[1], d[0], d[1])),
+    np.sqrt: lambda v, d: (np.sqrt(v[0]), _lin((0.5 / np.sqrt(v[0]), d[0]))),
+    np.exp: lambda v, d: (np.exp(v[0]), _lin((np.exp(v[0]), d[0]))),
+    np.log: lambda v, d: (np.log(v[0]), _lin((1.0 / v[0], d[0]))),
+    np.power: _power,
+}
+
+# -----------------------
+# Graph-level gradients
+# -----------------------
+def gradients(graph, outputs, values=None, wrt=None, **overrides):
+    """
+    Values and exact gradients of `outputs` in one forward pass over `graph`.
+    wrt: inputs to differentiate against (default: every input the outputs depend on).
+    Returns dict(value={out: S}, grad={out: S + (len(wrt),)}, wrt=[...], inputs={name: S}).
+    """
+    given = {**(values or {}), **overrides}
+    unknown = [k for k in given if k not in graph.defaults]
+    if unknown:
+        raise KeyError(f"{graph.name}: unknown input(s) {sorted(unknown)}")
+    outputs = list(outputs)
+    need = graph.ancestors(outputs)
+    inputs = [n for n in graph.defaults if n in need]
+    wrt = list(wrt) if wrt is not None else inputs
+    bad = [n for n in wrt if n not in graph.defaults]
+    if bad:
+        raise KeyError(f"{graph.name}: cannot differentiate w.r.t. {bad} (not inputs)")
+
+    n = len(wrt)
+    seed = {name: k for k, name in enumerate(wrt)}
+    raw = {name: np.asarray(given.get(name, graph.defaults[name]), dtype=float)
+           for name in dict.fromkeys(inputs + wrt)}
+    env = {}
+    for name, v in raw.items():
+        if name in seed:
+            der = np.zeros(v.shape + (n,))
+            der[..., seed[name]] = 1.0
+            env[name] = Dual(v, der)
+        else:
+            env[name] = v
+    for node in graph.order:
+        if node in need:
+            fn, deps = graph.formulas[node]
+            env[node] = fn(*[env[d] for d in deps])
+
+    shape = np.broadcast_shapes(*(v.shape for v in raw.values())) if raw else ()
+    value, grad = {}, {}
+    for o in outputs:
+        x = env[o]
+        val, der = (x.val, x.der) if isinstance(x, Dual) else (np.asarray(x, dtype=float), np.zeros(np.shape(x) + (n,)))
+        value[o] = np.broadcast_to(val, shape)
+        grad[o] = np.broadcast_to(der, shape + (n,))
+    return dict(value=value, grad=grad, wrt=wrt,
+                inputs={name: np.broadcast_to(raw[name], shape) for name in wrt})
+
+def elasticities(res):
+    """d ln(out) / d ln(input) = grad * input / out (NaN where out == 0)."""
+    X = np.stack([res["inputs"][w] for w in res["wrt"]], axis=-1) if res["wrt"] else 0.0
+    out = {}
+    for o, g in res["grad"].items():
+        y = res["value"][o][..., None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[o] = np.where(y != 0, g * X / np.where(y != 0, y, 1.0), np.nan)
+    return out
+
+# -----------------------
+# Plant-first KPIs
+# -----------------------
+def continuous_inputs():
+    """PLANTFLIP inputs that make sense as derivatives (0/1 labor toggles excluded)."""
+    return [n for n in DEFAULTS if n not in TOGGLES]
+
+def kpi_sensitivities(params=None, outputs=SENSITIVITY_KPIS, wrt=None, **overrides):
+    """
+    Values, gradients and elasticities of plant-first KPIs in one pass.
+    params/overrides: scalars or arrays (broadcast like compute_kpis_batch).
+    """
+    values = dict(params) if params is not None else {}
+    values.update(overrides)
+    res = gradients(PLANTFLIP, outputs, values, wrt=wrt if wrt is not None else continuous_inputs())
+    res["elasticity"] = elasticities(res)
+    return res
+
+def tornado_frame(output="BE_radius_truck", params=None, wrt=None, swing=0.10, top=None, **overrides):
+    """
+    Tornado ranking for one KPI at one base point: linearised KPI at input*(1 -/+ swing),
+    sorted by |elasticity|. Columns: input, base, gradient, elasticity, low, high, range.
+    """
+    res = kpi_sensitivities(params, outputs=[output], wrt=wrt, **overrides)
+    y = res["value"][output]
+    if y.ndim:
+        raise ValueError("tornado_frame needs a single base point (scalar inputs)")
+    g, e = res["grad"][output], res["elasticity"][output]
+    x = np.array([res["inputs"][w] for w in res["wrt"]], dtype=float)
+    delta = g * x * swing
+    df = pd.DataFrame(dict(input=res["wrt"], base=x, gradient=g, elasticity=e,
+                           low=float(y) - delta, high=float(y) + delta))
+    df["range"] = (df["high"] - df["low"]).abs()
+    df = df.reindex(df["elasticity"].abs().fillna(0).sort_values(ascending=False).index).reset_index(drop=True)
+    df.attrs.update(output=output, value=float(y), swing=swing)
+    return df.head(top) if top else df
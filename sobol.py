@@ -0,0 +1,186 @@
+# sobol.py
+# Variance-based global sensitivity (Sobol first- and total-order indices) for the
+# plant-first KPIs, Saltelli sampling on top of the compiled PLANTFLIP evaluator
+# - One sample set for all KPIs: base matrices A, B (N x k, scrambled Sobol points)
+#   and the k mixed matrices AB_i are evaluated once; every KPI is read off the
+#   same N * (k + 2) model runs
+# - Estimators: first order Saltelli et al. (2010), total order Jansen (1999);
+#   percentile bootstrap confidence intervals reuse the same resampling indices
+#   across KPIs and parameters
+# - Inputs: every continuous DEFAULTS input (toggles and Backhaul excluded);
+#   monte_carlo.UNCERTAIN marginals where given, else uniform +/- `rel` around
+#   the default. Inputs are treated as independent (no copula here)
+# - Parallel: the AB_i columns are split over a process pool (workers=N)
+#
+#   python sobol.py --n 65536 --workers 4 --out sobol_indices.csv
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from monte_carlo import MARGINALS, UNCERTAIN
+from plantflip_kernel import DEFAULTS, PLANTFLIP, TOGGLES
+
+SOBOL_KPIS = ("P_chip_payable_DM", "BE_radius_tractor", "BE_radius_truck", "CarbonPremium_DM", "PayableBudget_yr")
+
+# not continuous (or 0 by default, so a relative range is empty)
+EXCLUDED = (*TOGGLES, "Backhaul")
+
+def default_ranges(rel=0.2, dists=UNCERTAIN, base=None):
+    """name -> (kind, *params) for every continuous input with a non-zero value."""
+    base = {**DEFAULTS, **(base or {})}
+    out = {}
+    for name, v in base.items():
+        if name in EXCLUDED:
+            continue
+        if name in dists:
+            out[name] = dists[name]
+        elif v:
+            lo, hi = sorted((v * (1 - rel), v * (1 + rel)))
+            out[name] = ("uniform", lo, hi)
+    return out
+
+def _to_inputs(U, names, dists):
+    U = np.clip(U, 1e-12, 1 - 1e-12)
+    return {name: MARGINALS[dists[name][0]](U[:, k], *dists[name][1:]) for k, name in enumerate(names)}
+
+# -----------------------
+# Model runs (worker side)
+# -----------------------
+_W = {}
+
+def _init_worker(A, B, spec):
+    _W.update(A=A, B=B, spec=spec, evaluate=PLANTFLIP.evaluator(spec["outputs"]))
+
+def _evaluate(U):
+    spec = _W["spec"]
+    out = _W["evaluate"]({**spec["base"], **_to_inputs(U, spec["names"], spec["dists"])})
+    return {o: np.asarray(out[o], dtype=float).reshape(-1) for o in spec["outputs"]}
+
+def _eval_columns(cols):
+    """f(AB_i) for the parameter columns in `cols` -> {kpi: (len(cols), N)}."""
+    A, B = _W["A"], _W["B"]
+    res = {o: np.empty((len(cols), len(A))) for o in _W["spec"]["outputs"]}
+    for r, i in enumerate(cols):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        for o, v in _evaluate(AB).items():
+            res[o][r] = v
+    return res
+
+# -----------------------
+# Estimators
+# -----------------------
+def _indices(fA, fB, fAB):
+    """First / total order for all parameters; fAB: (k, N). Works on bootstrap stacks too."""
+    V = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        S1 = np.mean(fB * (fAB - fA), axis=-1) / V
+        ST = 0.5 * np.mean((fA - fAB) ** 2, axis=-1) / V
+    return S1, ST, V
+
+def _bootstrap(fA, fB, fAB, idx):
+    """Indices for each resample in idx (R, N) -> S1, ST of shape (R, k)."""
+    a, b = fA[idx], fB[idx]
+    V = np.var(np.concatenate([a, b], axis=1), axis=1)
+    S1 = np.empty((len(idx), len(fAB)))
+    ST = np.empty_like(S1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i, f in enumerate(fAB):
+            ab = f[idx]
+            S1[:, i] = np.mean(b * (ab - a), axis=1) / V
+            ST[:, i] = 0.5 * np.mean((a - ab) ** 2, axis=1) / V
+    return S1, ST
+
+def sobol_indices(n=2 ** 12, dists=None, base=None, outputs=SOBOL_KPIS, rel=0.2, seed=0, workers=1,
+                  n_boot=100, conf=0.95, boot_chunk=25):
+    """
+    Saltelli design with n base samples (rounded up to a power of two) over `dists`
+    (default: default_ranges(rel, base=base)); the other inputs stay at base/DEFAULTS.
+    Returns dict(indices=DataFrame[kpi, param, S1, S1_lo, S1_hi, ST, ST_lo, ST_hi],
+                 variance={kpi: V}, n, runs, names).
+    """
+    dists = dict(dists) if dists is not None else default_ranges(rel, base=base)
+    names = list(dists)
+    k = len(names)
+    fixed = {n_: float(v) for n_, v in (base or {}).items() if n_ not in dists}
+    spec = dict(names=names, dists=dists, base=fixed, outputs=tuple(outputs))
+
+    m = int(np.ceil(np.log2(max(2, n))))
+    AB = qmc.Sobol(d=2 * k, scramble=True, seed=seed).random_base2(m)
+    A, B = AB[:, :k], AB[:, k:]
+    N = len(A)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, k))
+    blocks = [list(range(k))[w::workers] for w in range(workers)]
+    if workers == 1:
+        _init_worker(A, B, spec)
+        parts = [_eval_columns(blocks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(A, B, spec)) as ex:
+            parts = list(ex.map(_eval_columns, blocks))
+    _init_worker(A, B, spec)
+    fA, fB = _evaluate(A), _evaluate(B)
+
+    fAB = {}
+    for o in outputs:
+        fAB[o] = np.empty((k, N))
+        for cols, part in zip(blocks, parts):
+            fAB[o][cols] = part[o]
+
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, N, size=(n_boot, N))
+    lo_q, hi_q = (1 - conf) / 2, (1 + conf) / 2
+    frames, variance = [], {}
+    for o in outputs:
+        S1, ST, V = _indices(fA[o], fB[o], fAB[o])
+        variance[o] = float(V)
+        boots = [_bootstrap(fA[o], fB[o], fAB[o], idx[r:r + boot_chunk]) for r in range(0, n_boot, boot_chunk)]
+        S1_b = np.concatenate([b[0] for b in boots])
+        ST_b = np.concatenate([b[1] for b in boots])
+        frames.append(pd.DataFrame(dict(
+            kpi=o, param=names, S1=S1, ST=ST,
+            S1_lo=np.nanquantile(S1_b, lo_q, axis=0), S1_hi=np.nanquantile(S1_b, hi_q, axis=0),
+            ST_lo=np.nanquantile(ST_b, lo_q, axis=0), ST_hi=np.nanquantile(ST_b, hi_q, axis=0),
+        )))
+    indices = pd.concat(frames, ignore_index=True)[
+        ["kpi", "param", "S1", "S1_lo", "S1_hi", "ST", "ST_lo", "ST_hi"]]
+    return dict(indices=indices, variance=variance, n=N, runs=N * (k + 2), names=names)
+
+def ranking(indices, kpi="BE_radius_truck", by="ST", top=None):
+    """Parameters of one KPI sorted by total (or first) order index."""
+    df = indices[indices["kpi"] == kpi].sort_values(by, ascending=False).reset_index(drop=True)
+    return df.head(top) if top else df
+
+# -----------------------
+# CLI
+# -----------------------
+def main():
+    ap = argparse.ArgumentParser(description="Sobol indices of the plant-first KPIs")
+    ap.add_argument("--n", type=int, default=2 ** 12, help="base samples (rounded up to a power of two)")
+    ap.add_argument("--rel", type=float, default=0.2, help="+/- range for inputs without a distribution")
+    ap.add_argument("--workers", type=int, default=1, help="processes (0 = all cores)")
+    ap.add_argument("--boot", type=int, default=100, help="bootstrap resamples")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--kpi", default="BE_radius_truck", help="KPI ranked on screen")
+    ap.add_argument("--out", help="write all indices to this CSV")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    res = sobol_indices(args.n, rel=args.rel, seed=args.seed, workers=args.workers or None, n_boot=args.boot)
+    print(f"{len(res['names'])} parameters, N={res['n']:,}, {res['runs']:,} model runs "
+          f"in {time.perf_counter() - t0:.1f}s")
+    with pd.option_context("display.width", 120):
+        print(ranking(res["indices"], args.kpi, top=15).round(3).to_string(index=False))
+    if args.out:
+        res["indices"].to_csv(args.out, index=False)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
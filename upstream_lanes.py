@@ -0,0 +1,94 @@
+# upstream_lanes.py
+# Sparse lane generation for large farm × plant × mode networks
+# - Keeps only lanes that can earn a positive unit margin, using the closed-form
+#   BE radius per (plant, mode): UM_lane > 0  <=>  dist(i,j) < BE_radius(j,m)
+# - Pruning is exact for Upstream_B: a lane with UM_lane <= 0 never carries flow
+#   in an optimal solution (constraints are upper bounds only)
+# - Lanes are integer-coded i/j/m arrays sorted by farm (CSR row order), built in
+#   farm chunks so the dense I×J×M cube is never materialized
+# - Output plugs into upstream_lp.solve_upstream(lanes=...) and the tidy frames
+#   used by make_all_upstream_viz
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from plantflip_kernel import MODES
+
+def lane_radius(P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul=2.0, min_margin=0.0):
+    """
+    Distance (km one-way) below which UM_lane(i,j,m) > min_margin, shape (J, M).
+    With min_margin=0 this is BE_radius(j,m) before flooring at 0.
+    """
+    P_chip = np.asarray(P_chip, dtype=float)[:, None]
+    C_tkm = np.asarray(C_tkm, dtype=float)[None, :]
+    C_surcharge = np.asarray(C_surcharge, dtype=float)[None, :]
+    return (P_chip - C_chip_handle - C_surcharge - min_margin) / np.maximum(1e-6, Backhaul * C_tkm)
+
+def profitable_lanes(dist, P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul=2.0,
+                     min_margin=0.0, chunk_rows=4096):
+    """
+    Lane set restricted to dist(i,j) < lane_radius(j,m).
+
+    dist : I×J km table, either a dense array or a scipy.sparse matrix. For sparse
+           input only stored entries are candidate lanes (missing = no road / not
+           considered); store a farm sitting at the plant as a tiny positive km.
+           A dense I×J×M array gives per-mode km (road_distance); inf = unreachable.
+
+    Returns the same dict layout as upstream_lp.all_lanes (i, j, m, dist, shape)
+    plus `indptr` (I+1,) so lanes of farm i are lanes[k] for k in indptr[i]:indptr[i+1].
+    """
+    R = lane_radius(P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul, min_margin)
+    J, M = R.shape
+
+    if sp.issparse(dist):
+        coo = sp.coo_matrix(dist)
+        I = coo.shape[0]
+        keep = coo.data[:, None] < R[coo.col]                      # (nnz, M)
+        k, m = np.nonzero(keep)
+        i, j, d = coo.row[k], coo.col[k], coo.data[k]
+        order = np.lexsort((m, j, i))
+        i, j, m, d = i[order], j[order], m[order], d[order]
+    else:
+        dist = np.asarray(dist, dtype=float)
+        I = dist.shape[0]
+        parts = []
+        for a in range(0, I, chunk_rows):
+            sub = dist[a:a + chunk_rows]
+            sub = sub if sub.ndim == 3 else np.repeat(sub[:, :, None], M, axis=2)
+            ii, jj, mm = np.nonzero(sub < R[None, :, :])               # already (i, j, m) order
+            parts.append((ii + a, jj, mm, sub[ii, jj, mm]))
+        i, j, m, d = (np.concatenate(c) for c in zip(*parts)) if parts else \
+            (np.zeros(0, int), np.zeros(0, int), np.zeros(0, int), np.zeros(0))
+
+    return dict(
+        i=i.astype(np.int64), j=j.astype(np.int64), m=m.astype(np.int64), dist=d.astype(float),
+        shape=(I, J, M), indptr=np.searchsorted(i, np.arange(I + 1)),
+    )
+
+def lane_matrix(lanes, values):
+    """Per-lane values as a CSR matrix of shape (I, J*M); column = j*M + m."""
+    I, J, M = lanes["shape"]
+    return sp.csr_matrix((np.asarray(values, dtype=float), (lanes["i"], lanes["j"] * M + lanes["m"])),
+                         shape=(I, J * M))
+
+def lane_table(lanes, farms, plants, modes=MODES, **columns):
+    """
+    Tidy lane table (i, j, m + one column per keyword) with categorical labels, so
+    10⁶ lanes cost a few bytes per label instead of a Python string each.
+    """
+    out = pd.DataFrame({
+        "i": pd.Categorical.from_codes(lanes["i"], categories=list(farms)),
+        "j": pd.Categorical.from_codes(lanes["j"], categories=list(plants)),
+        "m": pd.Categorical.from_codes(lanes["m"], categories=list(modes)),
+    })
+    for name, values in columns.items():
+        out[name] = np.asarray(values)
+    return out
+
+def pruning_stats(lanes):
+    """Kept vs dense lane counts for logging."""
+    I, J, M = lanes["shape"]
+    dense = I * J * M
+    kept = len(lanes["i"])
+    return dict(dense=dense, kept=kept, kept_frac=kept / max(1, dense))
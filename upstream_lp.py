@@ -0,0 +1,218 @@
+# upstream_lp.py
+# Native Python LP path for the Upstream Option B allocation (Upstream_5.gms)
+# - x(i,j,m) >= 0 on farm -> plant lanes, SupplyLim(i), DemandLim(j)
+# - maximize GrossMargin = sum (P_chip(j) - UC_lane(i,j,m)) * x(i,j,m)
+# - sparse constraint matrices, solved with SciPy's bundled HiGHS (no GAMS needed)
+# - post-solve analytics with the same names as the GAMS parameters
+#   (UC_lane, UM_lane, Rev_lane, Cost_lane, GM_lane, GM_site, GM_farm, GM_mode,
+#    GM_total, BE_price, BE_radius)
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+from plantflip_kernel import MODES, as_param_arrays, chip_handle_costs, tkm_costs, surcharges
+from upstream_lanes import lane_radius, profitable_lanes
+
+# -----------------------
+# Supply (same as Upstream_5.gms)
+# -----------------------
+SUPPLY_DEFAULTS = dict(
+    A_ha=200.0,          # farm arable area (ha)
+    Y_SR_DM=16.0,        # SRC baseline yield (t DM/ha/yr)
+    delta_edge=0.40,     # edge-effect uplift (fraction)
+    lambdaLoss=0.05,     # harvest/handling loss fraction
+    MC=0.35,             # moisture content of delivered chips (fraction)
+)
+
+def alpha_wood(alley_width_m, tree_strip_m=6.0):
+    """Wooded share of farm area from the ALMA alley geometry."""
+    alley_width_m = np.asarray(alley_width_m, dtype=float)
+    return tree_strip_m / (tree_strip_m + alley_width_m)
+
+def farm_supply(alpha, A_ha=200.0, Y_SR_DM=16.0, delta_edge=0.40, lambdaLoss=0.05, MC=0.35):
+    """Supply(i) in as-received t/yr."""
+    alpha = np.asarray(alpha, dtype=float)
+    return (A_ha * alpha * Y_SR_DM * (1 + delta_edge) * (1 - lambdaLoss)) / np.maximum(1e-6, 1 - MC)
+
+# -----------------------
+# Lane costs
+# -----------------------
+def lane_cost_params(params=None, **overrides):
+    """
+    Scalars of the lane cost structure from the KTBL blocks (plantflip_kernel names):
+      C_chip_handle  (C_chip_eurt + C_handle_eurt, €/t)
+      C_tkm          (€/t-km per mode, ordered as MODES)
+      C_surcharge    (€/t per mode, ordered as MODES)
+      Backhaul
+    """
+    p = as_param_arrays(params, **overrides)
+    C_chip, C_hand = chip_handle_costs(p)
+    tkm = tkm_costs(p)
+    surch = surcharges(p)
+    return dict(
+        C_chip_handle=float(C_chip + C_hand),
+        C_tkm=np.array([float(tkm[m]) for m in MODES]),
+        C_surcharge=np.array([float(surch[m]) for m in MODES]),
+        Backhaul=float(p["Backhaul"]),
+    )
+
+def all_lanes(dist, n_modes=len(MODES)):
+    """
+    Dense lane list over every (i, j, m) of an I×J distance table (or I×J×M per-mode
+    km, e.g. from road_distance), as integer-coded arrays.
+    """
+    dist = np.asarray(dist, dtype=float)
+    I, J = dist.shape[:2]
+    i, j, m = np.meshgrid(np.arange(I), np.arange(J), np.arange(n_modes), indexing="ij")
+    i, j, m = i.ravel(), j.ravel(), m.ravel()
+    d = dist[i, j, m] if dist.ndim == 3 else dist[i, j]
+    return dict(i=i, j=j, m=m, dist=d, shape=(I, J, n_modes))
+
+def unit_cost(lanes, C_chip_handle, C_tkm, C_surcharge, Backhaul):
+    """UC_lane per lane (€/t)."""
+    C_tkm = np.asarray(C_tkm, dtype=float)
+    C_surcharge = np.asarray(C_surcharge, dtype=float)
+    return C_chip_handle + Backhaul * lanes["dist"] * C_tkm[lanes["m"]] + C_surcharge[lanes["m"]]
+
+def be_radius_table(P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul):
+    """BE_radius(j,m): km one-way where UM_lane hits zero (floored at 0)."""
+    return np.maximum(0.0, lane_radius(P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul))
+
+# -----------------------
+# LP
+# -----------------------
+def build_lp(lanes, supply, P_chip, UC, DemandUB=None):
+    """
+    LP in linprog form (minimize c @ x, A_ub x <= b_ub, x >= 0).
+    Rows: SupplyLim(i) for every farm, DemandLim(j) only for plants with a finite DemandUB.
+    """
+    I, J, _ = lanes["shape"]
+    n = len(lanes["i"])
+    P_chip = np.asarray(P_chip, dtype=float)
+    c = -(P_chip[lanes["j"]] - UC)
+
+    cols = np.arange(n)
+    A_sup = sp.csr_matrix((np.ones(n), (lanes["i"], cols)), shape=(I, n))
+    rows, b = [A_sup], [np.asarray(supply, dtype=float)]
+    if DemandUB is not None:
+        DemandUB = np.broadcast_to(np.asarray(DemandUB, dtype=float), (J,))
+        finite = np.flatnonzero(np.isfinite(DemandUB))
+        if len(finite):
+            row_of = np.full(J, -1)
+            row_of[finite] = np.arange(len(finite))
+            keep = row_of[lanes["j"]] >= 0
+            A_dem = sp.csr_matrix((np.ones(keep.sum()), (row_of[lanes["j"][keep]], cols[keep])),
+                                  shape=(len(finite), n))
+            rows.append(A_dem)
+            b.append(DemandUB[finite])
+    return c, sp.vstack(rows, format="csr"), np.concatenate(b)
+
+def solve_upstream(dist, supply, P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul=2.0,
+                   DemandUB=None, lanes=None, prune=False, options=None):
+    """
+    Solve Upstream_B (maximize GrossMargin) and return a dict of analytics.
+
+    dist        : I×J km table (ignored when `lanes` is given)
+    supply      : Supply(i), as-received t/yr
+    P_chip      : P_chip(j), €/t at plant gate
+    C_tkm, C_surcharge : per mode, ordered as MODES
+    DemandUB    : DemandUB(j), t/yr (None or inf = unbounded)
+    lanes       : optional integer-coded lane set (see all_lanes); defaults to all lanes
+    prune       : build only lanes inside BE_radius (upstream_lanes.profitable_lanes);
+                  same optimum, far fewer columns on large networks
+
+    Per-lane arrays follow the order of lanes["i"/"j"/"m"]; the *_site/*_farm/*_mode
+    totals are dense over J/I/M.
+    """
+    if lanes is None and prune:
+        lanes = profitable_lanes(dist, P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul)
+    elif lanes is None:
+        lanes = all_lanes(dist, len(C_tkm))
+    I, J, M = lanes["shape"]
+    P_chip = np.asarray(P_chip, dtype=float)
+
+    UC = unit_cost(lanes, C_chip_handle, C_tkm, C_surcharge, Backhaul)
+    c, A_ub, b_ub = build_lp(lanes, supply, P_chip, UC, DemandUB)
+    if len(c) == 0:
+        # no lane at all (e.g. pruned: every P_chip below the handling cost) -> zero flows,
+        # no binding constraint, all duals 0; linprog rejects an empty objective
+        x, marg, status, message = np.zeros(0), np.zeros(A_ub.shape[0]), 0, "no lanes: zero flow"
+    else:
+        res = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=(0, None), method="highs", options=options)
+        if res.status != 0:
+            raise RuntimeError(f"Upstream_B LP not solved: {res.message}")
+        x, status, message = res.x, res.status, res.message
+        marg = -res.ineqlin.marginals  # shadow prices of SupplyLim / DemandLim (€/t)
+
+    UR = P_chip[lanes["j"]]
+    Rev_lane = UR * x
+    Cost_lane = UC * x
+    GM_lane = Rev_lane - Cost_lane
+    return dict(
+        lanes=lanes,
+        x=x,
+        UC_lane=UC,
+        UM_lane=UR - UC,
+        Rev_lane=Rev_lane,
+        Cost_lane=Cost_lane,
+        GM_lane=GM_lane,
+        UR_j=P_chip,
+        Rev_site=_totals(lanes["j"], Rev_lane, J),
+        Cost_site=_totals(lanes["j"], Cost_lane, J),
+        GM_site=_totals(lanes["j"], GM_lane, J),
+        GM_farm=_totals(lanes["i"], GM_lane, I),
+        GM_mode=_totals(lanes["m"], GM_lane, M),
+        GM_total=float(GM_lane.sum()),
+        BE_radius=be_radius_table(P_chip, C_chip_handle, C_tkm, C_surcharge, Backhaul),
+        supply_dual=marg[:I],
+        demand_dual=_demand_dual(marg[I:], DemandUB, J),
+        status=status,
+        message=message,
+    )
+
+def _totals(index, values, n):
+    """Dense per-index sums (float even with no lanes: bincount gives int64 for empty weights)."""
+    return np.bincount(index, values, n).astype(float)
+
+def _demand_dual(marg, DemandUB, J):
+    """Scatter DemandLim shadow prices back to all J plants (0 where DemandUB is unbounded)."""
+    out = np.zeros(J)
+    if DemandUB is not None:
+        out[np.isfinite(np.broadcast_to(np.asarray(DemandUB, dtype=float), (J,)))] = marg
+    return out
+
+# -----------------------
+# Tidy output (same layout as parse_gdx_dump)
+# -----------------------
+def lane_frame(result, symbol, farms, plants, modes=MODES, nonzero_flow=False):
+    """
+    Per-lane symbol (UC_lane, UM_lane, BE_price, Rev_lane, Cost_lane, GM_lane, x)
+    as a DataFrame with columns i, j, m, value. nonzero_flow=True keeps only lanes
+    with x > 0, like the sparse GAMS dumps of Rev_lane/Cost_lane/GM_lane.
+    """
+    lanes = result["lanes"]
+    values = result["UC_lane"] if symbol == "BE_price" else result[symbol]
+    keep = result["x"] > 1e-9 if nonzero_flow else np.ones(len(values), dtype=bool)
+    return pd.DataFrame(dict(
+        i=np.asarray(farms)[lanes["i"][keep]],
+        j=np.asarray(plants)[lanes["j"][keep]],
+        m=np.asarray(modes)[lanes["m"][keep]],
+        value=values[keep],
+    ))
+
+def analytics_frames(result, farms, plants, modes=MODES):
+    """All post-solve analytics as tidy DataFrames keyed by GAMS symbol name."""
+    out = {s: lane_frame(result, s, farms, plants, modes) for s in ("UC_lane", "UM_lane", "BE_price")}
+    out.update({s: lane_frame(result, s, farms, plants, modes, nonzero_flow=True)
+                for s in ("Rev_lane", "Cost_lane", "GM_lane")})
+    jj, mm = np.meshgrid(np.arange(len(plants)), np.arange(len(modes)), indexing="ij")
+    out["BE_radius"] = pd.DataFrame(dict(
+        j=np.asarray(plants)[jj.ravel()], m=np.asarray(modes)[mm.ravel()],
+        value=result["BE_radius"].ravel(),
+    ))
+    out["GM_site"] = pd.DataFrame(dict(j=plants, value=result["GM_site"]))
+    out["GM_farm"] = pd.DataFrame(dict(i=farms, value=result["GM_farm"]))
+    out["GM_mode"] = pd.DataFrame(dict(m=modes, value=result["GM_mode"]))
+    return out
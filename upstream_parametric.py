@@ -0,0 +1,228 @@
+# upstream_parametric.py
+# Parametric price analysis for Upstream_B
+# - P_chip(t) = P0 + t * direction is linear in t, so the optimal gross margin
+#   V(t) is convex piecewise linear and the optimal flows are piecewise constant
+#   between critical prices (breakpoints)
+# - With demand limits: breakpoints by tangent intersection (Eisner–Severance).
+#   The optimal flows at two prices define two lines of V; solving once at their
+#   crossing either confirms a breakpoint or splits the interval. About 2 solves
+#   per breakpoint instead of one solve per grid point, and exact
+# - DemandUB unbounded: each farm ships everything on its best lane, so the
+#   breakpoints are the kinks of each farm's upper envelope of UM_lane(t) lines,
+#   walked for all farms at once (no LP at all); otherwise one re-solvable HiGHS
+#   model (warm-started with highspy)
+# - price_breakpoints: one plant's price; ray_breakpoints: price rays across plants
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from upstream_lanes import profitable_lanes
+from upstream_lp import build_lp, unit_cost
+from upstream_scenarios import make_solver
+
+# -----------------------
+# DemandUB unbounded: per-farm upper envelope
+# -----------------------
+def _farm_envelopes(lanes, a, b, t_lo, t_hi):
+    """
+    Without demand limits each farm ships all its supply on the lane with the highest
+    UM_lane(t) = a + b*t, or nothing if that is <= 0. Walk every farm's upper envelope
+    of these lines (plus the zero line) from t_lo to t_hi, all farms at once.
+    Returns interval arrays (farm, lane, t_start, t_end); lane = -1 means no shipment.
+    """
+    fi = lanes["i"]
+    I = lanes["shape"][0]
+    n = len(fi)
+
+    def pick(mask, key, tiebreak):
+        """Per farm, the masked lane with the smallest key (ties: largest tiebreak)."""
+        best_key = np.full(I, np.inf)
+        np.minimum.at(best_key, fi[mask], key[mask])
+        on = mask & (key == best_key[fi])
+        best_tb = np.full(I, -np.inf)
+        np.maximum.at(best_tb, fi[on], tiebreak[on])
+        on &= tiebreak == best_tb[fi]
+        lane = np.full(I, -1)
+        farms, first = np.unique(fi[on], return_index=True)
+        lane[farms] = np.flatnonzero(on)[first]
+        return lane, best_key
+
+    # best line at t_lo (ties -> steeper line, which stays best just after t_lo)
+    lane, key = pick(np.ones(n, dtype=bool), -(a + b * t_lo), b)
+    lane[-key <= 0] = -1
+    tie0 = (key == 0) & (lane >= 0)
+    lane[tie0 & (b[np.maximum(lane, 0)] <= 0)] = -1
+
+    t_cur = np.full(I, float(t_lo))
+    out = []
+    active = np.ones(I, dtype=bool)
+    while active.any():
+        A = np.where(lane >= 0, a[np.maximum(lane, 0)], 0.0)
+        B = np.where(lane >= 0, b[np.maximum(lane, 0)], 0.0)
+        # crossing with every steeper lane of the same farm
+        steeper = active[fi] & (b > B[fi])
+        t_x = np.full(n, np.inf)
+        t_x[steeper] = (A[fi] - a)[steeper] / (b - B[fi])[steeper]
+        t_x[t_x < t_cur[fi]] = np.inf
+        nxt, t_next = pick(np.isfinite(t_x), t_x, b)
+        # crossing with the zero line (shipping stops) when the current line falls
+        t_zero = np.where((lane >= 0) & (B < 0), -A / np.where(B < 0, B, -1.0), np.inf)
+        t_zero[t_zero < t_cur] = np.inf
+        to_zero = t_zero < t_next
+        nxt[to_zero] = -1
+        t_next = np.minimum(t_next, t_zero)
+
+        end = np.minimum(t_next, t_hi)
+        f = np.flatnonzero(active)
+        out.append((f, lane[f], t_cur[f], end[f]))
+        active &= t_next < t_hi
+        lane = np.where(active, nxt, lane)
+        t_cur = np.where(active, t_next, t_cur)
+
+    farm, ln, ts, te = (np.concatenate(c) for c in zip(*out))
+    keep = te > ts
+    return farm[keep], ln[keep], ts[keep], te[keep]
+
+# -----------------------
+# Parametric analysis along a price ray
+# -----------------------
+def ray_breakpoints(dist, supply, P0, direction, C_chip_handle, C_tkm, C_surcharge, Backhaul=2.0,
+                    DemandUB=None, t_range=(0.0, 100.0), warm_start=True, rtol=1e-9):
+    """
+    Exact optimal flows of Upstream_B along P_chip(t) = P0 + t * direction, t in t_range.
+
+    Returns dict:
+      breakpoints (K,)         critical t values inside t_range, sorted
+      t_from, t_to (K+1,)      segment bounds
+      flow (L × K+1, CSC)      optimal lane flows per segment (constant inside it)
+      GM_intercept, GM_slope   GM_total(t) = GM_intercept[k] + GM_slope[k] * t on segment k
+      plant_flow (K+1, J)      t/yr delivered to each plant per segment
+      lanes, UC_lane, P0, direction, n_solves
+    """
+    P0 = np.asarray(P0, dtype=float)
+    d = np.asarray(direction, dtype=float)
+    t_lo, t_hi = map(float, t_range)
+    P_max = np.maximum(P0 + t_lo * d, P0 + t_hi * d)    # lanes that can be profitable anywhere on the ray
+    lanes = profitable_lanes(dist, P_max, C_chip_handle, C_tkm, C_surcharge, Backhaul)
+    UC = unit_cost(lanes, C_chip_handle, C_tkm, C_surcharge, Backhaul)
+    lj = lanes["j"]
+    a_lane = P0[lj] - UC       # UM_lane(t) = a_lane + t * b_lane
+    b_lane = d[lj]
+
+    if DemandUB is None or np.all(np.isinf(DemandUB)):
+        return _envelope_result(lanes, UC, supply, a_lane, b_lane, P0, d, t_lo, t_hi)
+
+    c0, A_ub, b_ub = build_lp(lanes, supply, P0 + t_lo * d, UC, DemandUB)
+    solve_c = make_solver(c0, A_ub, b_ub, warm_start).solve
+
+    n_solves = [0]
+    def solve(t):
+        n_solves[0] += 1
+        return solve_c(-(a_lane + t * b_lane))
+
+    def line(x):
+        return a_lane @ x, b_lane @ x              # V_x(t) = alpha + beta * t
+
+    breaks = []
+    x_lo, x_hi = solve(t_lo), solve(t_hi)
+    stack = [(t_lo, x_lo, t_hi, x_hi)]
+    while stack:
+        ta, xa, tb, xb = stack.pop()
+        (al_a, be_a), (al_b, be_b) = line(xa), line(xb)
+        if be_b - be_a <= rtol * (1 + abs(be_a) + abs(be_b)):
+            continue                               # same line: V is linear on [ta, tb]
+        ts = (al_a - al_b) / (be_b - be_a)
+        if not (ta < ts < tb):
+            continue
+        xs = solve(ts)
+        al_s, be_s = line(xs)
+        v_s, v_line = al_s + be_s * ts, al_a + be_a * ts
+        if v_s <= v_line + rtol * (1 + abs(v_line)):
+            breaks.append(ts)                      # tangents meet on V: breakpoint
+        else:
+            stack += [(ta, xa, ts, xs), (ts, xs, tb, xb)]
+
+    breaks = np.unique(np.asarray(breaks, dtype=float))
+    t_from = np.concatenate([[t_lo], breaks])
+    t_to = np.concatenate([breaks, [t_hi]])
+    flows = [solve(0.5 * (a + b)) for a, b in zip(t_from, t_to)]
+    X = np.column_stack(flows) if flows else np.zeros((len(lj), 0))
+
+    J = lanes["shape"][1]
+    plant_flow = np.zeros((X.shape[1], J))
+    for k in range(X.shape[1]):
+        plant_flow[k] = np.bincount(lj, X[:, k], J)
+    return dict(
+        breakpoints=breaks, t_from=t_from, t_to=t_to, flow=sp.csc_matrix(X),
+        GM_intercept=a_lane @ X, GM_slope=b_lane @ X, plant_flow=plant_flow,
+        lanes=lanes, UC_lane=UC, P0=P0, direction=d, n_solves=n_solves[0],
+    )
+
+def _envelope_result(lanes, UC, supply, a_lane, b_lane, P0, d, t_lo, t_hi):
+    """ray_breakpoints result assembled from the per-farm envelopes (no LP solves)."""
+    supply = np.asarray(supply, dtype=float)
+    farm, ln, ts, te = _farm_envelopes(lanes, a_lane, b_lane, t_lo, t_hi)
+    breaks = np.unique(np.concatenate([ts, te]))
+    breaks = breaks[(breaks > t_lo) & (breaks < t_hi)]
+    t_from = np.concatenate([[t_lo], breaks])
+    t_to = np.concatenate([breaks, [t_hi]])
+
+    ship = ln >= 0
+    farm, ln, ts, te = farm[ship], ln[ship], ts[ship], te[ship]
+    k0 = np.searchsorted(t_from, ts)
+    k1 = np.searchsorted(t_from, te)              # segments k0 .. k1-1
+    nseg = len(t_from)
+    reps = k1 - k0
+    seg = np.repeat(k1 - reps.cumsum(), reps) + np.arange(reps.sum())
+    lane_rep = np.repeat(ln, reps)
+    x_rep = np.repeat(supply[farm], reps)
+    X = sp.csc_matrix((x_rep, (lane_rep, seg)), shape=(len(UC), nseg))
+
+    J = lanes["shape"][1]
+    plant_flow = np.zeros((nseg, J))
+    np.add.at(plant_flow, (seg, lanes["j"][lane_rep]), x_rep)
+    return dict(
+        breakpoints=breaks, t_from=t_from, t_to=t_to, flow=X,
+        GM_intercept=np.bincount(seg, x_rep * a_lane[lane_rep], nseg),
+        GM_slope=np.bincount(seg, x_rep * b_lane[lane_rep], nseg),
+        plant_flow=plant_flow, lanes=lanes, UC_lane=UC, P0=P0, direction=d, n_solves=0,
+    )
+
+def price_breakpoints(dist, supply, P_chip, j, C_chip_handle, C_tkm, C_surcharge, Backhaul=2.0,
+                      DemandUB=None, price_range=(0.0, 100.0), warm_start=True):
+    """
+    Breakpoints in the gate price of plant j (index), other plants held at P_chip.
+    t of the result is the price of plant j in €/t.
+    """
+    P0 = np.asarray(P_chip, dtype=float).copy()
+    P0[j] = 0.0
+    e = np.zeros_like(P0)
+    e[j] = 1.0
+    return ray_breakpoints(dist, supply, P0, e, C_chip_handle, C_tkm, C_surcharge, Backhaul,
+                           DemandUB, price_range, warm_start)
+
+# -----------------------
+# Curves for charts
+# -----------------------
+def curve_frame(res, plants=None, t_name="price"):
+    """
+    Exact step curve: two rows per segment (start, end) with total flow, flow per
+    plant and GM_total. GM_total is linear inside a segment, so the polyline is exact.
+    """
+    J = res["plant_flow"].shape[1]
+    plants = [f"j{k + 1}" for k in range(J)] if plants is None else list(plants)
+    t = np.column_stack([res["t_from"], res["t_to"]]).ravel()
+    seg = np.repeat(np.arange(len(res["t_from"])), 2)
+    out = pd.DataFrame({t_name: t, "segment": seg})
+    out["flow_total"] = res["plant_flow"].sum(axis=1)[seg]
+    for k, name in enumerate(plants):
+        out[f"flow_{name}"] = res["plant_flow"][seg, k]
+    out["GM_total"] = res["GM_intercept"][seg] + res["GM_slope"][seg] * t
+    return out
+
+def evaluate_at(res, t):
+    """Optimal GM_total and plant flows at arbitrary t (vectorized) from the breakpoint table."""
+    t = np.asarray(t, dtype=float)
+    k = np.clip(np.searchsorted(res["breakpoints"], t, side="right"), 0, len(res["t_from"]) - 1)
+    return dict(GM_total=res["GM_intercept"][k] + res["GM_slope"][k] * t, plant_flow=res["plant_flow"][k])
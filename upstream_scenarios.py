@@ -0,0 +1,217 @@
+# upstream_scenarios.py
+# Scenario sweep for Upstream_B over many P_chip(j) price vectors
+# (Python counterpart of the Pchip_scen loop in Upstream_5.gms)
+# - One lane set for the whole sweep: lanes profitable at the highest price of
+#   each plant across scenarios (a superset of every scenario's pruned set, so
+#   each solve stays exact) -> only the objective changes between solves
+# - Scenarios are sorted so neighbours have similar prices and split into
+#   contiguous chunks over a process pool
+# - Warm start: with highspy installed each worker keeps one Highs model and only
+#   changes column costs, so HiGHS restarts from the previous optimal basis;
+#   without it, each scenario is a cold scipy.optimize.linprog(method="highs") solve
+# - Results go into a lane × scenario store (sparse flows), expandable to the
+#   (i,j,m,scen) tensor of Flow_scen / UM_lane_scen
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+from upstream_lanes import profitable_lanes
+from upstream_lp import all_lanes, build_lp, unit_cost
+
+try:
+    import highspy
+    HIGHSPY_OK = True
+except Exception:
+    HIGHSPY_OK = False
+
+# Pchip_scen in Upstream_5.gms
+PCHIP_SCEN = dict(
+    base=(25.0, 20.0),
+    highJ1=(60.0, 45.0),
+    equal50=(50.0, 50.0),
+)
+
+# -----------------------
+# Solvers (one per worker process)
+# -----------------------
+class _HighsWarm:
+    """Persistent highspy model; re-solves after changing column costs (basis is kept)."""
+    def __init__(self, c, A_ub, b_ub):
+        A = sp.csc_matrix(A_ub)
+        lp = highspy.HighsLp()
+        lp.num_col_, lp.num_row_ = A.shape[1], A.shape[0]
+        lp.col_cost_ = np.asarray(c, dtype=float)
+        lp.col_lower_ = np.zeros(A.shape[1])
+        lp.col_upper_ = np.full(A.shape[1], highspy.kHighsInf)
+        lp.row_lower_ = np.full(A.shape[0], -highspy.kHighsInf)
+        lp.row_upper_ = np.asarray(b_ub, dtype=float)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        self.h = highspy.Highs()
+        self.h.setOptionValue("output_flag", False)
+        self.h.passModel(lp)
+        self.cols = np.arange(A.shape[1], dtype=np.int32)
+
+    def solve(self, c):
+        self.h.changeColsCost(len(self.cols), self.cols, np.asarray(c, dtype=float))
+        self.h.run()
+        if self.h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            raise RuntimeError(f"Upstream_B LP not solved: {self.h.modelStatusToString(self.h.getModelStatus())}")
+        return np.asarray(self.h.getSolution().col_value)
+
+class _LinprogCold:
+    """Fallback without highspy: independent linprog solves."""
+    def __init__(self, c, A_ub, b_ub):
+        self.A_ub, self.b_ub = A_ub, b_ub
+
+    def solve(self, c):
+        res = linprog(c, A_ub=self.A_ub, b_ub=self.b_ub, bounds=(0, None), method="highs")
+        if res.status != 0:
+            raise RuntimeError(f"Upstream_B LP not solved: {res.message}")
+        return res.x
+
+def make_solver(c, A_ub, b_ub, warm_start=True):
+    """Re-solvable Upstream_B LP (fixed constraints, objective passed per solve)."""
+    cls = _HighsWarm if (warm_start and HIGHSPY_OK) else _LinprogCold
+    return cls(c, A_ub, b_ub)
+
+_WORKER = {}
+
+def _init_worker(problem, warm_start):
+    _WORKER.clear()
+    _WORKER.update(problem=problem, warm_start=warm_start)
+
+def _solve_chunk(scen_idx, P_rows):
+    """Solve a contiguous block of scenarios; flows come back as COO triplets (lane, scen, x)."""
+    prob = _WORKER["problem"]
+    lanes, UC = prob["lanes"], prob["UC"]
+    c0, A_ub, b_ub = build_lp(lanes, prob["supply"], P_rows[0], UC, prob["DemandUB"])
+    solver = make_solver(c0, A_ub, b_ub, _WORKER["warm_start"])
+
+    rows, cols, vals = [], [], []
+    for s, P in zip(scen_idx, P_rows):
+        x = solver.solve(-(P[lanes["j"]] - UC))
+        nz = np.flatnonzero(x > 1e-9)
+        rows.append(nz)
+        cols.append(np.full(len(nz), s))
+        vals.append(x[nz])
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+# -----------------------
+# Runner
+# -----------------------
+def run_scenarios(dist, supply, P_chip_scen, C_chip_handle, C_tkm, C_surcharge, Backhaul=2.0,
+                  DemandUB=None, names=None, prune=True, workers=None, chunk_size=None,
+                  warm_start=True):
+    """
+    Solve Upstream_B for every row of P_chip_scen (S × J, or a {name: P_chip} dict).
+
+    workers    : process count (default os.cpu_count()); 1 = run in this process
+    chunk_size : scenarios per task (default S / (4 * workers), at least 1)
+    warm_start : reuse the HiGHS basis between scenarios of a chunk (needs highspy)
+
+    Returns a store dict:
+      lanes, UC_lane (L,), P_chip (S,J), names (S,), flow (L×S CSC, sparse Flow_scen),
+      GM_total (S,), GM_site (S,J), warm_start (bool actually used)
+    """
+    if isinstance(P_chip_scen, dict):
+        names = list(P_chip_scen) if names is None else names
+        P_chip_scen = np.array([P_chip_scen[n] for n in names], dtype=float)
+    P = np.atleast_2d(np.asarray(P_chip_scen, dtype=float))
+    S = P.shape[0]
+    names = np.asarray([f"s{k}" for k in range(S)] if names is None else names)
+
+    if prune:
+        lanes = profitable_lanes(dist, P.max(axis=0), C_chip_handle, C_tkm, C_surcharge, Backhaul)
+    else:
+        lanes = all_lanes(dist, len(C_tkm))
+    UC = unit_cost(lanes, C_chip_handle, C_tkm, C_surcharge, Backhaul)
+    if len(lanes["i"]) == 0:
+        # no lane profitable in any scenario: every scenario ships nothing, no LP to solve
+        flow = sp.csc_matrix((0, S))
+        return _summarize(lanes, UC, P, names, flow, False)
+    problem = dict(lanes=lanes, UC=UC, supply=np.asarray(supply, dtype=float), DemandUB=DemandUB)
+
+    order = np.lexsort(P.T[::-1])            # neighbouring scenarios -> small basis changes
+    workers = max(1, min(workers or os.cpu_count() or 1, S))
+    chunk_size = chunk_size or max(1, -(-S // (4 * workers)))
+    chunks = [order[a:a + chunk_size] for a in range(0, S, chunk_size)]
+
+    if workers == 1:
+        _init_worker(problem, warm_start)
+        parts = [_solve_chunk(ch, P[ch]) for ch in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(problem, warm_start)) as ex:
+            parts = list(ex.map(_solve_chunk, chunks, [P[ch] for ch in chunks]))
+
+    r, s, v = (np.concatenate(a) for a in zip(*parts))
+    L = len(lanes["i"])
+    flow = sp.csc_matrix((v, (r, s)), shape=(L, S))
+    return _summarize(lanes, UC, P, names, flow, warm_start and HIGHSPY_OK)
+
+def _summarize(lanes, UC, P, names, flow, warm_start):
+    I, J, M = lanes["shape"]
+    S = P.shape[0]
+    # GM per lane = (P_chip(j,s) - UC_lane) * x, aggregated per scenario and plant
+    coo = flow.tocoo()
+    gm = (P[coo.col, lanes["j"][coo.row]] - UC[coo.row]) * coo.data
+    GM_site = np.zeros((S, J))
+    np.add.at(GM_site, (coo.col, lanes["j"][coo.row]), gm)
+    return dict(
+        lanes=lanes, UC_lane=UC, P_chip=P, names=names, flow=flow,
+        GM_total=GM_site.sum(axis=1), GM_site=GM_site, warm_start=warm_start,
+    )
+
+# -----------------------
+# Store access
+# -----------------------
+def um_lane(store, scen=None):
+    """UM_lane_scen per lane (L,) for one scenario, or (L, S) for all."""
+    j = store["lanes"]["j"]
+    if scen is None:
+        return store["P_chip"][:, j].T - store["UC_lane"][:, None]
+    return store["P_chip"][scen, j] - store["UC_lane"]
+
+def to_tensor(store, symbol="flow", fill=0.0):
+    """
+    Dense (i,j,m,scen) array of "flow" (Flow_scen) or "UM_lane" (UM_lane_scen).
+    Lanes outside the store hold `fill` (use np.nan for UM_lane to mark pruned lanes).
+    Meant for small networks; large sweeps should stay on the lane × scenario store.
+    """
+    lanes = store["lanes"]
+    I, J, M = lanes["shape"]
+    S = store["P_chip"].shape[0]
+    values = store["flow"].toarray() if symbol == "flow" else um_lane(store)
+    out = np.full((I, J, M, S), fill, dtype=float)
+    out[lanes["i"], lanes["j"], lanes["m"], :] = values
+    return out
+
+def save_store(path, store):
+    """Write the store to a single .npz file."""
+    lanes, flow = store["lanes"], store["flow"]
+    np.savez_compressed(
+        path,
+        lane_i=lanes["i"], lane_j=lanes["j"], lane_m=lanes["m"], lane_dist=lanes["dist"],
+        shape=np.asarray(lanes["shape"]), UC_lane=store["UC_lane"], P_chip=store["P_chip"],
+        names=store["names"].astype(str), GM_total=store["GM_total"], GM_site=store["GM_site"],
+        flow_data=flow.data, flow_indices=flow.indices, flow_indptr=flow.indptr,
+    )
+
+def load_store(path):
+    """Read a store written by save_store."""
+    z = np.load(path)
+    shape = tuple(int(v) for v in z["shape"])
+    i = z["lane_i"]
+    lanes = dict(i=i, j=z["lane_j"], m=z["lane_m"], dist=z["lane_dist"], shape=shape,
+                 indptr=np.searchsorted(i, np.arange(shape[0] + 1)))
+    flow = sp.csc_matrix((z["flow_data"], z["flow_indices"], z["flow_indptr"]),
+                         shape=(len(i), z["P_chip"].shape[0]))
+    return dict(lanes=lanes, UC_lane=z["UC_lane"], P_chip=z["P_chip"], names=z["names"], flow=flow,
+                GM_total=z["GM_total"], GM_site=z["GM_site"], warm_start=False)